@@ -0,0 +1,213 @@
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# キャッシュに入れた SKIP 結果の印（PluginManager.SKIP はプロセスごとに別物なので）
+_SKIP = "skip"
+
+
+def payload_digest(data_type: str, value: Any, encoded=None) -> Optional[str]:
+    """
+    Content digest of a clipboard payload (None if it cannot be hashed).
+    Images with their pasteboard encoding (imagecodec.EncodedImage) are keyed
+    by its fingerprint; only images without one (e.g. downscaled) hash pixels.
+    """
+    try:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(data_type.encode())
+        if data_type == "text":
+            h.update(str(value).encode("utf-8", "surrogatepass"))
+        elif data_type == "image" and encoded is not None:
+            # 画素の tobytes()（4K で 70 ms 超、全画素のコピー）を避ける
+            h.update(("enc:%s:%s" % (encoded.fmt, encoded.fingerprint)).encode())
+        elif data_type == "image":
+            h.update(("%s:%dx%d" % (value.mode, value.width, value.height)).encode())
+            h.update(value.tobytes())
+        else:
+            return None
+        return h.hexdigest()
+    except Exception:
+        return None
+
+
+def _value_size(data_type: str, value: Any) -> int:
+    if data_type == "image" and value is not None:
+        try:
+            return value.width * value.height * len(value.getbands())
+        except Exception:
+            return 0
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU cache of plugin-chain results with a byte budget.
+
+    Keys are built by the caller, e.g. (payload digest, plugin-set signature,
+    config version). Values are (data_type, value, encoded) where encoded is
+    the EncodedImage of an image result or None. Image results larger than
+    spill_bytes are written to disk as raw pixels (plus the encoded bytes)
+    instead of being kept in memory; the disk area has its own budget.
+    Cached images are shared objects: callers must not mutate them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 128 * 1024 * 1024,
+        spill_bytes: int = 8 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.max_bytes = int(max_bytes)
+        self.spill_bytes = int(spill_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_bytes)
+        self._mem: "OrderedDict[Hashable, Tuple[str, Any, Any, int]]" = OrderedDict()
+        self._disk: "OrderedDict[Hashable, Tuple[str, str, str, Tuple[int, int], int, Optional[str]]]" = (
+            OrderedDict()
+        )
+        self._mem_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            # 索引はメモリ上だけなので前回のスピルは捨てる
+            shutil.rmtree(disk_dir, ignore_errors=True)
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+            except Exception:
+                self.disk_dir = None
+
+    def get(self, key: Hashable):
+        """Return (data_type, value, encoded), "skip", or None on a miss."""
+        with self._lock:
+            ent = self._mem.get(key)
+            if ent is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return _SKIP if ent[0] == _SKIP else (ent[0], ent[1], ent[2])
+            dent = self._disk.get(key)
+            if dent is None:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+        data_type, path, mode, size, _, enc_fmt = dent
+        encoded = None
+        try:
+            from PIL import Image
+
+            with open(path, "rb") as f:
+                img = Image.frombytes(mode, size, f.read())
+            if enc_fmt:
+                from .imagecodec import EncodedImage
+
+                with open(path + ".enc", "rb") as f:
+                    encoded = EncodedImage(enc_fmt, f.read())
+        except Exception as e:
+            logger.warning("Result cache spill read failed: %s", e)
+            with self._lock:
+                self._drop_disk(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return (data_type, img, encoded)
+
+    def put(self, key: Hashable, result):
+        """Store a chain result: (data_type, value[, encoded]) or "skip"."""
+        encoded = None
+        if result == _SKIP:
+            data_type, value, nbytes = _SKIP, None, 64
+        else:
+            data_type, value = result[0], result[1]
+            if len(result) > 2:
+                encoded = result[2]
+            nbytes = _value_size(data_type, value)
+            if encoded is not None:
+                nbytes += len(encoded.data)
+        if (
+            data_type == "image"
+            and self.disk_dir
+            and (nbytes > self.spill_bytes or nbytes > self.max_bytes)
+        ):
+            self._spill(key, data_type, value, encoded, nbytes)
+            return
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_bytes -= old[3]
+            self._mem[key] = (data_type, value, encoded, nbytes)
+            self._mem_bytes += nbytes
+            while self._mem_bytes > self.max_bytes and self._mem:
+                _, ev = self._mem.popitem(last=False)
+                self._mem_bytes -= ev[3]
+
+    def _spill(self, key: Hashable, data_type: str, img, encoded, nbytes: int):
+        if nbytes > self.disk_max_bytes:
+            return
+        name = hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+        path = os.path.join(self.disk_dir, name + ".raw")
+        try:
+            if img.mode not in ("RGB", "RGBA", "L", "LA"):
+                img = img.convert("RGBA")
+            with open(path, "wb") as f:
+                f.write(img.tobytes())
+            if encoded is not None:
+                with open(path + ".enc", "wb") as f:
+                    f.write(encoded.data)
+        except Exception as e:
+            logger.warning("Result cache spill write failed: %s", e)
+            return
+        with self._lock:
+            self._drop_disk(key)
+            self._disk[key] = (
+                data_type,
+                path,
+                img.mode,
+                img.size,
+                nbytes,
+                encoded.fmt if encoded is not None else None,
+            )
+            self._disk_bytes += nbytes
+            while self._disk_bytes > self.disk_max_bytes and self._disk:
+                self._drop_disk(next(iter(self._disk)))
+
+    def _drop_disk(self, key: Hashable):
+        dent = self._disk.pop(key, None)
+        if dent is None:
+            return
+        self._disk_bytes -= dent[4]
+        for path in (dent[1], dent[1] + ".enc"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
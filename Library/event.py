@@ -1,8 +1,73 @@
 import time
-import asyncio
-import inspect
 import os
 import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# NSEventModifierFlag* のビット（Cocoa を import せずに使う）
+_MOD_BITS = {
+    "shift": 1 << 17,
+    "ctrl": 1 << 18,
+    "alt": 1 << 19,
+    "cmd": 1 << 20,
+}
+_MOD_MASK = sum(_MOD_BITS.values())
+
+# キー名 -> macOS の仮想キーコード（kVK_*、US 配列の物理キー位置）
+# 文字キーは _keycode() が現在の配列で引き直し、見つからないときだけこの表を使う
+# fmt: off
+_KEYCODES = {
+    "a": 0, "s": 1, "d": 2, "f": 3, "h": 4, "g": 5, "z": 6, "x": 7, "c": 8,
+    "v": 9, "b": 11, "q": 12, "w": 13, "e": 14, "r": 15, "y": 16, "t": 17,
+    "1": 18, "2": 19, "3": 20, "4": 21, "6": 22, "5": 23, "=": 24, "9": 25,
+    "7": 26, "-": 27, "8": 28, "0": 29, "]": 30, "o": 31, "u": 32, "[": 33,
+    "i": 34, "p": 35, "l": 37, "j": 38, "'": 39, "k": 40, ";": 41, "\\": 42,
+    ",": 43, "/": 44, "n": 45, "m": 46, ".": 47, "`": 50,
+    "return": 36, "enter": 36, "tab": 48, "space": 49, "delete": 51,
+    "backspace": 51, "escape": 53, "esc": 53, "forwarddelete": 117,
+    "home": 115, "end": 119, "pageup": 116, "pagedown": 121,
+    "left": 123, "right": 124, "down": 125, "up": 126,
+    "f1": 122, "f2": 120, "f3": 99, "f4": 118, "f5": 96, "f6": 97,
+    "f7": 98, "f8": 100, "f9": 101, "f10": 109, "f11": 103, "f12": 111,
+}
+# fmt: on
+
+# コード（次のキー）を待つ秒数
+CHORD_TIMEOUT = 1.5
+
+# 現在のキーボード配列で文字キーが出す文字 -> 仮想キーコード（入力ソースの切り替えで作り直す）
+_layout_codes = None
+
+
+def _layout_keycodes():
+    """
+    Character -> keycode for the active keyboard layout (AZERTY, QWERTZ, ...).
+    Empty without Quartz; _keycode() then uses the US positions.
+    """
+    global _layout_codes
+    if _layout_codes is None:
+        codes = {}
+        try:
+            from Quartz import CGEventCreateKeyboardEvent, CGEventKeyboardGetUnicodeString
+
+            for code in sorted({v for k, v in _KEYCODES.items() if len(k) == 1}):
+                ev = CGEventCreateKeyboardEvent(None, code, True)
+                res = CGEventKeyboardGetUnicodeString(ev, 4, None, None)
+                chars = res[1] if isinstance(res, tuple) else res
+                if chars and len(chars) == 1:
+                    codes.setdefault(chars.lower(), code)
+        except Exception:
+            codes = {}
+        _layout_codes = codes
+    return _layout_codes
+
+
+def _keycode(key: str):
+    """Keycode for a key name: characters via the active layout, else US positions."""
+    code = _layout_keycodes().get(key) if len(key) == 1 else None
+    return code if code is not None else _KEYCODES.get(key)
 
 
 def _norm_combo(s: str):
@@ -28,17 +93,49 @@ def _norm_combo(s: str):
     return (frozenset(mods), key)
 
 
+def _compile_combo(s: str):
+    """
+    "Shift+Cmd+V" => (modifier mask, keycode), the key the monitor probes.
+    Raises ValueError for unknown keys or modifiers.
+    """
+    mods, key = _norm_combo(s)
+    unknown = [m for m in mods if m not in _MOD_BITS]
+    code = _keycode(key)
+    if unknown or code is None:
+        raise ValueError("unsupported hotkey %r" % s)
+    mask = 0
+    for m in mods:
+        mask |= _MOD_BITS[m]
+    return (mask, code)
+
+
+def _compile_sequence(combo: str):
+    """Chord "cmd+k cmd+c" (space- or comma-separated steps) => tuple of keys."""
+    steps = [p for p in str(combo).replace(",", " ").split() if p]
+    if not steps:
+        raise ValueError("empty hotkey")
+    return tuple(_compile_combo(step) for step in steps)
+
+
 class EventManager:
     def __init__(self):
         # Registered callbacks and polling conditions
         self._handlers = {}  # イベント名 -> [ハンドラ関数リスト]
         self._conditions = {}  # イベント名 -> [発火条件関数リスト]
         # Hotkey support
-        self._hotkeys = {}  # (mods, key) -> event_name
+        self._hotkeys = {}  # combo -> event_name（配列が変わったらキーコードを引き直す）
+        # 監視側が引くテーブル: (mask, keycode) -> event_name または次の段の dict
+        self._keymap = {}
+        self._chord = None  # コードの途中なら (次の段, 期限)
+        self._hotkey_queue = queue.SimpleQueue()
+        self._hotkey_thread = None
         self._hotkey_monitors_installed = False
         self._global_monitor = None
         self._local_monitor = None
+        self._layout_observer = None
         self._debug_keys = os.getenv("COPYBENTO_DEBUG_KEYS") == "1"
+        # Library/profiling.py の cprofile モードが設定する（ハンドラを cProfile で実行）
+        self.profiler = None
 
     def event(self, name):
         """デコレーターでイベント処理登録"""
@@ -55,44 +152,90 @@ class EventManager:
 
     # ---- Hotkeys ----
     def register_hotkey(self, combo: str, event_name: str):
-        """Register a hotkey like 'shift+cmd+v' to trigger an event name."""
+        """
+        Register a hotkey like 'shift+cmd+v' (or a chord like 'cmd+k cmd+c')
+        to trigger an event name. Character keys are the keys that type that
+        character in the active keyboard layout ("z" on AZERTY is the key
+        labelled Z, where US has W); characters the layout lacks, and every
+        key without Quartz, fall back to the US physical position.
+        """
+        try:
+            _compile_sequence(combo)
+        except ValueError as e:
+            logger.warning("Hotkey not registered: %s", e)
+            return
         print(f"Register hotkey: {combo} -> {event_name}")
-        self._hotkeys[_norm_combo(combo)] = event_name
+        self._hotkeys[combo] = event_name
+        self._keymap = self._build_keymap()
+        self._start_hotkey_worker()
+
+    def refresh_keyboard_layout(self):
+        """Re-resolve hotkey keycodes (called when the input source changes)."""
+        global _layout_codes
+        _layout_codes = None
+        self._keymap = self._build_keymap()
+
+    def _build_keymap(self):
+        root = {}
+        for combo, event_name in self._hotkeys.items():
+            seq = _compile_sequence(combo)
+            node = root
+            for key in seq[:-1]:
+                nxt = node.get(key)
+                if not isinstance(nxt, dict):
+                    if nxt is not None:
+                        logger.warning("Hotkey %s shadowed by a chord", nxt)
+                    nxt = node[key] = {}
+                node = nxt
+            if isinstance(node.get(seq[-1]), dict):
+                logger.warning("Hotkey %s shadowed by a chord", event_name)
+                continue
+            node[seq[-1]] = event_name
+        return root
 
     def _handle_key_event(self, ev):
+        # NSEvent の監視コールバック: 辞書を引くだけにして、処理はワーカーへ渡す
         try:
-            from Cocoa import (
-                NSEventModifierFlagCommand,
-                NSEventModifierFlagControl,
-                NSEventModifierFlagOption,
-                NSEventModifierFlagShift,
-            )
+            key = (int(ev.modifierFlags()) & _MOD_MASK, int(ev.keyCode()))
+        except Exception:
+            return
+        self._handle_key(key)
 
-            flags = int(ev.modifierFlags())
-            mods = set()
-            if flags & int(NSEventModifierFlagCommand):
-                mods.add("cmd")
-            if flags & int(NSEventModifierFlagControl):
-                mods.add("ctrl")
-            if flags & int(NSEventModifierFlagOption):
-                mods.add("alt")
-            if flags & int(NSEventModifierFlagShift):
-                mods.add("shift")
-            ch = (ev.charactersIgnoringModifiers() or "").lower()
-            key = ch[-1] if ch else ""
+    def _handle_key(self, key):
+        chord = self._chord
+        hit = None
+        if chord is not None:
+            self._chord = None
+            if time.monotonic() < chord[1]:
+                hit = chord[0].get(key)
+        if hit is None:
+            hit = self._keymap.get(key)
+        if hit is None:
             if self._debug_keys:
-                logging.getLogger(__name__).info(
-                    "KeyDown mods=%s key=%s", ",".join(sorted(mods)), key
-                )
-            event_name = self._hotkeys.get((frozenset(mods), key))
-            if event_name:
-                if self._debug_keys:
-                    logging.getLogger(__name__).info(
-                        "Trigger hotkey event: %s", event_name
-                    )
+                logger.info("KeyDown mask=%#x keycode=%d", *key)
+            return
+        if isinstance(hit, dict):
+            self._chord = (hit, time.monotonic() + CHORD_TIMEOUT)
+            return
+        self._hotkey_queue.put(hit)
+
+    def _start_hotkey_worker(self):
+        if self._hotkey_thread is not None:
+            return
+        self._hotkey_thread = threading.Thread(
+            target=self._hotkey_worker, name="hotkeys", daemon=True
+        )
+        self._hotkey_thread.start()
+
+    def _hotkey_worker(self):
+        while True:
+            event_name = self._hotkey_queue.get()
+            if self._debug_keys:
+                logger.info("Trigger hotkey event: %s", event_name)
+            try:
                 self.trigger(event_name)
-        except Exception:
-            pass
+            except Exception as e:
+                logger.exception("Hotkey handler for %s failed: %s", event_name, e)
 
     def install_hotkey_monitors_on_main_thread(self):
         if self._hotkey_monitors_installed:
@@ -120,13 +263,33 @@ class EventManager:
         except Exception:
             # Cocoaが利用できない場合は無視
             self._hotkey_monitors_installed = False
+            return
+        # 入力ソース（キーボード配列）が切り替わったらキーコードを引き直す
+        try:
+            from Foundation import NSDistributedNotificationCenter
+
+            center = NSDistributedNotificationCenter.defaultCenter()
+            self._layout_observer = center.addObserverForName_object_queue_usingBlock_(
+                "com.apple.Carbon.TISNotifySelectedKeyboardInputSourceChanged",
+                None,
+                None,
+                lambda note: self.refresh_keyboard_layout(),
+            )
+        except Exception:
+            pass
 
     def trigger(self, name, *args, **kwargs):
         """イベント発火"""
+        profiler = self.profiler
         for func in self._handlers.get(name, []):
-            func(*args, **kwargs)
+            if profiler is not None:
+                profiler.call(func, *args, **kwargs)
+            else:
+                func(*args, **kwargs)
 
     async def run(self, interval=0.5):
+        import asyncio
+
         while True:
             for name, conditions in self._conditions.items():
                 for cond in conditions:
@@ -0,0 +1,87 @@
+"""
+Encoded clipboard images.
+
+An image is encoded once (by the plugin that produced it, or by the
+pasteboard it was read from) and the same bytes are reused for the
+pasteboard write-back, the history file and the change detector.
+fit_pixels() applies the max-pixels cap used for oversized images.
+"""
+
+import hashlib
+import io
+from typing import Any, Dict, NamedTuple, Optional
+
+# 形式 -> (Pillow の format 名, 拡張子)
+FORMATS = {"png": ("PNG", ".png"), "tiff": ("TIFF", ".tiff")}
+
+
+def fingerprint(data: bytes) -> str:
+    """Digest of encoded image bytes (used to recognise a pasteboard image)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class EncodedImage(NamedTuple):
+    """Encoded bytes of an image: fmt is a key of FORMATS."""
+
+    fmt: str
+    data: bytes
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.data)
+
+    @property
+    def ext(self) -> str:
+        return FORMATS.get(self.fmt, ("", ".png"))[1]
+
+    def decode(self):
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(self.data))
+        img.load()
+        return img
+
+
+def fit_pixels(img, max_pixels: int):
+    """
+    Downscale img (keeping the aspect ratio) so that width * height fits in
+    max_pixels. Returns img itself when it already fits or max_pixels <= 0.
+    """
+    w, h = img.size
+    if max_pixels <= 0 or w * h <= max_pixels:
+        return img
+    from PIL import Image
+
+    scale = (max_pixels / float(w * h)) ** 0.5
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    # reducing_gap: 先に整数倍で縮小してから LANCZOS（速く、一時メモリも小さい）
+    return img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+
+def _encoder_settings() -> Dict[str, Any]:
+    try:
+        from . import settings as _settings
+
+        return _settings.get_image_encoder_settings()
+    except Exception:
+        return {"format": "png", "compress_level": 6, "optimize": False}
+
+
+def encode(img, options: Optional[Dict[str, Any]] = None) -> EncodedImage:
+    """Encode a PIL image with the configured (or given) encoder settings."""
+    opts = options if options is not None else _encoder_settings()
+    fmt = str(opts.get("format", "png")).lower()
+    if fmt not in FORMATS:
+        fmt = "png"
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(
+            buf,
+            "PNG",
+            compress_level=int(opts.get("compress_level", 6)),
+            optimize=bool(opts.get("optimize", False)),
+        )
+    else:
+        # 非圧縮 TIFF: エンコードはほぼコピーだがサイズは大きい
+        img.save(buf, "TIFF")
+    return EncodedImage(fmt, buf.getvalue())
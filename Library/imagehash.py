@@ -0,0 +1,131 @@
+"""
+Perceptual hashes for near-duplicate images.
+
+dhash() is a difference hash: the image is point-sampled down to a small
+grid (so a 4K/8K capture costs well under a millisecond), box-filtered to
+(size + 1) x size grey levels, and each bit records whether a cell is
+brighter than its right neighbour. Similar images give hashes with a small
+Hamming distance.
+
+BKTree indexes hashes by Hamming distance so the history can be searched
+for near-duplicates without comparing against every entry.
+"""
+
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# 1 セルあたりの点サンプル数（一辺）。大きいほど細部を拾うが遅い
+_SAMPLES = 32
+
+
+def dhash(img, size: int = 8) -> int:
+    """Difference hash of a PIL image as a size*size-bit integer."""
+    from PIL import Image
+
+    size = max(2, int(size))
+    grid = (size + 1, size)
+    small = img
+    if img.width > grid[0] * _SAMPLES or img.height > grid[1] * _SAMPLES:
+        # 全画素を読む縮小は 4K で数十 ms かかるので、先に点サンプリングする
+        small = img.resize((grid[0] * _SAMPLES, grid[1] * _SAMPLES), Image.NEAREST)
+    if small.mode != "L":
+        small = small.convert("L")
+    px = small.resize(grid, Image.BOX).tobytes()
+    bits = 0
+    for y in range(size):
+        row = px[y * grid[0] : (y + 1) * grid[0]]
+        for x in range(size):
+            bits = (bits << 1) | (row[x] > row[x + 1])
+    return bits
+
+
+def to_hex(value: int, size: int = 8) -> str:
+    return "%0*x" % ((size * size + 3) // 4, value)
+
+
+def from_hex(text: str) -> Optional[int]:
+    try:
+        return int(text, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes (Hamming metric), key -> hash.
+
+    remove() only marks the key; the tree is rebuilt once half of its
+    nodes are dead, so removal stays cheap on average.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None  # [hash, keys, {distance: child}]
+        self._hashes: Dict[Hashable, int] = {}
+        self._nodes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._hashes
+
+    def add(self, key: Hashable, value: int):
+        with self._lock:
+            if key in self._hashes:
+                self._remove(key)
+            self._hashes[key] = value
+            self._insert(key, value)
+
+    def remove(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """(distance, key) of live entries within max_distance, nearest first."""
+        out, seen = [], set()
+        with self._lock:
+            stack = [self._root] if self._root is not None else []
+            while stack:
+                node = stack.pop()
+                d = hamming(value, node[0])
+                if d <= max_distance:
+                    for k in node[1]:
+                        if k not in seen and self._hashes.get(k) == node[0]:
+                            seen.add(k)
+                            out.append((d, k))
+                for edge, child in node[2].items():
+                    if d - max_distance <= edge <= d + max_distance:
+                        stack.append(child)
+        out.sort(key=lambda r: r[0])
+        return out
+
+    def _insert(self, key, value):
+        self._nodes += 1
+        if self._root is None:
+            self._root = [value, [key], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [key], {}]
+                return
+            node = child
+
+    def _remove(self, key):
+        if self._hashes.pop(key, None) is None:
+            return
+        if self._nodes > 32 and len(self._hashes) * 2 < self._nodes:
+            entries = list(self._hashes.items())
+            self._root, self._nodes = None, 0
+            for k, v in entries:
+                self._insert(k, v)
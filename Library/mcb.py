@@ -2,13 +2,87 @@
 #
 # macOS専用のクリップボード操作モジュール
 # 依存: pyobjc, pillow
+#
+# ペーストボード本体は差し替え可能（set_backend）。AppKit が無い環境
+# （Linux でのベンチマークなど）では MemoryPasteboard が使われる。
+
+import logging
 
-from AppKit import NSPasteboard, NSStringPboardType, NSPasteboardTypePNG
-from AppKit import NSImage
-from Foundation import NSData
-from PIL import Image
+try:
+    from AppKit import NSPasteboard, NSStringPboardType, NSPasteboardTypePNG
+    from AppKit import NSPasteboardTypeTIFF
+    from Foundation import NSData
+except ImportError:  # AppKit なし: 型名は UTI 文字列で代用
+    NSPasteboard = NSData = None
+    NSStringPboardType = "NSStringPboardType"
+    NSPasteboardTypePNG = "public.png"
+    NSPasteboardTypeTIFF = "public.tiff"
 import io
 
+from .imagecodec import EncodedImage, encode
+
+logger = logging.getLogger(__name__)
+
+# EncodedImage.fmt -> ペーストボードの型（読み出しはこの順で試す）
+_IMAGE_TYPES = (("png", NSPasteboardTypePNG), ("tiff", NSPasteboardTypeTIFF))
+
+
+class MemoryPasteboard:
+    """
+    In-process stand-in for NSPasteboard (the subset MacClipboard uses).
+
+    changeCount() increases on clearContents(), like the real pasteboard.
+    Used for benchmarks and headless runs; install it with set_backend().
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._count = 0
+
+    def clearContents(self):
+        self._items.clear()
+        self._count += 1
+        return self._count
+
+    def changeCount(self):
+        return self._count
+
+    def setString_forType_(self, value, pb_type):
+        self._items[pb_type] = str(value)
+        return True
+
+    def stringForType_(self, pb_type):
+        value = self._items.get(pb_type)
+        return value if isinstance(value, str) else None
+
+    def setData_forType_(self, data, pb_type):
+        self._items[pb_type] = bytes(data)
+        return True
+
+    def dataForType_(self, pb_type):
+        value = self._items.get(pb_type)
+        return value if isinstance(value, bytes) else None
+
+
+_backend = None
+
+
+def set_backend(pasteboard):
+    """Use pasteboard (e.g. MemoryPasteboard()) instead of the system one; None resets."""
+    global _backend
+    _backend = pasteboard
+
+
+def _pasteboard():
+    global _backend
+    if _backend is not None:
+        return _backend
+    if NSPasteboard is None:
+        logger.warning("AppKit is not available; using an in-memory pasteboard")
+        _backend = MemoryPasteboard()
+        return _backend
+    return NSPasteboard.generalPasteboard()
+
 
 class MacClipboard:
     MARKER_TYPE = "org.copybento.source"
@@ -16,45 +90,78 @@ class MacClipboard:
     @staticmethod
     def get_text():
         """クリップボードからテキストを取得"""
-        pb = NSPasteboard.generalPasteboard()
+        pb = _pasteboard()
         return pb.stringForType_(NSStringPboardType)
 
     @staticmethod
     def set_text(text: str):
         """クリップボードにテキストをコピー"""
-        pb = NSPasteboard.generalPasteboard()
+        pb = _pasteboard()
         pb.clearContents()
         pb.setString_forType_(text, NSStringPboardType)
 
     @staticmethod
     def get_image():
         """クリップボードから画像を取得（Pillow Imageで返す）"""
-        pb = NSPasteboard.generalPasteboard()
+        pb = _pasteboard()
         data = pb.dataForType_(NSPasteboardTypePNG)
         if data is None:
             return None
+        from PIL import Image
+
         byte_array = bytes(data)
         return Image.open(io.BytesIO(byte_array))
 
     @staticmethod
-    def set_image(image: Image.Image):
-        """クリップボードに画像をコピー（Pillow Imageを受け取る）"""
-        pb = NSPasteboard.generalPasteboard()
-        pb.clearContents()
+    def get_image_data():
+        """クリップボードの画像をデコードせずに取得（EncodedImage、なければ None）"""
+        pb = _pasteboard()
+        for fmt, pb_type in _IMAGE_TYPES:
+            data = pb.dataForType_(pb_type)
+            if data is not None:
+                return EncodedImage(fmt, bytes(data))
+        return None
+
+    @staticmethod
+    def set_image(image, encoded: EncodedImage = None):
+        """
+        クリップボードに画像をコピー（Pillow Imageを受け取る）。
+        encoded があればそのバイト列をそのまま使い、再エンコードしない。
+        書き込んだ EncodedImage を返す。
+        """
+        if encoded is None:
+            # Pillow -> PNG バイト列
+            encoded = encode(image, {"format": "png"})
+        MacClipboard.set_image_data(encoded)
+        return encoded
 
-        # Pillow -> PNG バイト列
-        buf = io.BytesIO()
-        image.save(buf, format="PNG")
-        nsdata = NSData.dataWithBytes_length_(buf.getvalue(), len(buf.getvalue()))
+    @staticmethod
+    def set_image_data(encoded: EncodedImage):
+        """エンコード済みの画像をそのままクリップボードへ書き込む"""
+        pb = _pasteboard()
+        pb.clearContents()
+        pb_type = dict(_IMAGE_TYPES).get(encoded.fmt, NSPasteboardTypePNG)
+        if NSData is not None and _backend is None:
+            nsdata = NSData.dataWithBytes_length_(encoded.data, len(encoded.data))
+        else:
+            nsdata = encoded.data
 
         # NSData を NSPasteboard に書き込む
-        pb.setData_forType_(nsdata, NSPasteboardTypePNG)
+        pb.setData_forType_(nsdata, pb_type)
+
+    @staticmethod
+    def change_count():
+        """ペーストボードの変更カウンタ（書き換えのたびに増える）。"""
+        try:
+            return int(_pasteboard().changeCount())
+        except Exception:
+            return None
 
     @staticmethod
     def set_source_marker(source: str):
         """クリップボードに CopyBento 用のソースマーカーを付与（消去されるまで残る）。"""
         try:
-            pb = NSPasteboard.generalPasteboard()
+            pb = _pasteboard()
             pb.setString_forType_(str(source), MacClipboard.MARKER_TYPE)
         except Exception:
             pass
@@ -63,7 +170,7 @@ class MacClipboard:
     def get_source_marker():
         """CopyBento 用のソースマーカーを取得（なければ None）。"""
         try:
-            pb = NSPasteboard.generalPasteboard()
+            pb = _pasteboard()
             return pb.stringForType_(MacClipboard.MARKER_TYPE)
         except Exception:
             return None
@@ -1,13 +1,285 @@
+import ast
+import bisect
+import concurrent.futures
 import importlib.util
 import logging
 import os
+import threading
+import time
+from collections import deque
 from types import ModuleType
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from .imagecodec import EncodedImage
 
 
 logger = logging.getLogger(__name__)
 
 
+class PluginTimeout(Exception):
+    """Raised when a plugin's on_clipboard() exceeds the configured timeout."""
+
+
+class PluginBusy(Exception):
+    """Raised when a plugin's previous, timed-out call is still running."""
+
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+DATA_TYPES = ("text", "image")
+ROLES = ("transform", "observer")
+
+
+def _normalize_caps(types: Any, role: Any) -> Tuple[Tuple[str, ...], str]:
+    """Normalize TYPES / ROLE declarations (defaults: every type, transformer)."""
+    if isinstance(types, str):
+        types = (types,)
+    types = tuple(t for t in (types or ()) if t in DATA_TYPES)
+    role = str(role or "transform").lower()
+    if role not in ROLES:
+        role = "transform"
+    return types, role
+
+
+def _capabilities(mod: ModuleType) -> Tuple[Tuple[str, ...], str]:
+    return _normalize_caps(
+        getattr(mod, "TYPES", DATA_TYPES), getattr(mod, "ROLE", "transform")
+    )
+
+
+# ---- Manifest (static scan; plugins are not imported at startup) ----
+_MANIFEST_VERSION = 2
+_CAP_NAMES = ("NAME", "TYPES", "ROLE", "PROCESS_POOL", "WRITE_BACK", "CACHEABLE")
+HOOKS = ("on_clipboard", "on_startup")
+
+
+def _scan_plugin_file(path: str) -> Dict[str, Any]:
+    """Read NAME/TYPES/ROLE/PROCESS_POOL and hook names via ast (no import)."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    info: Dict[str, Any] = {"hooks": [], "dynamic": False}
+
+    def _visit(body):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if node.name in HOOKS:
+                    info["hooks"].append(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if (alias.asname or alias.name) in HOOKS:
+                        info["hooks"].append(alias.asname or alias.name)
+            elif isinstance(node, ast.Assign):
+                for tgt in node.targets:
+                    if not isinstance(tgt, ast.Name):
+                        continue
+                    if tgt.id in HOOKS:
+                        info["hooks"].append(tgt.id)
+                    elif tgt.id in _CAP_NAMES:
+                        try:
+                            info[tgt.id] = ast.literal_eval(node.value)
+                        except ValueError:
+                            # 実行しないと分からない値は読み込み時に確定させる
+                            info["dynamic"] = True
+            elif isinstance(node, ast.If):
+                _visit(node.body)
+                _visit(node.orelse)
+            elif isinstance(node, ast.Try):
+                _visit(node.body)
+                for h in node.handlers:
+                    _visit(h.body)
+                _visit(node.orelse)
+                _visit(node.finalbody)
+
+    _visit(tree.body)
+    info["hooks"] = sorted(set(info["hooks"]))
+    return info
+
+
+def _load_module(key: str, path: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(f"copybento_plugins.{key}", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError("Invalid spec for plugin: %s" % path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)  # type: ignore[attr-defined]
+    return mod
+
+
+# ---- Process pool support ----
+# 画像はパイプに画素を流さない。ペーストボードのエンコード済みバイト列があれば
+# それを渡し（ワーカー側でデコード）、無ければ（縮小後など）画素を共有メモリに置いて
+# 名前だけ渡す。結果の画素も共有メモリで返し、パイプに載るのはエンコード結果だけ。
+
+
+def _encode_value(data_type: str, value: Any, encoded: Optional[EncodedImage] = None):
+    if data_type != "image" or value is None:
+        return value
+    if encoded is not None:
+        return ("enc", encoded.fmt, encoded.data)
+    return _to_shm(value)
+
+
+def _to_shm(img) -> tuple:
+    from multiprocessing import shared_memory
+
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA")
+    data = img.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[: len(data)] = data
+    finally:
+        shm.close()
+    return ("shm", shm.name, img.mode, img.size, len(data))
+
+
+def _decode_value(data_type: str, payload: Any, unlink: bool = False):
+    """Value from _encode_value(); unlink frees a shared-memory block once read."""
+    if data_type != "image" or not isinstance(payload, tuple):
+        return payload
+    if payload[0] == "enc":
+        return EncodedImage(payload[1], payload[2]).decode()
+    if payload[0] == "shm":
+        from multiprocessing import shared_memory
+
+        from PIL import Image
+
+        _, name, mode, size, length = payload
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return Image.frombytes(mode, size, bytes(shm.buf[:length]))
+        finally:
+            shm.close()
+            if unlink:
+                shm.unlink()
+    return payload
+
+
+def _free_payload(payload: Any):
+    """Unlink the shared-memory block of a payload nobody will read."""
+    if isinstance(payload, tuple) and payload[:1] == ("shm",):
+        from multiprocessing import shared_memory
+
+        try:
+            shm = shared_memory.SharedMemory(name=payload[1])
+            shm.close()
+            shm.unlink()
+        except (OSError, ValueError):
+            pass
+
+
+_worker_modules: Dict[str, Tuple[float, ModuleType]] = {}
+
+
+def _pool_call(key: str, path: str, data_type: str, payload: Any):
+    """Entry point inside a pool worker: run one plugin on an encoded value."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0.0
+    cached = _worker_modules.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _load_module(key, path))
+        _worker_modules[path] = cached
+    out = cached[1].on_clipboard(data_type, _decode_value(data_type, payload))
+    if out is None:
+        return None
+    if out is PluginManager.SKIP or (isinstance(out, tuple) and out[0] == "skip"):
+        return ("skip", None)
+    if _is_result(out):
+        # 画素は共有メモリ、エンコード結果（あれば）はそのままパイプで返す
+        return (out[0], _encode_value(out[0], out[1]), _encoded_of(out))
+    return None
+
+
+def _is_result(out: Any) -> bool:
+    """(data_type, value) or ("image", image, EncodedImage)."""
+    return (
+        isinstance(out, tuple)
+        and len(out) in (2, 3)
+        and out[0] in ("text", "image")
+    )
+
+
+def _encoded_of(out: tuple) -> Optional[EncodedImage]:
+    if len(out) == 3 and out[0] == "image" and isinstance(out[2], EncodedImage):
+        return out[2]
+    return None
+
+
+def _discard_pool_result(fut):
+    try:
+        out = fut.result()
+    except Exception:
+        return
+    if out is not None and out[0] != "skip":
+        _free_payload(out[1])
+
+
+# _run_one() の戻り値: プラグインが例外/タイムアウトで失敗した
+_FAILED = object()
+
+
+class ProcessResult(tuple):
+    """
+    (data_type, value) returned by PluginManager.process, with extra flags:
+      - write_back: a WRITE_BACK plugin produced the value; the caller should
+        put it back on the pasteboard
+      - cached: served from the result cache
+      - encoded: EncodedImage of the image value when one is known (from the
+        plugin that produced it, or the pasteboard bytes if unchanged)
+    """
+
+    write_back = False
+    cached = False
+    encoded = None
+
+    @classmethod
+    def make(
+        cls, data_type: str, value: Any, write_back=False, cached=False, encoded=None
+    ):
+        r = cls((data_type, value))
+        r.write_back = write_back
+        r.cached = cached
+        r.encoded = encoded if data_type == "image" else None
+        return r
+
+
+class PluginStats:
+    """Wall-time accounting for a single plugin (recent window + totals)."""
+
+    def __init__(self, window: int = 200):
+        self.count = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.strikes = 0  # consecutive failed runs (exceptions)
+        self.timeout_strikes = 0  # consecutive timed-out runs
+        self.slow_strikes = 0  # consecutive slow runs (only with slow_strikes on)
+        self.max = 0.0
+        self.durations = deque(maxlen=window)
+
+    def record(self, elapsed: float):
+        self.count += 1
+        self.durations.append(elapsed)
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        vals = sorted(self.durations)
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "p50_ms": round(_percentile(vals, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(vals, 0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
 class PluginManager:
     """
     Simple plugin manager for CopyBento.
@@ -16,18 +288,132 @@ class PluginManager:
       - Define a callable `on_clipboard(data_type, value)`.
         * Return None to leave unchanged
         * Return ("text", new_text) or ("image", new_image) to modify
+        * Image plugins may return ("image", new_image, encoded) with an
+          imagecodec.EncodedImage of new_image; the caller then reuses those
+          bytes for the pasteboard and history instead of encoding again
         * Return PluginManager.SKIP or ("skip", None) to drop the event
       - Optional: NAME (str) for display/logging
+      - Optional: TYPES = ("image",) to receive only those data types
+        (default: all). TYPES = () means the plugin is never dispatched
+        (e.g. it only uses on_startup).
+      - Optional: ROLE = "observer" for plugins that never modify the value;
+        observers run on a thread pool in parallel with the transform chain
+        and their return value is ignored. Default ROLE is "transform".
+      - Capabilities are read statically into a cached manifest
+        (plugin_manifest.json), so keep NAME/TYPES/ROLE/PROCESS_POOL as
+        plain literals; modules are imported lazily on first use.
+      - Optional: WRITE_BACK = True if the caller should put the plugin's
+        result back on the pasteboard (see ProcessResult.write_back).
+      - Optional: CACHEABLE = False for plugins whose output is not a pure
+        function of the input and settings. Otherwise chain results are
+        cached by (payload digest, plugin set, settings version).
+      - Optional: PROCESS_POOL = True to run on_clipboard() in a worker
+        process (for CPU-heavy image plugins). Use process_async() so the
+        caller is not blocked; results are delivered in submission order.
+
+    Each call is timed. With a timeout configured (settings "plugin_runtime")
+    the call runs on a watchdog thread; max_strikes consecutive exceptions,
+    timeouts or (with slow_strikes on) slow runs trip a circuit breaker that
+    disables the plugin. Only a trip on exceptions is persisted through
+    Library/settings.py; timeouts and slow runs can come from a cold worker
+    pool or a huge input, so those trips last for the current session.
     """
 
     SKIP = object()
 
-    def __init__(self, plugin_dir: str):
+    def __init__(self, plugin_dir: str, lazy: bool = True):
         self.plugin_dir = plugin_dir
-        self.plugins: List[dict] = []  # {name, module, enabled}
+        self.lazy = lazy
+        self.plugins: List[dict] = []  # {name, key, path, module, enabled, ...}
+        self._load_lock = threading.RLock()
+        self._manifest: Dict[str, Any] = {}
+        self._event_manager = None
+        self._watch_thread = None
+        self._watch_stop = threading.Event()
+        self.runtime = self._load_runtime()
+        self._pool = None  # ProcessPoolExecutor (lazy)
+        self._dispatcher = None  # ThreadPoolExecutor for process_async (lazy)
+        self._observers = None  # ThreadPoolExecutor for observer plugins (lazy)
+        # data_type -> {"transform": [(index, plugin)], "observer": [...]}
+        self._dispatch: Dict[str, Dict[str, List[Tuple[int, dict]]]] = {}
+        self._pool_types = frozenset()
+        self._chain_sig: Dict[str, tuple] = {}
+        self._cacheable_types = frozenset()
+        self.cache = self._make_cache()
+        self._pool_lock = threading.Lock()
+        self._inproc_lock = threading.RLock()  # in-process plugins run one at a time
+        self._stats_lock = threading.RLock()
+        self._order_lock = threading.Lock()
+        self._next_seq = 0
+        self._deliver_seq = 0
+        self._done: Dict[int, tuple] = {}
+        self._ready: deque = deque()  # 順番が来た (result, callback)
+        self._deliver_lock = threading.Lock()  # コールバックは _order_lock の外で 1 つずつ
+        self._settings_version = None
         self.load_all()
+        self.sync_settings()
 
-    def load_all(self):
+    def sync_settings(self):
+        """
+        Re-apply settings.json when it changed (GUI toggles, plugin_runtime
+        edits): the runtime limits are re-read and each plugin's persisted
+        enabled flag is applied if it differs from the one applied last time
+        (so a session-only trip is not undone by an unrelated edit).
+        Re-enabling a plugin clears its strikes. pool_workers takes effect
+        for new calls; running ones finish on the old pool.
+        """
+        try:
+            from . import settings as _settings
+
+            version = _settings.get_version()
+            if version == self._settings_version:
+                return
+            self._settings_version = version
+            persisted = _settings.get_plugins_enabled()
+        except Exception:
+            return
+        runtime = self._load_runtime()
+        if runtime.get("pool_workers") != self.runtime.get("pool_workers"):
+            with self._pool_lock:
+                old, self._pool = self._pool, None
+            if old is not None:
+                old.shutdown(wait=False)
+        self.runtime = runtime
+        changed = False
+        with self._load_lock:
+            for p in self.plugins:
+                desired = persisted.get(p["name"], persisted.get(p["key"]))
+                if desired is None or bool(desired) == p.get("_persisted"):
+                    continue
+                p["_persisted"] = bool(desired)
+                if bool(desired) != bool(p.get("enabled", True)):
+                    self._set_enabled(p, bool(desired))
+                    changed = True
+            if changed:
+                self._rebuild_dispatch()
+
+    @staticmethod
+    def _set_enabled(p: dict, enabled: bool):
+        p["enabled"] = enabled
+        if enabled:
+            # 再び有効にしたら連続失敗の数え直し（読み込み失敗なら次の呼び出しで再試行）
+            stats: PluginStats = p["stats"]
+            stats.strikes = 0
+            stats.timeout_strikes = 0
+            stats.slow_strikes = 0
+            p.pop("tripped", None)
+            p.pop("load_error", None)
+
+    @staticmethod
+    def _load_runtime() -> Dict[str, Any]:
+        try:
+            from . import settings as _settings
+
+            return _settings.get_plugin_runtime()
+        except Exception:
+            return {"timeout": 0, "slow_threshold": 0, "max_strikes": 0, "slow_strikes": False}
+
+    def _plugin_dirs(self) -> List[str]:
         # Collect plugin directories: bundled and user config dir
         dirs = []
         if os.path.isdir(self.plugin_dir):
@@ -40,72 +426,720 @@ class PluginManager:
                 dirs.append(user_dir)
         except Exception:
             pass
+        return dirs
+
+    @staticmethod
+    def _make_cache():
+        try:
+            from . import settings as _settings
+            from .cache import ResultCache
+
+            conf = _settings.get_result_cache_settings()
+            if not conf.get("enabled", True):
+                return None
+            return ResultCache(
+                max_bytes=int(conf.get("max_bytes")),
+                spill_bytes=int(conf.get("spill_bytes")),
+                disk_dir=os.path.join(_settings.get_config_dir(), "cache", "results"),
+                disk_max_bytes=int(conf.get("disk_max_bytes")),
+            )
+        except Exception as e:
+            logger.warning("Result cache disabled: %s", e)
+            return None
+
+    def load_all(self):
+        """
+        Register plugins from the cached manifest without importing them.
+
+        Files whose mtime/size changed are re-scanned statically (ast); the
+        module itself is imported on first use (see _ensure_loaded), so
+        disabled plugins are never imported. With lazy=False every plugin is
+        imported immediately (old behaviour, used for comparison).
+        """
+        dirs = self._plugin_dirs()
         if not dirs:
             logger.info("No plugin directories found")
             return
 
+        manifest = self._read_manifest()
+        fresh = self._scan_dirs(dirs, manifest)
+        for entry in fresh.values():
+            if "on_clipboard" in entry["hooks"]:
+                self.plugins.append(self._record_from_entry(entry))
+        self._manifest = fresh
+        if fresh != manifest:
+            self._write_manifest(fresh)
+        if not self.lazy:
+            for p in self.plugins:
+                self._ensure_loaded(p)
+        self._rebuild_dispatch()
+
+    def _scan_dirs(self, dirs: List[str], manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """path -> manifest entry for every plugin file (cached entries reused)."""
+        fresh: Dict[str, Dict[str, Any]] = {}
         for d in dirs:
-            for fname in sorted(os.listdir(d)):
+            try:
+                fnames = sorted(os.listdir(d))
+            except OSError:
+                continue
+            for fname in fnames:
                 if not fname.endswith(".py") or fname.startswith("_"):
                     continue
                 path = os.path.join(d, fname)
                 name = os.path.splitext(fname)[0]
+                try:
+                    entry = self._manifest_entry(manifest, name, path)
+                except OSError:
+                    continue  # 途中で消えた
+                fresh[path] = entry
+        return fresh
+
+    @staticmethod
+    def _manifest_entry(manifest: Dict[str, Any], key: str, path: str) -> Dict[str, Any]:
+        st = os.stat(path)
+        cached = manifest.get(path)
+        if (
+            cached
+            and cached.get("mtime") == st.st_mtime
+            and cached.get("size") == st.st_size
+        ):
+            return cached
+        try:
+            info = _scan_plugin_file(path)
+        except Exception as e:
+            # 構文エラーなど: mtime が変わるまで再スキャンしない
+            logger.exception("Failed to scan plugin %s: %s", path, e)
+            return {
+                "key": key,
+                "path": path,
+                "mtime": st.st_mtime,
+                "size": st.st_size,
+                "hooks": [],
+                "error": str(e),
+            }
+        if "on_clipboard" not in info["hooks"]:
+            logger.warning("Plugin %s missing on_clipboard(); skipped", path)
+        types, role = _normalize_caps(
+            info.get("TYPES", DATA_TYPES), info.get("ROLE", "transform")
+        )
+        return {
+            "key": key,
+            "name": str(info.get("NAME", key)),
+            "path": path,
+            "mtime": st.st_mtime,
+            "size": st.st_size,
+            "types": list(types),
+            "role": role,
+            "pool": bool(info.get("PROCESS_POOL", False)),
+            "write_back": bool(info.get("WRITE_BACK", False)),
+            "cacheable": bool(info.get("CACHEABLE", True)),
+            "hooks": info["hooks"],
+            "dynamic": bool(info["dynamic"]),
+        }
+
+    @staticmethod
+    def _record_from_entry(entry: Dict[str, Any]) -> dict:
+        return {
+            "name": entry["name"],  # display name (NAME)
+            "key": entry["key"],  # module basename
+            "path": entry["path"],
+            "module": None,  # imported on first use
+            "enabled": True,
+            "pool": entry["pool"],
+            "write_back": entry["write_back"],
+            "cacheable": entry["cacheable"],
+            "types": tuple(entry["types"]),
+            "role": entry["role"],
+            "hooks": tuple(entry["hooks"]),
+            "dynamic": entry["dynamic"],
+            "entry": entry,  # manifest entry this record was built from
+            "stats": PluginStats(),
+        }
+
+    @staticmethod
+    def _read_manifest() -> Dict[str, Any]:
+        try:
+            from . import settings as _settings
 
-                try:  # --- IGNORE ---
-                    print(
-                        f"Loading plugin module: {name} from {path}"
-                    )  # --- IGNORE ---
-                    spec = importlib.util.spec_from_file_location(
-                        f"copybento_plugins.{name}", path
+            data = _settings.get_plugin_manifest()
+            if data.get("version") == _MANIFEST_VERSION:
+                return dict(data.get("plugins", {}))
+        except Exception:
+            pass
+        return {}
+
+    @staticmethod
+    def _write_manifest(entries: Dict[str, Any]):
+        try:
+            from . import settings as _settings
+
+            _settings.set_plugin_manifest(
+                {"version": _MANIFEST_VERSION, "plugins": entries}
+            )
+        except Exception:
+            pass
+
+    def _ensure_loaded(self, p: dict):
+        """Import the plugin module on first use. Returns None on failure."""
+        mod = p.get("module")
+        if mod is not None:
+            return mod
+        with self._load_lock:
+            if p.get("module") is not None:
+                return p["module"]
+            try:
+                print(f"Loading plugin module: {p['key']} from {p['path']}")
+                mod = _load_module(p["key"], p["path"])
+            except Exception as e:
+                logger.exception("Failed to load plugin %s: %s", p["path"], e)
+                p["enabled"] = False
+                p["load_error"] = str(e)
+                self._rebuild_dispatch()
+                return None
+            self._attach_module(p, mod)
+            if p.get("dynamic"):
+                self._rebuild_dispatch()
+            return mod
+
+    @staticmethod
+    def _attach_module(p: dict, mod: ModuleType):
+        if p.get("dynamic"):
+            types, role = _capabilities(mod)
+            p["types"], p["role"] = types, role
+            p["pool"] = bool(getattr(mod, "PROCESS_POOL", False))
+            p["write_back"] = bool(getattr(mod, "WRITE_BACK", False))
+            p["cacheable"] = bool(getattr(mod, "CACHEABLE", True))
+            p["name"] = getattr(mod, "NAME", p["name"])
+        p["module"] = mod
+        logger.info("Loaded plugin: %s", p["name"])
+
+    # ---- Hot reload ----
+    def reload_changed(self) -> List[str]:
+        """
+        Re-scan the plugin directories (mtime/size only) and swap in changed,
+        added or removed plugins. Returns the changed paths.
+
+        Plugins that were already imported are re-imported before the swap; if
+        that fails, or the changed file does not even parse (a half-saved
+        edit), the old record stays in place with its module, stats and
+        enabled state, and the file is picked up again on its next change. The new plugin list and
+        dispatch table replace the old ones by reference, so a capture in
+        flight finishes on the old table and the next one sees the new one.
+        Unchanged plugins keep their module, stats and enabled state.
+        """
+        self.sync_settings()
+        with self._load_lock:
+            fresh = self._scan_dirs(self._plugin_dirs(), self._manifest)
+            changed = sorted(
+                path
+                for path in set(fresh) | set(self._manifest)
+                if fresh.get(path) is not self._manifest.get(path)
+            )
+            if not changed:
+                return []
+            old = {p["path"]: p for p in self.plugins}
+            persisted = self._persisted_enabled()
+            new_plugins: List[dict] = []
+            added: List[dict] = []
+            for path, entry in fresh.items():
+                prev = old.get(path)
+                if prev is not None and prev["entry"] is entry:
+                    new_plugins.append(prev)
+                    continue
+                if prev is not None and entry.get("error"):
+                    logger.warning("Plugin %s does not parse; keeping old", path)
+                    new_plugins.append(prev)
+                    continue
+                if "on_clipboard" not in entry["hooks"]:
+                    continue
+                rec = self._record_from_entry(entry)
+                if prev is None:
+                    rec["enabled"] = rec["_persisted"] = bool(
+                        persisted.get(rec["name"], persisted.get(rec["key"], True))
                     )
-                    if spec is None or spec.loader is None:
-                        raise RuntimeError("Invalid spec for plugin: %s" % path)
-                    mod = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(mod)  # type: ignore[attr-defined]
-                    if hasattr(mod, "on_clipboard") and callable(
-                        getattr(mod, "on_clipboard")
-                    ):
-                        display = getattr(mod, "NAME", name)
-                        self.plugins.append(
-                            {
-                                "name": display,  # display name (NAME)
-                                "key": name,  # module basename
-                                "module": mod,
-                                "enabled": True,
-                            }
-                        )
-                        logger.info("Loaded plugin: %s", display)
-                    else:
-                        logger.warning(
-                            "Plugin %s missing on_clipboard(); skipped", fname
-                        )
+                    added.append(rec)
+                else:
+                    rec["_persisted"] = prev.get("_persisted")
+                    if not prev.get("load_error"):
+                        rec["enabled"] = prev.get("enabled", True)
+                if prev is not None and prev.get("module") is not None:
+                    try:
+                        self._attach_module(rec, _load_module(rec["key"], path))
+                    except Exception as e:
+                        logger.exception("Reload of %s failed; keeping old: %s", path, e)
+                        new_plugins.append(prev)
+                        continue
+                new_plugins.append(rec)
+            self.plugins = new_plugins
+            self._manifest = fresh
+            self._rebuild_dispatch()
+            self._write_manifest(fresh)
+            logger.info("Plugins reloaded: %s", ", ".join(changed))
+        # 新しく追加されたプラグインだけ on_startup を呼ぶ（既存のものは二重登録になるため呼ばない）
+        if self._event_manager is not None:
+            self._startup(added, self._event_manager)
+        return changed
+
+    @staticmethod
+    def _persisted_enabled() -> Dict[str, bool]:
+        try:
+            from . import settings as _settings
+
+            return _settings.get_plugins_enabled()
+        except Exception:
+            return {}
+
+    def start_watching(self, interval: float = None):
+        """Poll plugin directories for changes on a daemon thread."""
+        if interval is None:
+            interval = float(self.runtime.get("reload_interval") or 0)
+        if interval <= 0 or self._watch_thread is not None:
+            return
+
+        def _loop():
+            while not self._watch_stop.wait(interval):
+                try:
+                    self.reload_changed()
                 except Exception as e:
-                    logger.exception("Failed to load plugin %s: %s", fname, e)
+                    logger.exception("Plugin reload failed: %s", e)
 
-    def process(self, data_type: str, value: Any):
-        current_type, current_value = data_type, value
-        for p in self.plugins:
-            if not p.get("enabled", True):
+        self._watch_thread = threading.Thread(
+            target=_loop, name="plugin-watch", daemon=True
+        )
+        self._watch_thread.start()
+
+    def run_startup(self, event_manager):
+        """Call on_startup(event_manager) for enabled plugins that define it."""
+        self._event_manager = event_manager
+        self._startup(self.plugins, event_manager)
+
+    def _startup(self, plugins: List[dict], event_manager):
+        for p in plugins:
+            if not p.get("enabled", True) or "on_startup" not in p.get("hooks", ()):
                 continue
-            mod: ModuleType = p["module"]
             try:
-                out = mod.on_clipboard(current_type, current_value)  # type: ignore[attr-defined]
+                mod = self._ensure_loaded(p)
+                if mod is not None and callable(getattr(mod, "on_startup", None)):
+                    mod.on_startup(event_manager)
+            except Exception as e:
+                logger.exception("Plugin %s on_startup failed: %s", p["name"], e)
+
+    def _rebuild_dispatch(self):
+        """Build the per-type dispatch table from enabled plugins."""
+        with self._load_lock:
+            table = {t: {r: [] for r in ROLES} for t in DATA_TYPES}
+            for i, p in enumerate(self.plugins):
+                if not p.get("enabled", True):
+                    continue
+                for t in p.get("types", DATA_TYPES):
+                    table[t][p.get("role", "transform")].append((i, p))
+            pool_types = frozenset(
+                t
+                for t in DATA_TYPES
+                if any(p.get("pool") for _, p in table[t]["transform"])
+            )
+            # 変換チェーンの構成（キャッシュキーの一部）。コードが変われば mtime も変わる
+            chain_sig = {
+                t: tuple(
+                    (p["key"], p.get("entry", {}).get("mtime"))
+                    for _, p in table[t]["transform"]
+                )
+                for t in DATA_TYPES
+            }
+            cacheable = frozenset(
+                t
+                for t in DATA_TYPES
+                if table[t]["transform"]
+                and all(p.get("cacheable", True) for _, p in table[t]["transform"])
+            )
+            # 参照の差し替えだけで切り替える（処理中のスレッドは古い表を使い切る）
+            self._dispatch = table
+            self._pool_types = pool_types
+            self._chain_sig = chain_sig
+            self._cacheable_types = cacheable
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                import multiprocessing
+
+                workers = max(1, int(self.runtime.get("pool_workers") or 1))
+                # spawn: AppKit/PyObjC は fork 後に安全でないため
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _call_pool(
+        self, p: dict, data_type: str, value: Any, timeout: float, encoded=None
+    ):
+        payload = _encode_value(data_type, value, encoded)
+        try:
+            fut = self._get_pool().submit(
+                _pool_call, p["key"], p["path"], data_type, payload
+            )
+            try:
+                out = fut.result(timeout if timeout > 0 else None)
+            except concurrent.futures.TimeoutError:
+                # 結果は誰も読まないので、終わったら共有メモリを解放する
+                fut.add_done_callback(_discard_pool_result)
+                raise PluginTimeout("exceeded %.2fs (worker)" % timeout)
+            except concurrent.futures.BrokenExecutor:
+                with self._pool_lock:
+                    self._pool = None
+                raise
+        finally:
+            _free_payload(payload)
+        if out is None:
+            return None
+        if out[0] == "skip":
+            return self.SKIP
+        value = _decode_value(out[0], out[1], unlink=True)
+        return (out[0], value) if out[2] is None else (out[0], value, out[2])
+
+    def _call(self, p: dict, data_type: str, value: Any, encoded=None):
+        """Run on_clipboard(), on a watchdog thread when a timeout is set."""
+        timeout = float(self.runtime.get("timeout") or 0)
+        if p.get("pool"):
+            # ワーカー側で import するので親プロセスでは読み込まない
+            return self._call_pool(p, data_type, value, timeout, encoded)
+        mod = self._ensure_loaded(p)
+        if mod is None:
+            raise RuntimeError("plugin failed to load")
+        func = mod.on_clipboard
+        if timeout <= 0:
+            return func(data_type, value)
+        # A previous call that timed out may still be running; don't pile up.
+        prev = p.get("_thread")
+        if prev is not None and prev.is_alive():
+            raise PluginBusy("previous call still running")
+        box = {}
+
+        def _target():
+            try:
+                box["out"] = func(data_type, value)
+            except BaseException as e:  # re-raised on the caller side
+                box["err"] = e
+
+        t = threading.Thread(
+            target=_target, name=f"plugin-{p.get('key')}", daemon=True
+        )
+        p["_thread"] = t
+        t.start()
+        t.join(timeout)
+        if t.is_alive():
+            raise PluginTimeout("exceeded %.2fs" % timeout)
+        if "err" in box:
+            raise box["err"]
+        return box.get("out")
+
+    def _strike(self, p: dict, reason: str):
+        stats: PluginStats = p["stats"]
+        if reason == "slow":
+            stats.slow_strikes += 1
+            strikes = stats.slow_strikes
+        elif reason == "timeout":
+            stats.timeout_strikes += 1
+            strikes = stats.timeout_strikes
+        else:
+            stats.strikes += 1
+            strikes = stats.strikes
+        limit = int(self.runtime.get("max_strikes") or 0)
+        if limit <= 0 or strikes < limit:
+            return
+        p["enabled"] = False
+        p["tripped"] = reason
+        logger.warning(
+            "Plugin %s disabled by circuit breaker after %d strikes (%s)",
+            p["name"],
+            strikes,
+            reason,
+        )
+        self._rebuild_dispatch()
+        if reason != "error":
+            # 遅い・タイムアウトはワーカーの起動直後や大きな入力でも起きるので、
+            # 保存せず再起動（または GUI で一度無効→有効）で戻るようにする
+            return
+        try:
+            from . import settings as _settings
+
+            p["_persisted"] = False
+            _settings.set_plugins_enabled({p["name"]: False, p["key"]: False})
+        except Exception:
+            pass
+
+    def _run_one(
+        self, p: dict, data_type: str, value: Any, exclusive: bool = True, encoded=None
+    ):
+        """
+        Call one plugin with timing/breaker accounting. Errors yield _FAILED.
+        encoded (the EncodedImage of value, if known) is what a pool worker gets.
+        """
+        stats: PluginStats = p["stats"]
+        slow = float(self.runtime.get("slow_threshold") or 0)
+        t0 = time.perf_counter()
+        try:
+            if p.get("pool") or not exclusive:
+                out = self._call(p, data_type, value, encoded)
+            else:
+                with self._inproc_lock:
+                    out = self._call(p, data_type, value, encoded)
+        except PluginBusy as e:
+            # 今回は実行していないので、タイムアウトとしては数えずに飛ばすだけ
+            logger.warning("Plugin %s skipped: %s", p["name"], e)
+            return _FAILED
+        except PluginTimeout as e:
+            with self._stats_lock:
+                stats.record(time.perf_counter() - t0)
+                stats.timeouts += 1
+                self._strike(p, "timeout")
+            logger.warning("Plugin %s timed out: %s", p["name"], e)
+            return _FAILED
+        except Exception as e:
+            with self._stats_lock:
+                stats.record(time.perf_counter() - t0)
+                stats.failures += 1
+                self._strike(p, "error")
+            logger.exception("Plugin %s failed: %s", p["name"], e)
+            return _FAILED
+        elapsed = time.perf_counter() - t0
+        with self._stats_lock:
+            stats.record(elapsed)
+            stats.strikes = 0
+            stats.timeout_strikes = 0
+            if slow > 0 and elapsed > slow:
+                logger.warning("Plugin %s slow: %.1f ms", p["name"], elapsed * 1000)
+                if self.runtime.get("slow_strikes"):
+                    self._strike(p, "slow")
+            else:
+                stats.slow_strikes = 0
+        return out
+
+    def process(self, data_type: str, value: Any, encoded: EncodedImage = None):
+        """
+        Run the chain. encoded is the pasteboard encoding of an image value,
+        passed through on the result while no plugin replaces the image.
+        """
+        self.sync_settings()
+        table = self._dispatch
+        entry = table.get(data_type)
+        if entry is None:
+            return ProcessResult.make(data_type, value, encoded=encoded)
+        if entry["observer"]:
+            self._notify_observers(entry["observer"], data_type, value, encoded)
+        chain = entry["transform"]
+        if not chain:
+            return ProcessResult.make(data_type, value, encoded=encoded)
+        cache_key = self._cache_key(data_type, value, encoded)
+        if cache_key is not None:
+            hit = self.cache.get(cache_key)
+            if hit == "skip":
+                logger.info("Clipboard item skipped (cached)")
+                return self.SKIP
+            if hit is not None:
+                return ProcessResult.make(
+                    hit[0],
+                    hit[1],
+                    write_back=any(p.get("write_back") for _, p in chain),
+                    cached=True,
+                    encoded=hit[2],
+                )
+        current_type, current_value = data_type, value
+        write_back = False
+        try:
+            i = 0
+            while i < len(chain):
+                idx, p = chain[i]
+                i += 1
+                if not p.get("enabled", True):  # tripped mid-chain
+                    continue
+                out = self._run_one(p, current_type, current_value, encoded=encoded)
+                if out is _FAILED:
+                    # 失敗した結果はキャッシュしない（次回は再実行する）
+                    cache_key = None
+                    continue
                 if out is None:
                     continue
                 # Allow sentinel or tuple ('skip', None)
                 if out is self.SKIP or (isinstance(out, tuple) and out[0] == "skip"):
                     logger.info("Plugin %s skipped the clipboard item", p["name"])
+                    if cache_key is not None:
+                        self.cache.put(cache_key, "skip")
                     return self.SKIP
-                if (
-                    isinstance(out, tuple)
-                    and len(out) == 2
-                    and out[0] in ("text", "image")
-                ):
-                    current_type, current_value = out
-            except Exception as e:
-                logger.exception("Plugin %s failed: %s", p["name"], e)
-                continue
-        return (current_type, current_value)
+                if _is_result(out):
+                    if out[0] != current_type:
+                        # 型が変わったら、その型の表で後続プラグインから再開
+                        chain = table.get(out[0], {}).get("transform", [])
+                        i = bisect.bisect_right([e[0] for e in chain], idx)
+                    current_type, current_value = out[0], out[1]
+                    # 値が差し替わったら元のエンコードは使えない
+                    encoded = _encoded_of(out)
+                    write_back = write_back or bool(p.get("write_back"))
+            if cache_key is not None:
+                self.cache.put(cache_key, (current_type, current_value, encoded))
+            return ProcessResult.make(
+                current_type, current_value, write_back=write_back, encoded=encoded
+            )
+        finally:
+            self.save_stats()
+
+    def _cache_key(self, data_type: str, value: Any, encoded=None):
+        """(payload digest, plugin set, settings version) or None if uncached."""
+        if self.cache is None or data_type not in self._cacheable_types:
+            return None
+        from .cache import payload_digest
+
+        digest = payload_digest(data_type, value, encoded)
+        if digest is None:
+            return None
+        try:
+            from . import settings as _settings
+
+            version = _settings.get_version()
+        except Exception:
+            version = None
+        return (digest, self._chain_sig.get(data_type), version)
+
+    def _notify_observers(self, observers, data_type: str, value: Any, encoded=None):
+        pool = self._get_observer_pool()
+        for _, p in observers:
+            pool.submit(self._run_observer, p, data_type, value, encoded)
+
+    def _run_observer(self, p: dict, data_type: str, value: Any, encoded=None):
+        if not p.get("enabled", True):
+            return
+        self._run_one(p, data_type, value, exclusive=False, encoded=encoded)
+        self.save_stats()
+
+    def _get_observer_pool(self):
+        with self._pool_lock:
+            if self._observers is None:
+                self._observers = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="plugin-observer"
+                )
+            return self._observers
+
+    def renders_async(self, data_type: str) -> bool:
+        """True if process_async() runs this type's chain off the calling thread."""
+        return data_type in self._pool_types
+
+    def process_async(
+        self, data_type: str, value: Any, callback, encoded: EncodedImage = None
+    ):
+        """
+        Run the plugin chain off the calling thread and call callback(result).
+
+        Callbacks fire one at a time in submission order. When no enabled
+        plugin uses the process pool and nothing is pending, the chain runs
+        inline (same cost as process()). Callbacks run without any lock that
+        this method takes, so a callback may submit again without deadlocking.
+        """
+        with self._order_lock:
+            idle = (
+                self._deliver_seq == self._next_seq
+                and not self._ready
+                and not self._deliver_lock.locked()
+            )
+        if idle and data_type not in self._pool_types:
+            callback(self.process(data_type, value, encoded))
+            return
+        with self._order_lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._get_dispatcher().submit(
+            self._run_ordered, seq, data_type, value, callback, encoded
+        )
+
+    def _get_dispatcher(self):
+        with self._pool_lock:
+            if self._dispatcher is None:
+                workers = max(1, int(self.runtime.get("pool_workers") or 1))
+                self._dispatcher = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="plugin-dispatch"
+                )
+            return self._dispatcher
+
+    def _run_ordered(
+        self, seq: int, data_type: str, value: Any, callback, encoded=None
+    ):
+        try:
+            result = self.process(data_type, value, encoded)
+        except Exception as e:
+            logger.exception("Plugin chain failed: %s", e)
+            result = ProcessResult.make(data_type, value, encoded=encoded)
+        # 先に投入されたものが終わるまで結果を保留して順番に渡す
+        with self._order_lock:
+            self._done[seq] = (result, callback)
+            while self._deliver_seq in self._done:
+                self._ready.append(self._done.pop(self._deliver_seq))
+                self._deliver_seq += 1
+        self._deliver_ready()
+
+    def _deliver_ready(self):
+        """
+        Call queued callbacks in order, outside _order_lock.
+
+        Only one thread delivers at a time; a thread that finds delivery in
+        progress leaves its results to that thread instead of waiting.
+        """
+        # 解放する直前に積まれた分は外側のループで拾い直す
+        while self._ready:
+            if not self._deliver_lock.acquire(blocking=False):
+                return
+            try:
+                while True:
+                    with self._order_lock:
+                        if not self._ready:
+                            break
+                        res, cb = self._ready.popleft()
+                    try:
+                        cb(res)
+                    except Exception as e:
+                        logger.exception("Plugin result callback failed: %s", e)
+            finally:
+                self._deliver_lock.release()
+
+    def shutdown(self):
+        self._watch_stop.set()
+        self.save_stats()
+        try:
+            from . import settings as _settings
+
+            _settings.flush()
+        except Exception:
+            pass
+        with self._pool_lock:
+            if self._dispatcher is not None:
+                self._dispatcher.shutdown(wait=False)
+                self._dispatcher = None
+            if self._observers is not None:
+                self._observers.shutdown(wait=False)
+                self._observers = None
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Snapshot of per-plugin stats keyed by module key."""
+        out = {}
+        for p in self.plugins:
+            snap = p["stats"].snapshot()
+            snap["name"] = p["name"]
+            if p.get("tripped"):
+                snap["tripped"] = p["tripped"]
+            out[p["key"]] = snap
+        return out
+
+    def save_stats(self):
+        # GUI は別プロセスなのでファイル経由で共有（書き込みは settings 側でまとめて遅らせる）
+        try:
+            from . import settings as _settings
+
+            with self._stats_lock:
+                _settings.set_plugin_stats(self.stats())
+        except Exception:
+            pass
 
     def list_plugins(self) -> List[Tuple[str, bool]]:
         return [(p["name"], bool(p.get("enabled", True))) for p in self.plugins]
@@ -114,6 +1148,7 @@ class PluginManager:
         """Enable/disable a plugin by display NAME or module key."""
         for p in self.plugins:
             if p.get("name") == name or p.get("key") == name:
-                p["enabled"] = enabled
+                self._set_enabled(p, enabled)
+                self._rebuild_dispatch()
                 return True
         return False
@@ -0,0 +1,275 @@
+"""
+Opt-in profiling for the daemon (main.py) and the GUI process.
+
+Armed by the COPYBENTO_PROFILE environment variable ("1", "sample" or
+"cprofile") or settings "profiling".enabled; nothing is installed otherwise.
+Once armed, the process writes profiles/<name>.pid under the config dir and
+waits for signals on a background thread (so it works while Cocoa owns the
+main thread):
+
+- SIGUSR1 starts a CPU profile, the next SIGUSR1 stops it and writes it.
+  "sample" takes stack samples of the named threads every interval_ms and
+  writes collapsed stacks (<name>-<time>-cpu.folded, for flamegraph.pl or
+  speedscope). "cprofile" runs the EventManager's handlers under cProfile
+  and writes a pstats file (<name>-<time>-cpu.prof).
+- SIGUSR2 starts tracemalloc on first use (or at arm time with
+  "tracemalloc": true); later SIGUSR2s write a snapshot (-mem.snap) and the
+  top allocations, and the growth since the previous snapshot (-mem.txt).
+
+Only the newest "keep" dump files per process name are kept.
+Tools/profilectl.py sends the signals by name (daemon / gui).
+"""
+
+import collections
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_profiler = None
+
+
+def profiles_dir() -> str:
+    from . import settings as _settings
+
+    return os.path.join(_settings.get_config_dir(), "profiles")
+
+
+def _options() -> Dict[str, Any]:
+    try:
+        from . import settings as _settings
+
+        opts = _settings.get_profiling_settings()
+    except Exception:
+        opts = {"enabled": False}
+    env = os.environ.get("COPYBENTO_PROFILE", "").strip().lower()
+    if env and env not in ("0", "false", "off"):
+        opts["enabled"] = True
+        if env in ("sample", "cprofile"):
+            opts["mode"] = env
+    return opts
+
+
+def install(name: str, threads: Iterable[str] = ("MainThread",), event_manager=None):
+    """
+    Arm profiling for this process if enabled (call early, before other
+    threads start, so they inherit the blocked signals). threads are the
+    thread names sampled in "sample" mode; event_manager enables "cprofile".
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    opts = _options()
+    if not opts.get("enabled"):
+        return None
+    if not hasattr(signal, "pthread_sigmask"):
+        logger.warning("Profiling needs POSIX signals; not armed")
+        return None
+    _profiler = _Profiler(name, tuple(threads), event_manager, opts)
+    _profiler.start()
+    return _profiler
+
+
+class _Sampler:
+    """Stack sampler over threads picked by name (collapsed-stack counts)."""
+
+    def __init__(self, names, interval: float):
+        self.names = names
+        self.interval = interval
+        self.counts: "collections.Counter" = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        idents = {}
+        while not self._stop.wait(self.interval):
+            if len(idents) < len(self.names):
+                idents = {
+                    t.ident: t.name for t in threading.enumerate() if t.name in self.names
+                }
+            frames = sys._current_frames()
+            self.samples += 1
+            for ident, tname in idents.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        "%s (%s:%d)"
+                        % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+                    )
+                    frame = frame.f_back
+                if stack:
+                    stack.append(tname)
+                    self.counts[";".join(reversed(stack))] += 1
+
+
+class _Profiler:
+    def __init__(self, name, threads, event_manager, opts):
+        self.name = name
+        self.threads = threads
+        self.event_manager = event_manager
+        self.opts = opts
+        self.mode = str(opts.get("mode", "sample")).lower()
+        if self.mode == "cprofile" and event_manager is None:
+            logger.info("Profiling %s: cprofile needs an EventManager; sampling", name)
+            self.mode = "sample"
+        self._cpu = None
+        self._started = 0.0
+        self._snapshot = None
+
+    def start(self):
+        sigs = {signal.SIGUSR1, signal.SIGUSR2}
+        signal.pthread_sigmask(signal.SIG_BLOCK, sigs)
+        threading.Thread(
+            target=self._wait_signals, args=(sigs,), name="profiling", daemon=True
+        ).start()
+        directory = profiles_dir()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "%s.pid" % self.name), "w") as f:
+            f.write(str(os.getpid()))
+        if self.opts.get("tracemalloc"):
+            self._start_tracemalloc()
+        logger.info(
+            "Profiling armed for %s (pid %d, %s): SIGUSR1 cpu, SIGUSR2 memory",
+            self.name,
+            os.getpid(),
+            self.mode,
+        )
+
+    def _wait_signals(self, sigs):
+        while True:
+            sig = signal.sigwait(sigs)
+            try:
+                if sig == signal.SIGUSR1:
+                    self.toggle_cpu()
+                else:
+                    self.memory()
+            except Exception as e:
+                logger.exception("Profiling dump failed: %s", e)
+
+    # ---- CPU ----
+    def toggle_cpu(self) -> Optional[str]:
+        if self._cpu is None:
+            self._started = time.time()
+            if self.mode == "cprofile":
+                self._cpu = _HandlerProfile()
+                self.event_manager.profiler = self._cpu
+            else:
+                interval = max(0.5, float(self.opts.get("interval_ms") or 5.0)) / 1000.0
+                self._cpu = _Sampler(self.threads, interval)
+                self._cpu.start()
+            logger.info("CPU profile started (%s)", self.mode)
+            return None
+        cpu, self._cpu = self._cpu, None
+        if isinstance(cpu, _HandlerProfile):
+            self.event_manager.profiler = None
+            path = self._path("cpu.prof")
+            cpu.profile.dump_stats(path)
+        else:
+            counts = cpu.stop()
+            path = self._path("cpu.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, n in counts.most_common():
+                    f.write("%s %d\n" % (stack, n))
+        logger.info("CPU profile (%.1f s) written to %s", time.time() - self._started, path)
+        self._rotate()
+        return path
+
+    # ---- Memory ----
+    def _start_tracemalloc(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, int(self.opts.get("frames") or 25)))
+            logger.info("tracemalloc started")
+
+    def memory(self) -> Optional[str]:
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            self._start_tracemalloc()
+            return None
+        snap = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        snap.dump(self._path("mem.snap"))
+        path = self._path("mem.txt")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("traced %.1f MB, peak %.1f MB\n\n" % (current / 1e6, peak / 1e6))
+            f.write("== top allocations ==\n")
+            for stat in snap.statistics("traceback")[:30]:
+                f.write("%s\n" % stat)
+                for line in stat.traceback.format()[-6:]:
+                    f.write("    %s\n" % line)
+            if self._snapshot is not None:
+                f.write("\n== growth since previous snapshot ==\n")
+                for stat in snap.compare_to(self._snapshot, "lineno")[:30]:
+                    f.write("%s\n" % stat)
+        self._snapshot = snap
+        logger.info("Memory snapshot written to %s", path)
+        self._rotate()
+        return path
+
+    # ---- Files ----
+    def _path(self, suffix: str) -> str:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(profiles_dir(), "%s-%s-%s" % (self.name, stamp, suffix))
+
+    def _rotate(self):
+        keep = max(1, int(self.opts.get("keep") or 20))
+        directory = profiles_dir()
+        try:
+            names = [
+                n
+                for n in os.listdir(directory)
+                if n.startswith(self.name + "-") and not n.endswith(".pid")
+            ]
+        except OSError:
+            return
+        paths = sorted(
+            (os.path.join(directory, n) for n in names), key=os.path.getmtime, reverse=True
+        )
+        for path in paths[keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class _HandlerProfile:
+    """cProfile around EventManager handlers (nested calls profile once)."""
+
+    def __init__(self):
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            self._depth += 1
+            if self._depth == 1:
+                self.profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.profile.disable()
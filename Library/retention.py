@@ -0,0 +1,195 @@
+"""
+Retention policies for the clipboard history.
+
+A policy decides whether the oldest record in its scope (all records, or
+only "text" / "image" records) has to go. enforce() walks the history from
+the oldest end and evicts records while a policy is over its limit, so
+the cost is proportional to what is evicted rather than to the history.
+
+Byte and entry totals come from a Ledger that is updated as records are
+added and removed; each record's size is measured once when it is
+persisted (and stored as "bytes") instead of stat()ing every file on
+every copy. Text blobs can be shared (a delta-stored text needs the blobs
+of its bases, which may belong to records that were already evicted), so
+the ledger counts each blob once, by reference, and stops charging it only
+when the last record that needs it is removed.
+
+Policies are built from settings "retention" by name. The built-in ones
+are "max_entries", "max_bytes" and "max_age_days"; prefixing a key with
+"image_" or "text_" limits it to that type. Other names can be added with
+register_policy(). A value of 0 (or null) disables a policy.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from .textstore import blob_paths
+
+KINDS = ("text", "image")
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def record_bytes(record: Dict[str, Any]) -> int:
+    """Bytes a history record occupies on disk (its files, or the inline text)."""
+    total = 0
+    for key in ("image_path", "original_path", "text_path"):
+        path = record.get(key)
+        if path:
+            total += _file_size(path)
+    if "text" in record:
+        total += len((record.get("text") or "").encode("utf-8", "surrogatepass"))
+    return total
+
+
+class Ledger:
+    """Running entry and byte totals per type, keyed by record ts."""
+
+    def __init__(self, records=()):
+        self._entries: Dict[Any, tuple] = {}
+        self._count = dict.fromkeys(KINDS, 0)
+        self._bytes = dict.fromkeys(KINDS, 0)
+        # 本文ファイル -> [参照する記録の数, バイト数]
+        self._blobs: Dict[str, list] = {}
+        for r in records:
+            self.add(r)
+
+    def add(self, record: Dict[str, Any]):
+        """Account for record (replaces an entry with the same ts)."""
+        size = record.get("bytes")
+        if not isinstance(size, int):
+            # 古い記録は初回だけ測り、次の保存で "bytes" として残す
+            size = record["bytes"] = record_bytes(record)
+        self.remove(record)
+        kind = record.get("type")
+        own, own_size = record.get("text_path"), 0
+        blobs = blob_paths(record)
+        if own:
+            # 本文ファイルを持つ記録の "bytes" はそのファイルの大きさ。
+            # 共有されうるので記録ではなく本文ファイルの参照として数える
+            own_size, size = size, 0
+        charged = size
+        for path in blobs:
+            blob = self._blobs.get(path)
+            if blob is None:
+                blob = self._blobs[path] = [0, own_size if path == own else _file_size(path)]
+                charged += blob[1]
+            blob[0] += 1
+        self._entries[record.get("ts")] = (kind, size, blobs)
+        if kind in self._count:
+            self._count[kind] += 1
+            self._bytes[kind] += charged
+
+    def remove(self, record: Dict[str, Any]):
+        entry = self._entries.pop(record.get("ts"), None)
+        if entry is None:
+            return
+        kind, freed, blobs = entry
+        for path in blobs:
+            blob = self._blobs.get(path)
+            if blob is None:
+                continue
+            blob[0] -= 1
+            if blob[0] <= 0:
+                del self._blobs[path]
+                freed += blob[1]
+        if kind in self._count:
+            self._count[kind] -= 1
+            self._bytes[kind] -= freed
+
+    def holds(self, path: str) -> bool:
+        """True while a record in the ledger still needs the text blob path."""
+        return path in self._blobs
+
+    def count(self, kind: Optional[str] = None) -> int:
+        return self._count[kind] if kind else sum(self._count.values())
+
+    def bytes(self, kind: Optional[str] = None) -> int:
+        return self._bytes[kind] if kind else sum(self._bytes.values())
+
+
+class MaxEntries:
+    def __init__(self, limit, kind=None):
+        self.limit = int(limit)
+        self.kind = kind
+
+    def over(self, ledger: Ledger, record, now: float) -> bool:
+        return ledger.count(self.kind) > self.limit
+
+
+class MaxBytes:
+    def __init__(self, limit, kind=None):
+        self.limit = int(limit)
+        self.kind = kind
+
+    def over(self, ledger: Ledger, record, now: float) -> bool:
+        return ledger.bytes(self.kind) > self.limit
+
+
+class MaxAge:
+    def __init__(self, days, kind=None):
+        self.seconds = float(days) * 86400.0
+        self.kind = kind
+
+    def over(self, ledger: Ledger, record, now: float) -> bool:
+        return now - float(record.get("ts") or 0) > self.seconds
+
+
+# 設定名 -> (limit, kind) からポリシーを作る関数
+_POLICIES: Dict[str, Callable[..., Any]] = {
+    "max_entries": MaxEntries,
+    "max_bytes": MaxBytes,
+    "max_age_days": MaxAge,
+}
+
+
+def register_policy(name: str, factory: Callable[..., Any]):
+    """
+    Add a policy usable from settings "retention". factory(value, kind)
+    returns an object with .kind and .over(ledger, oldest_record, now).
+    """
+    _POLICIES[name] = factory
+
+
+def policies_from_settings(conf: Dict[str, Any]) -> List[Any]:
+    out = []
+    for key, value in conf.items():
+        if not value:
+            continue
+        kind, name = None, key
+        for k in KINDS:
+            if key.startswith(k + "_"):
+                kind, name = k, key[len(k) + 1 :]
+        factory = _POLICIES.get(name)
+        if factory is None:
+            continue
+        try:
+            out.append(factory(value, kind))
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def enforce(items: List[Dict[str, Any]], ledger: Ledger, policies, now: float, keep: int = 1):
+    """
+    Evict records (items is newest first) until no policy is over its
+    limit; the newest `keep` records are never evicted. Evicted records are
+    removed from items and the ledger and returned.
+    """
+    evicted = []
+    for policy in policies:
+        i = len(items) - 1
+        while i >= keep:
+            r = items[i]
+            if policy.kind is None or r.get("type") == policy.kind:
+                if not policy.over(ledger, r, now):
+                    break
+                ledger.remove(r)
+                evicted.append(items.pop(i))
+            i -= 1
+    return evicted
@@ -1,7 +1,13 @@
+import atexit
 import json
+import logging
 import os
 import shutil
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
 
 
 def _config_base() -> str:
@@ -10,13 +16,19 @@ def _config_base() -> str:
     return os.path.join(base, "copybento")
 
 
+_config_dir_ready = False
+
+
 def get_config_dir() -> str:
     """Return the CopyBento config directory (creates it if missing)."""
+    global _config_dir_ready
     path = _config_base()
-    try:
-        os.makedirs(path, exist_ok=True)
-    except Exception:
-        pass
+    if not _config_dir_ready:
+        try:
+            os.makedirs(path, exist_ok=True)
+            _config_dir_ready = True
+        except Exception:
+            pass
     return path
 
 
@@ -36,24 +48,178 @@ def _migrate_old_settings_if_needed(new_path: str):
         pass
 
 
-def _load_all() -> Dict[str, Any]:
+def _file_mtime(path: str) -> int:
     try:
+        return os.stat(path).st_mtime_ns
+    except Exception:
+        return 0
+
+
+class _Store:
+    """
+    Process-wide copy of settings.json.
+
+    Loaded once; the file's mtime is re-checked at most every CHECK_INTERVAL
+    seconds so edits from another process (the GUI) are picked up. Changes
+    are applied in memory at once and written back after SAVE_DELAY seconds
+    (several toggles become one atomic write); flush() writes immediately and
+    runs at exit.
+    """
+
+    CHECK_INTERVAL = 0.5
+    SAVE_DELAY = 0.5
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._mtime = 0  # mtime of the file as last read or written by us
+        self._checked = 0.0
+        self._version = 0
+        self._pending = set()  # top-level keys changed here but not yet saved
+        self._timer: Optional[threading.Timer] = None
+
+    def _load(self):
         path = _settings_path()
         _migrate_old_settings_if_needed(path)
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        mtime = _file_mtime(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = dict(json.load(f))
+        except Exception:
+            data = {}
+        if self._data is not None:
+            # 外部で編集された: 未保存のこちらの変更はその上に残す
+            for key in self._pending:
+                if key in self._data:
+                    data[key] = self._data[key]
+        self._data = data
+        self._mtime = mtime
+        # ファイルの mtime から始めるので、再起動をまたいでも古い版と衝突しない
+        self._version = mtime if mtime > self._version else self._version + 1
+
+    def data(self) -> Dict[str, Any]:
+        """The current settings (read-only: use update() to change them)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._data is None:
+                self._load()
+                self._checked = now
+            elif now - self._checked >= self.CHECK_INTERVAL:
+                self._checked = now
+                if _file_mtime(_settings_path()) != self._mtime:
+                    self._load()
+            return self._data
+
+    def version(self) -> int:
+        with self._lock:
+            self.data()
+            return self._version
+
+    def update(self, key: str, value: Any):
+        """Replace the top-level section key and schedule a save."""
+        with self._lock:
+            data = dict(self.data())
+            data[key] = value
+            self._data = data
+            self._pending.add(key)
+            self._version += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending or self._data is None:
+                return
+            path = _settings_path()
+            if _file_mtime(path) != self._mtime:
+                self._load()  # 保存前に外部の変更を取り込む
+            _write_json_atomic(path, self._data)
+            self._mtime = _file_mtime(path)
+            self._pending.clear()
+
+
+class _DeferredFiles:
+    """
+    JSON files the daemon rewrites on every capture (plugin / latency stats).
+    Only the latest value per file is kept and written at most once every
+    SAVE_DELAY seconds, off the capture path; flush() writes it now.
+    """
+
+    SAVE_DELAY = 2.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def put(self, path: str, data: Dict[str, Any]):
+        with self._lock:
+            self._pending[path] = data
+            if self._timer is None:
+                self._timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+            for path, data in pending.items():
+                _write_json_atomic(path, data)
+
+
+_store = _Store()
+_deferred = _DeferredFiles()
+atexit.register(_store.flush)
+atexit.register(_deferred.flush)
 
 
-def _save_all(data: Dict[str, Any]):
+def flush():
+    """Write pending settings and stats changes now (otherwise saved shortly after)."""
+    _store.flush()
+    _deferred.flush()
+
+
+def _load_all() -> Dict[str, Any]:
+    return _store.data()
+
+
+def _section(name: str, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    settings[name] merged over defaults. Values whose type does not match the
+    default are converted (bool/int/float/str) or replaced by the default.
+    """
+    out = dict(defaults)
     try:
-        path = _settings_path()
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        values = dict(_load_all().get(name, {}) or {})
     except Exception:
-        pass
+        return out
+    for key, value in values.items():
+        default = defaults.get(key)
+        if default is None or value is None:
+            out[key] = value
+            continue
+        kind = type(default)
+        if type(value) is kind or (kind is float and type(value) is int):
+            out[key] = value
+            continue
+        try:
+            if kind is bool:
+                if isinstance(value, str):
+                    value = value.strip().lower() in ("1", "true", "yes", "on")
+                out[key] = bool(value)
+            else:
+                out[key] = kind(value)
+        except (TypeError, ValueError):
+            logger.warning("settings %s.%s: invalid value %r", name, key, value)
+    return out
 
 
 def get_plugins_enabled() -> Dict[str, bool]:
@@ -62,16 +228,226 @@ def get_plugins_enabled() -> Dict[str, bool]:
 
 
 def set_plugin_enabled(name: str, enabled: bool):
-    data = _load_all()
-    plugins = dict(data.get("plugins", {}))
-    plugins[name] = bool(enabled)
-    data["plugins"] = plugins
-    _save_all(data)
+    set_plugins_enabled({name: enabled})
 
 
 def set_plugins_enabled(enabled_map: Dict[str, bool]):
-    data = _load_all()
-    plugins = dict(data.get("plugins", {}))
+    plugins = dict(_load_all().get("plugins", {}))
     plugins.update({k: bool(v) for k, v in enabled_map.items()})
-    data["plugins"] = plugins
-    _save_all(data)
+    _store.update("plugins", plugins)
+
+
+def get_plugin_config(key: str) -> Dict[str, Any]:
+    """Per-plugin options from settings.json "plugin_config" (module key -> dict)."""
+    data = _load_all()
+    try:
+        return dict((data.get("plugin_config", {}) or {}).get(key, {}) or {})
+    except Exception:
+        return {}
+
+
+def set_plugin_config(key: str, values: Dict[str, Any]):
+    """Merge values into a plugin's options."""
+    configs = dict(_load_all().get("plugin_config", {}) or {})
+    current = dict(configs.get(key, {}) or {})
+    current.update(values)
+    configs[key] = current
+    _store.update("plugin_config", configs)
+
+
+# ---- Plugin runtime (timeouts / circuit breaker) ----
+_PLUGIN_RUNTIME_DEFAULTS = {
+    "timeout": 5.0,  # 1 回の on_clipboard に許す秒数（0 で無制限）
+    "slow_threshold": 2.0,  # これを超えると「遅い実行」として警告
+    # 連続で失敗・タイムアウトしたら自動で無効化。settings.json に保存するのは
+    # 例外による無効化だけで、タイムアウトはそのセッションの間だけ
+    "max_strikes": 3,
+    # 遅い実行も連続回数に数える。大きな画像では正常でも遅いので既定は off、
+    # 遅さによる無効化はそのセッションの間だけ（保存しない）
+    "slow_strikes": False,
+    "pool_workers": 2,  # PROCESS_POOL プラグイン用のワーカープロセス数
+    "reload_interval": 2.0,  # プラグインの変更チェック間隔（秒、0 で無効）
+    # ワーカーで描画する型は、元のコピーを先に履歴へ記録し、結果が出たら差し替える
+    "passthrough": True,
+}
+
+
+def get_plugin_runtime() -> Dict[str, Any]:
+    """Return plugin runtime limits merged over the defaults."""
+    return _section("plugin_runtime", _PLUGIN_RUNTIME_DEFAULTS)
+
+
+def _read_json_file(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return dict(json.load(f))
+    except Exception:
+        return {}
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    try:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+_RESULT_CACHE_DEFAULTS = {
+    "enabled": True,
+    "max_bytes": 128 * 1024 * 1024,  # メモリ上の結果キャッシュの上限
+    "spill_bytes": 8 * 1024 * 1024,  # これより大きい画像結果はディスクへ
+    "disk_max_bytes": 512 * 1024 * 1024,
+}
+
+
+def get_result_cache_settings() -> Dict[str, Any]:
+    """Plugin result cache limits merged over the defaults."""
+    return _section("result_cache", _RESULT_CACHE_DEFAULTS)
+
+
+_IMAGE_ENCODER_DEFAULTS = {
+    "format": "png",  # png or tiff（非圧縮、エンコードは速いがサイズ大）
+    "compress_level": 6,  # PNG: 0-9（1 なら速い）
+    "optimize": False,  # PNG: 最小サイズを探す（遅い）
+}
+
+
+def get_image_encoder_settings() -> Dict[str, Any]:
+    """Encoder used for plugin images (pasteboard + history), over the defaults."""
+    return _section("image_encoder", _IMAGE_ENCODER_DEFAULTS)
+
+
+_IMAGE_LIMIT_DEFAULTS = {
+    # プラグイン処理と履歴保存の画素数上限（0 で無制限）。8K (7680x4320) は収まる
+    "max_pixels": 40_000_000,
+    "policy": "downscale",  # 上限超え: downscale（縮小して処理）or skip（プラグインを通さない）
+    "keep_original": True,  # 上限超えの元画像を履歴にそのまま残す
+}
+
+
+def get_image_limit_settings() -> Dict[str, Any]:
+    """Max-pixels policy for plugin processing and history storage."""
+    return _section("image_limit", _IMAGE_LIMIT_DEFAULTS)
+
+
+_RETENTION_DEFAULTS = {
+    # 0 は無制限。image_ / text_ 付きはその型だけに適用（Library/retention.py）
+    "max_entries": 200,
+    "max_bytes": 0,
+    "max_age_days": 0.0,
+    "image_max_entries": 0,
+    "image_max_bytes": 0,
+    "image_max_age_days": 0.0,
+    "text_max_entries": 0,
+    "text_max_bytes": 0,
+    "text_max_age_days": 0.0,
+}
+
+
+def get_retention_settings() -> Dict[str, Any]:
+    """History retention limits by entries, bytes and age (overall and per type)."""
+    return _section("retention", _RETENTION_DEFAULTS)
+
+
+_TEXT_STORAGE_DEFAULTS = {
+    # これより大きいテキスト（UTF-8 のバイト数）は history.json に入れず圧縮して別ファイルへ
+    "inline_max_bytes": 64 * 1024,
+    "codec": "zlib",  # zlib or lzma（遅いがよく縮む）
+    "level": 6,
+    # 直前の大きなテキストとほぼ同じなら行単位の差分だけ保存する
+    "delta": False,
+    "delta_max_chain": 8,
+    "delta_max_ratio": 0.5,
+}
+
+
+def get_text_storage_settings() -> Dict[str, Any]:
+    """Size threshold and codec for out-of-line history texts."""
+    return _section("text_storage", _TEXT_STORAGE_DEFAULTS)
+
+
+_IMAGE_DEDUP_DEFAULTS = {
+    "enabled": True,  # 取り込んだ画像の dHash を履歴に記録し、似た画像を探す
+    "hash_size": 8,  # 8 -> 64 ビット
+    "threshold": 4,  # ハミング距離がこれ以下なら「ほぼ同じ」
+    # flag: 新しい記録に near_duplicate_of を付ける / collapse: 古い方を履歴から削除
+    "action": "flag",
+}
+
+
+def get_image_dedup_settings() -> Dict[str, Any]:
+    """Near-duplicate image detection (perceptual hash) options."""
+    return _section("image_dedup", _IMAGE_DEDUP_DEFAULTS)
+
+
+_TRACE_DEFAULTS = {
+    "enabled": False,  # クリップボードの変化を traces/trace-YYYYMMDD.jsonl に記録
+    "payloads": False,  # 内容も保存する（テキスト本文・画像ファイル）
+}
+
+
+def get_trace_settings() -> Dict[str, Any]:
+    """Clipboard trace recording options (see Library/trace.py)."""
+    return _section("trace", _TRACE_DEFAULTS)
+
+
+_PROFILING_DEFAULTS = {
+    "enabled": False,  # 環境変数 COPYBENTO_PROFILE=1 でも有効になる
+    "mode": "sample",  # sample（スタックのサンプリング）or cprofile（イベント処理のみ）
+    "interval_ms": 5.0,
+    "tracemalloc": False,  # 起動時から tracemalloc を開始する
+    "frames": 25,  # tracemalloc が保存するスタックの深さ
+    "keep": 20,  # profiles/ に残すダンプ数（プロセスごと）
+}
+
+
+def get_profiling_settings() -> Dict[str, Any]:
+    """Opt-in profiling options (see Library/profiling.py)."""
+    return _section("profiling", _PROFILING_DEFAULTS)
+
+
+def get_version() -> int:
+    """Cheap settings version: changes on every local update or external edit."""
+    return _store.version()
+
+
+def _plugin_stats_path() -> str:
+    return os.path.join(get_config_dir(), "plugin_stats.json")
+
+
+def get_plugin_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-plugin timing stats written by the daemon (module key -> stats)."""
+    return _read_json_file(_plugin_stats_path())
+
+
+def set_plugin_stats(stats: Dict[str, Dict[str, Any]]):
+    _deferred.put(_plugin_stats_path(), stats)
+
+
+def _latency_stats_path() -> str:
+    return os.path.join(get_config_dir(), "latency_stats.json")
+
+
+def get_latency_stats() -> Dict[str, Dict[str, Any]]:
+    """Copy -> processed-result latency written by the daemon (data type -> stats)."""
+    return _read_json_file(_latency_stats_path())
+
+
+def set_latency_stats(stats: Dict[str, Dict[str, Any]]):
+    _deferred.put(_latency_stats_path(), stats)
+
+
+def _plugin_manifest_path() -> str:
+    return os.path.join(get_config_dir(), "plugin_manifest.json")
+
+
+def get_plugin_manifest() -> Dict[str, Any]:
+    """Cached plugin manifest (name, key, capabilities, hooks, mtime per file)."""
+    return _read_json_file(_plugin_manifest_path())
+
+
+def set_plugin_manifest(manifest: Dict[str, Any]):
+    _write_json_atomic(_plugin_manifest_path(), manifest)
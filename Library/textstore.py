@@ -0,0 +1,232 @@
+"""
+Out-of-line storage for large history texts.
+
+Texts up to inline_max_bytes (UTF-8) stay in history.json. Larger ones are
+compressed (zlib or lzma from the standard library) into a blob next to the
+images; the record keeps only the preview and text_path / text_size /
+text_codec. load_text() reads the body back when it is actually needed
+(copying an entry or searching).
+
+With "delta" enabled, a large text that is close to the previous large text
+(the usual edit / re-copy cycle) is stored as a line diff against that
+entry's blob instead (codec "delta", .dz). Reading it applies the diffs
+down the chain of bases; chains are at most delta_max_chain long and the
+record lists the blobs it depends on in text_deps, so they are not deleted
+while it is still in the history. Materialized texts are kept in a small
+LRU, which also makes the next diff against the newest entry cheap.
+"""
+
+import difflib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# 圧縮形式 -> 拡張子
+CODECS = {"zlib": ".zz", "lzma": ".xz"}
+DELTA_EXT = ".dz"
+
+# 直近に読んだ・書いた本文（検索や差分の元で同じ大きな本文を何度も展開しない）
+_CACHE_ITEMS = 16
+_CACHE_CHARS = 16 * 1024 * 1024
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_chars = 0
+_cache_lock = threading.Lock()
+
+# 壊れた履歴で循環していても止まるように（設定の delta_max_chain とは別の上限）
+_MAX_DEPTH = 64
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.compress(data, preset=max(0, min(9, level)))
+    import zlib
+
+    return zlib.compress(data, max(0, min(9, level)))
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.decompress(data)
+    import zlib
+
+    return zlib.decompress(data)
+
+
+def _diff(base: str, text: str) -> List[Any]:
+    """
+    Line ops turning base into text: [i, j] copies base lines i..j, a
+    string is inserted as is.
+    """
+    a = base.splitlines(keepends=True)
+    b = text.splitlines(keepends=True)
+    # 編集はたいてい局所的なので、共通の先頭・末尾は SequenceMatcher にかけない
+    n = min(len(a), len(b))
+    head = 0
+    while head < n and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    ops: List[Any] = [[0, head]] if head else []
+    matcher = difflib.SequenceMatcher(None, a[head : len(a) - tail], b[head : len(b) - tail])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([head + i1, head + i2])
+        elif j2 > j1:
+            ops.append("".join(b[head + j1 : head + j2]))
+    if tail:
+        ops.append([len(a) - tail, len(a)])
+    return ops
+
+
+def _patch(base: str, ops: List[Any]) -> str:
+    lines = base.splitlines(keepends=True)
+    return "".join(
+        op if isinstance(op, str) else "".join(lines[op[0] : op[1]]) for op in ops
+    )
+
+
+def _blob_path(directory: str, ts: float, ext: str) -> str:
+    # 同じ ts（パススルーで先に記録した元のコピー）の本文は別ファイルにする
+    path = os.path.join(directory, "txt_%d%s" % (int(ts * 1000), ext))
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, "txt_%d_%d%s" % (int(ts * 1000), n, ext))
+        n += 1
+    return path
+
+
+def _write(path: str, blob: bytes):
+    # GUI が書き込み途中のファイルを読まないように、一時ファイルから置き換える
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+
+
+def _delta(base: Dict[str, Any], text: str, options: Dict[str, Any]):
+    """(blob, fields) for text as a diff against base's blob, or None."""
+    if not options.get("delta") or not base or not base.get("text_path"):
+        return None
+    depth = int(base.get("text_depth") or 0) + 1
+    if depth > max(0, int(options.get("delta_max_chain") or 0)):
+        return None
+    base_text = load_text(base)
+    if base_text is None or abs(len(base_text) - len(text)) > len(text) // 2:
+        return None
+    body = {
+        "base": os.path.basename(base["text_path"]),
+        "codec": base.get("text_codec") or "zlib",
+        "ops": _diff(base_text, text),
+    }
+    blob = _compress(
+        json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8", "surrogatepass"
+        ),
+        "zlib",
+        int(options.get("level", 6)),
+    )
+    deps = list(base.get("text_deps") or ()) + [base["text_path"]]
+    return blob, {"text_codec": "delta", "text_depth": depth, "text_deps": deps}
+
+
+def store(
+    directory: str,
+    ts: float,
+    text: str,
+    options: Dict[str, Any],
+    base: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Record fields for text: {"text": text} when it is small enough to stay
+    inline, otherwise the blob is written and its path/size/codec returned.
+    base is the newest out-of-line text record, the candidate for a delta.
+    """
+    data = text.encode("utf-8", "surrogatepass")
+    limit = int(options.get("inline_max_bytes") or 0)
+    if limit <= 0 or len(data) <= limit:
+        return {"text": text}
+    codec = str(options.get("codec", "zlib")).lower()
+    if codec not in CODECS:
+        codec = "zlib"
+    blob = _compress(data, codec, int(options.get("level", 6)))
+    fields: Dict[str, Any] = {"text_codec": codec}
+    ext = CODECS[codec]
+    try:
+        delta = _delta(base, text, options)
+    except Exception:
+        delta = None
+    # 差分の展開は元の本文の読み込みぶん遅いので、十分小さいときだけ使う
+    ratio = float(options.get("delta_max_ratio") or 0.5)
+    if delta is not None and len(delta[0]) <= len(blob) * ratio:
+        blob, fields = delta
+        ext = DELTA_EXT
+    path = _blob_path(directory, ts, ext)
+    _write(path, blob)
+    _remember(path, text)
+    fields.update(text_path=path, text_size=len(data), chars=len(text))
+    return fields
+
+
+def _remember(path: str, text: str):
+    global _cache_chars
+    with _cache_lock:
+        old = _cache.pop(path, None)
+        if old is not None:
+            _cache_chars -= len(old)
+        _cache[path] = text
+        _cache_chars += len(text)
+        while len(_cache) > 1 and (len(_cache) > _CACHE_ITEMS or _cache_chars > _CACHE_CHARS):
+            _cache_chars -= len(_cache.popitem(last=False)[1])
+
+
+def _load(path: str, codec: str, depth: int = 0) -> str:
+    with _cache_lock:
+        text = _cache.get(path)
+        if text is not None:
+            _cache.move_to_end(path)
+            return text
+    with open(path, "rb") as f:
+        raw = f.read()
+    if codec == "delta":
+        if depth >= _MAX_DEPTH:
+            raise ValueError("delta chain too long: %s" % path)
+        body = json.loads(_decompress(raw, "zlib").decode("utf-8", "surrogatepass"))
+        base_path = os.path.join(os.path.dirname(path), body["base"])
+        text = _patch(_load(base_path, body.get("codec") or "zlib", depth + 1), body["ops"])
+    else:
+        text = _decompress(raw, codec).decode("utf-8", "surrogatepass")
+    _remember(path, text)
+    return text
+
+
+def load_text(record: Dict[str, Any]) -> Optional[str]:
+    """Full text of a history record (inline or out of line); None if unreadable."""
+    if "text" in record:
+        return record.get("text")
+    path = record.get("text_path")
+    if not path:
+        return None
+    try:
+        return _load(path, record.get("text_codec") or "zlib")
+    except Exception:
+        return None
+
+
+def blob_paths(record: Dict[str, Any]) -> List[str]:
+    """Text blobs a record needs: its own and the bases of its delta chain."""
+    path = record.get("text_path")
+    return ([path] if path else []) + list(record.get("text_deps") or ())
+
+
+def clear_cache():
+    global _cache_chars
+    with _cache_lock:
+        _cache.clear()
+        _cache_chars = 0
@@ -0,0 +1,116 @@
+"""
+Clipboard activity traces.
+
+TraceRecorder appends one JSON line per clipboard change seen by the watcher
+(wall-clock time, type, source marker, size, payload digest) to a daily file
+under ~/.config/copybento/traces/. With payloads enabled the text itself is
+stored in the line and image bytes go to a sidecar file named by digest.
+Writes happen on a background thread so the capture path only enqueues.
+
+load() reads a trace back for Tools/replay_trace.py.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _text_digest(text: str) -> str:
+    return hashlib.blake2b(
+        text.encode("utf-8", "surrogatepass"), digest_size=16
+    ).hexdigest()
+
+
+def describe(data_type: str, value: Any, encoded=None) -> Dict[str, Any]:
+    """Trace fields for one clipboard change (without the payload)."""
+    entry: Dict[str, Any] = {"type": data_type}
+    if data_type == "text":
+        text = value if isinstance(value, str) else str(value)
+        entry["size"] = len(text.encode("utf-8", "surrogatepass"))
+        entry["chars"] = len(text)
+        entry["digest"] = _text_digest(text)
+    elif data_type == "image":
+        try:
+            entry["width"], entry["height"] = value.size
+            entry["mode"] = value.mode
+        except Exception:
+            pass
+        if encoded is not None:
+            entry["fmt"] = encoded.fmt
+            entry["size"] = len(encoded.data)
+            entry["digest"] = encoded.fingerprint
+    return entry
+
+
+class TraceRecorder:
+    def __init__(self, directory: str, payloads: bool = False):
+        self.directory = directory
+        self.payloads = payloads
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, data_type: str, value: Any, encoded=None, source: str = ""):
+        """Enqueue one clipboard change (called from the watcher)."""
+        self._queue.put((time.time(), data_type, value, encoded, source))
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._writer, name="trace", daemon=True
+            )
+            self._thread.start()
+
+    def path_for(self, ts: float) -> str:
+        return os.path.join(
+            self.directory, "trace-%s.jsonl" % time.strftime("%Y%m%d", time.localtime(ts))
+        )
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(*item)
+            except Exception as e:
+                logger.warning("Failed to write trace entry: %s", e)
+
+    def _write(self, ts, data_type, value, encoded, source):
+        entry = {"t": round(ts, 4)}
+        entry.update(describe(data_type, value, encoded))
+        if source:
+            entry["source"] = source
+        os.makedirs(self.directory, exist_ok=True)
+        if self.payloads:
+            if data_type == "text":
+                entry["text"] = value if isinstance(value, str) else str(value)
+            elif data_type == "image" and encoded is not None:
+                name = "%s%s" % (entry["digest"], encoded.ext)
+                path = os.path.join(self.directory, "payloads", name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(encoded.data)
+                entry["file"] = os.path.join("payloads", name)
+        with open(self.path_for(ts), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load(path: str) -> Iterator[Dict[str, Any]]:
+    """Entries of a trace file in order; "file" is made absolute."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("file"):
+                entry["file"] = os.path.join(base, entry["file"])
+            yield entry
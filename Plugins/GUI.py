@@ -1,4 +1,6 @@
 NAME = "GUI"
+# on_startup でホットキーを登録するだけ（クリップボードイベントは受け取らない）
+TYPES = ()
 from Cocoa import (
     NSApplication,
     NSApp,
@@ -44,6 +46,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 sys.path.append(BASE_DIR)
 from Library import mcb
 from Library import settings as app_settings
+from Library import profiling
 from Plugins import history_provider
 
 
@@ -229,7 +232,12 @@ class HistoryDataSource(NSObject):
             out = []
             for it in self.items:
                 if it.get("type") == "text":
-                    src = (it.get("text") or "").lower()
+                    # 別ファイルの大きな本文は最初の検索で一度だけ読む
+                    src = it.get("_search")
+                    if src is None:
+                        src = it["_search"] = (
+                            history_provider.get_text(it) or it.get("preview") or ""
+                        ).lower()
                 else:
                     src = "[image]"
                 if q in src:
@@ -802,7 +810,7 @@ class AppDelegate(NSObject):
     def onOpenSettings_(self, sender):
         try:
             # Build a simple modal sheet with plugin toggles
-            w, h = 420, 280
+            w, h = 560, 280
             sheet = NSWindow.alloc().initWithContentRect_styleMask_backing_defer_(
                 NSMakeRect(0, 0, w, h), 15, 2, False
             )
@@ -839,6 +847,11 @@ class AppDelegate(NSObject):
                 enabled_map = app_settings.get_plugins_enabled()
             except Exception:
                 enabled_map = {}
+            # Per-plugin timing stats written by the daemon (module key -> stats)
+            try:
+                stats_map = app_settings.get_plugin_stats()
+            except Exception:
+                stats_map = {}
 
             # Discover plugins in this folder and read each file's NAME without importing the module
             import os, re
@@ -879,7 +892,7 @@ class AppDelegate(NSObject):
             start_y = h - 70
             for i, (key, label) in enumerate(entries):
                 y = start_y - i * 28
-                cb = NSButton.alloc().initWithFrame_(NSMakeRect(20, y, w - 40, 22))
+                cb = NSButton.alloc().initWithFrame_(NSMakeRect(20, y, 200, 22))
                 cb.setButtonType_(3)  # NSSwitch / NSButtonTypeSwitch
                 cb.setTitle_(label)
                 try:
@@ -897,6 +910,35 @@ class AppDelegate(NSObject):
                 # store both module key and display label for saving
                 self._plugin_checks.append((key, label, cb))
                 sheet.contentView().addSubview_(cb)
+                # Timing stats (count, p50/p95/max)
+                try:
+                    st = stats_map.get(key)
+                    if st:
+                        info = "n=%d  p50 %.0fms  p95 %.0fms  max %.0fms" % (
+                            int(st.get("count", 0)),
+                            float(st.get("p50_ms", 0)),
+                            float(st.get("p95_ms", 0)),
+                            float(st.get("max_ms", 0)),
+                        )
+                        if st.get("tripped"):
+                            info += "  (auto-disabled: %s)" % st.get("tripped")
+                    else:
+                        info = "no data"
+                    lbl = NSTextField.alloc().initWithFrame_(
+                        NSMakeRect(224, y + 2, w - 244, 18)
+                    )
+                    lbl.setStringValue_(info)
+                    lbl.setBezeled_(False)
+                    lbl.setEditable_(False)
+                    lbl.setDrawsBackground_(False)
+                    lbl.setBordered_(False)
+                    try:
+                        lbl.setFont_(NSFont.monospacedDigitSystemFontOfSize_weight_(11, 0))
+                    except Exception:
+                        lbl.setFont_(NSFont.systemFontOfSize_(11))
+                    sheet.contentView().addSubview_(lbl)
+                except Exception:
+                    pass
 
             # Save & Close button
             saveBtn = NSButton.alloc().initWithFrame_(NSMakeRect(w - 100, 12, 80, 28))
@@ -934,8 +976,9 @@ class AppDelegate(NSObject):
                     enabled_map[key] = state
                 except Exception:
                     pass
-            # Persist (merged into settings.json)
+            # Persist (merged into settings.json); the daemon re-applies it once it sees the change
             app_settings.set_plugins_enabled(enabled_map)
+            app_settings.flush()
         except Exception:
             pass
         try:
@@ -967,14 +1010,22 @@ class AppDelegate(NSObject):
         item = self.ds.filtered[sel]
         t = item.get("type")
         if t == "text":
-            mcb.MacClipboard.set_text(item.get("text") or "")
+            mcb.MacClipboard.set_text(history_provider.get_text(item) or "")
         elif t == "image":
             path = item.get("image_path")
             if path and os.path.exists(path):
-                from PIL import Image
+                from Library.imagecodec import EncodedImage, FORMATS
+
+                fmt = os.path.splitext(path)[1].lstrip(".").lower()
+                if fmt in FORMATS:
+                    # 保存済みのバイト列をそのまま書き込む（デコード/再エンコードなし）
+                    with open(path, "rb") as f:
+                        mcb.MacClipboard.set_image_data(EncodedImage(fmt, f.read()))
+                else:
+                    from PIL import Image
 
-                img = Image.open(path).convert("RGBA")
-                mcb.MacClipboard.set_image(img)
+                    img = Image.open(path).convert("RGBA")
+                    mcb.MacClipboard.set_image(img)
                 # マーカーを付与（この画像は GUI からのコピー）
                 try:
                     mcb.MacClipboard.set_source_marker("GUI_IMAGE")
@@ -1226,6 +1277,7 @@ class AppDelegate(NSObject):
 
 
 def main():
+    profiling.install("gui")
     app = NSApplication.sharedApplication()
     delegate = AppDelegate.alloc().init()
     app.setDelegate_(delegate)
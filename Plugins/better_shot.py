@@ -1,13 +1,35 @@
 # Sample plugin: convert text to uppercase on copy
 NAME = "Better Shot"
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import functools
+import logging
 import os
-import io
-from AppKit import NSPasteboard
-from AppKit import NSPasteboardTypePNG
-from Foundation import NSData
-
-setting = {
+import re
+from typing import NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # 任意: NumPy が無ければ Pillow で合成する
+    np = None
+
+try:
+    from Library import imagecodec
+except ImportError:  # 単体で読み込まれた場合はエンコードを本体に任せる
+    imagecodec = None
+
+# 画像だけを変換する
+TYPES = ("image",)
+ROLE = "transform"
+# 描画は重いのでワーカープロセスで実行（PluginManager.process_async）
+PROCESS_POOL = True
+# 結果（枠付き画像）を本体がペーストボードへ書き戻す
+WRITE_BACK = True
+
+logger = logging.getLogger(__name__)
+
+# 既定値。settings.json の "plugin_config" → "better_shot" で上書きできる
+# （変更は次の描画から反映、再起動不要）
+DEFAULTS = {
     "background": "ffffff",
     "shadow": "000000",
     "auto_background": True,
@@ -21,6 +43,8 @@ setting = {
     "watermark_image": "logo.png",
     "watermark_opacity": 0.8,
     "watermark_scale": 0.01,  # キャンバス幅に対する比率
+    "pf_blur_quality": "balanced",  # pf_blur 背景: fast, balanced, exact
+    "backend": "auto",  # 合成: auto (NumPy があれば numpy), numpy, pillow
     "pf_align": "center",  # center or left
     "pf_left_margin": 24,  # left 揃え時の左余白
     "pf_font_scale": 0.2,  # バー高さに対するフォント倍率
@@ -48,6 +72,13 @@ def _parse_hex_color(hex_str):
     return (255, 255, 255, 255)
 
 
+# ---- 描画アセットのキャッシュ ----
+# フォント・ロゴ・マスクは同じサイズが繰り返し使われるので lru_cache で保持する。
+# 返したオブジェクトは共有なので呼び出し側で書き換えないこと。
+# 描画プランが作り直されたとき（設定変更時）に全て破棄する。
+
+
+@functools.lru_cache(maxsize=4)
 def _rounded_rect_mask(size, radius: int):
     """size=(w,h) の角丸矩形マスク(L)を作成。radius<=0 なら全不透明。"""
     w, h = size
@@ -66,6 +97,7 @@ def _apply_opacity(rgba, opacity: float):
     return (r, g, b, int(a * op))
 
 
+@functools.lru_cache(maxsize=16)
 def _load_font(size=48):
     # フォールバック付きのフォントロード
     candidates = [
@@ -81,8 +113,389 @@ def _load_font(size=48):
     return ImageFont.load_default()
 
 
+def _logo_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=4)
+def _logo_source(path, mtime):
+    """元のロゴ画像(RGBA)。mtime はキャッシュキー（差し替え検知）用。"""
+    return Image.open(path).convert("RGBA")
+
+
+@functools.lru_cache(maxsize=16)
+def _scaled_logo(path, size, opacity: float, mtime):
+    logo = _logo_source(path, mtime).resize(size, Image.LANCZOS)
+    if opacity < 1:
+        r, g, b, a = logo.split()
+        a = a.point(lambda v: int(v * max(0, min(1, opacity))))
+        logo = Image.merge("RGBA", (r, g, b, a))
+    return logo
+
+
+def _blurred_rect_mask(size, radius: int, blur: int, margin: int):
+    w, h = size
+    mask_outer = Image.new("L", (w + margin * 2, h + margin * 2), 0)
+    mask_outer.paste(_rounded_rect_mask(size, radius), (margin, margin))
+    return mask_outer.filter(ImageFilter.GaussianBlur(blur))
+
+
+def _stretch_spans(src_len: int, dst_len: int, edge: int):
+    """(src0, src1, dst0, dst1): 両端 edge px はそのまま、中央 1 px を引き伸ばす。"""
+    if src_len == dst_len:
+        return [(0, src_len, 0, dst_len)]
+    tail = src_len - edge - 1
+    return [
+        (0, edge, 0, edge),
+        (edge, edge + 1, edge, dst_len - tail),
+        (edge + 1, src_len, dst_len - tail, dst_len),
+    ]
+
+
+@functools.lru_cache(maxsize=4)
+def _glow_mask(size, radius: int, blur: int, margin: int):
+    """
+    外側グロー用のぼかしマスク（キャンバスサイズ）。
+    角丸とぼかしの影響は縁から radius + 3*blur 程度までしか届かず、その内側の
+    行/列は一定なので、縮めた矩形でぼかしてから中央を引き伸ばす（画素単位で一致）。
+    """
+    w, h = size
+    k = radius + 3 * blur + 4
+    cw, ch = min(w, 2 * k + 1), min(h, 2 * k + 1)
+    if (cw, ch) == (w, h):
+        return _blurred_rect_mask(size, radius, blur, margin)
+    small = _blurred_rect_mask((cw, ch), radius, blur, margin)
+    out = Image.new("L", (w + margin * 2, h + margin * 2))
+    for sx0, sx1, dx0, dx1 in _stretch_spans(small.width, out.width, margin + k):
+        for sy0, sy1, dy0, dy1 in _stretch_spans(small.height, out.height, margin + k):
+            piece = small.crop((sx0, sy0, sx1, sy1))
+            if piece.size != (dx1 - dx0, dy1 - dy0):
+                piece = piece.resize((dx1 - dx0, dy1 - dy0), Image.NEAREST)
+            out.paste(piece, (dx0, dy0))
+    return out
+
+
+@functools.lru_cache(maxsize=4)
+def _mask_bands(size, radius: int):
+    """角丸マスクが 255 未満の行/列の幅 (top, bottom, left, right)。"""
+    if radius <= 0:
+        return (0, 0, 0, 0)
+    mask = np.asarray(_rounded_rect_mask(size, radius))
+    rows = mask.min(axis=1) < 255
+    cols = mask.min(axis=0) < 255
+
+    def _lead(flags):
+        n = 0
+        for f in flags:
+            if not f:
+                break
+            n += 1
+        return n
+
+    return (_lead(rows), _lead(rows[::-1]), _lead(cols), _lead(cols[::-1]))
+
+
+_ASSET_CACHES = (
+    _rounded_rect_mask,
+    _load_font,
+    _logo_source,
+    _scaled_logo,
+    _glow_mask,
+    _mask_bands,
+)
+
+
+# ---- 描画プラン ----
+# 設定は一度だけ検証・変換して不変の RenderPlan にまとめ、描画中は解析しない。
+# settings.json のバージョン（mtime）か configure() の上書きが変わったときだけ作り直す。
+
+MODES = ("pf", "pf_blur", "watermark", "logo", "none")
+_MODE_ALIASES = {"wotermark": "watermark"}
+_HEX_COLOR = re.compile(r"^#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$")
+
+
+class RenderPlan(NamedTuple):
+    """Validated, precomputed Better Shot settings (immutable)."""
+
+    mode: str
+    margin: int
+    radius: int
+    blur: int
+    bg_color: Tuple[int, int, int, int]
+    glow_color: Tuple[int, int, int, int]
+    blur_quality: object  # _BLUR_QUALITY のキーか縮小後のぼかし px
+    use_numpy: bool
+    text: str  # watermark_text（透かし用、空もあり）
+    frame_text: str  # pf/pf_blur に載せる文字（空なら既定文言）
+    logo_path: Optional[str]
+    logo_opacity: float
+    logo_scale: float
+    pf_align: str
+    pf_left_margin: int
+    pf_font_scale: float
+    pf_font_min: int
+    wm_font_scale: float
+    wm_font_min: int
+    wm_fill: Tuple[int, int, int, int]
+
+
+def _cfg_number(cfg, key, cast, lo=None, hi=None):
+    try:
+        value = cast(cfg.get(key) or 0)
+    except (TypeError, ValueError):
+        logger.warning("Better Shot: invalid %s=%r; using %r", key, cfg.get(key), DEFAULTS[key])
+        value = cast(DEFAULTS[key])
+    if lo is not None:
+        value = max(lo, value)
+    if hi is not None:
+        value = min(hi, value)
+    return value
+
+
+def _cfg_color(cfg, key):
+    value = cfg.get(key)
+    if not _HEX_COLOR.match(str(value).strip()):
+        logger.warning("Better Shot: invalid color %s=%r; using %r", key, value, DEFAULTS[key])
+        value = DEFAULTS[key]
+    return _parse_hex_color(value)
+
+
+def _cfg_choice(cfg, key, choices):
+    value = str(cfg.get(key) or "").lower()
+    if value not in choices:
+        logger.warning("Better Shot: invalid %s=%r; using %r", key, cfg.get(key), DEFAULTS[key])
+        value = DEFAULTS[key]
+    return value
+
+
+def compile_plan(cfg: dict) -> RenderPlan:
+    """Validate a config dict (over DEFAULTS) and build the render plan."""
+    cfg = dict(DEFAULTS, **cfg)
+    mode = str(cfg.get("watermark_type") or "none").lower()
+    mode = _MODE_ALIASES.get(mode, mode)
+    if mode not in MODES:
+        logger.warning("Better Shot: unknown watermark_type %r; using none", mode)
+        mode = "none"
+    quality = cfg.get("pf_blur_quality")
+    if not isinstance(quality, (int, float)):
+        quality = _cfg_choice(cfg, "pf_blur_quality", _BLUR_QUALITY)
+    backend = _cfg_choice(cfg, "backend", ("auto", "numpy", "pillow"))
+    edge_opacity = _cfg_number(cfg, "edge_opacity", float, 0.0, 1.0)
+    logo_opacity = _cfg_number(cfg, "watermark_opacity", float, 0.0, 1.0)
+    logo = cfg.get("watermark_image")
+    text = str(cfg.get("watermark_text") or "")
+    return RenderPlan(
+        mode=mode,
+        margin=_cfg_number(cfg, "margin", int, 0),
+        radius=_cfg_number(cfg, "radius", int, 0),
+        blur=_cfg_number(cfg, "edge_blur", int, 0),
+        bg_color=_cfg_color(cfg, "background"),
+        glow_color=_apply_opacity(_cfg_color(cfg, "shadow"), edge_opacity),
+        blur_quality=quality,
+        use_numpy=np is not None and backend in ("auto", "numpy"),
+        text=text,
+        frame_text=text or "Shot on CopyBento",
+        logo_path=os.path.abspath(str(logo)) if logo else None,
+        logo_opacity=logo_opacity,
+        logo_scale=_cfg_number(cfg, "watermark_scale", float, 0.0),
+        pf_align=_cfg_choice(cfg, "pf_align", ("center", "left")),
+        pf_left_margin=_cfg_number(cfg, "pf_left_margin", int, 0),
+        pf_font_scale=_cfg_number(cfg, "pf_font_scale", float, 0.0),
+        pf_font_min=_cfg_number(cfg, "pf_font_min", int, 1),
+        wm_font_scale=_cfg_number(cfg, "wm_font_scale", float, 0.0),
+        wm_font_min=_cfg_number(cfg, "wm_font_min", int, 1),
+        wm_fill=(255, 255, 255, int(255 * logo_opacity)),
+    )
+
+
+_overrides = {}  # configure() で与えた値（ベンチマーク等）
+_plan: Optional[RenderPlan] = None
+_plan_version = None
+
+
+def configure(**values):
+    """Override config values in this process (benchmarks); applies to the next render."""
+    global _plan
+    _overrides.update(values)
+    _plan = None
+
+
+def _config_version():
+    try:
+        from Library import settings as _settings
+
+        return _settings.get_version()
+    except Exception:
+        return None
+
+
+def _load_config() -> dict:
+    try:
+        from Library import settings as _settings
+
+        return _settings.get_plugin_config("better_shot")
+    except Exception:
+        return {}
+
+
+def current_plan() -> RenderPlan:
+    """The render plan for the current settings (rebuilt only when they change)."""
+    global _plan, _plan_version
+    version = _config_version()
+    plan = _plan
+    if plan is None or version != _plan_version:
+        plan = compile_plan(dict(_load_config(), **_overrides))
+        _plan, _plan_version = plan, version
+        for cached in _ASSET_CACHES:
+            cached.cache_clear()
+    return plan
+
+
+# pf_blur 背景を縮小解像度で何 px ぼかすか（None は等倍でぼかす従来の方法）
+_BLUR_QUALITY = {"fast": 2.0, "balanced": 4.0, "exact": None}
+
+
+def _blurred_background(src, canvas_size, radius: float, quality="balanced"):
+    """
+    src をキャンバス全体に広げてぼかした背景(RGBA)。
+    fast/balanced は「縮小 → 低解像度でぼかす → 拡大」で近似する。ぼかし後は
+    低周波成分しか残らないので、見た目は等倍ぼかしとほぼ同じで大幅に速い。
+    """
+    if isinstance(quality, (int, float)):
+        target = float(quality)
+    else:
+        target = _BLUR_QUALITY.get(str(quality).lower(), _BLUR_QUALITY["balanced"])
+    if not target or radius <= target:
+        return src.resize(canvas_size, Image.LANCZOS).filter(
+            ImageFilter.GaussianBlur(radius)
+        )
+    scale = target / float(radius)
+    small = (
+        max(1, int(round(canvas_size[0] * scale))),
+        max(1, int(round(canvas_size[1] * scale))),
+    )
+    # 最終的に RGB へ変換されるので、アルファの乗算/除算を避けて RGB で処理する
+    bg = src.convert("RGB").resize(small, Image.BOX, reducing_gap=2.0)
+    bg = bg.filter(ImageFilter.GaussianBlur(target))
+    return bg.resize(canvas_size, Image.BILINEAR).convert("RGBA")
+
+
+# ---- NumPy 合成バックエンド ----
+# Pillow の paste(mask) と同じ丸め (DIV255) で、グロー・角丸貼り付けを
+# キャンバス上で直接行う。マスクが 255 の内側は単純コピーになるので、
+# ブレンドは外周の帯と角だけで済み、全面サイズの中間画像を作らない。
+
+def _np_div255(v):
+    v = v + 128
+    return ((v >> 8) + v) >> 8
+
+
+def _np_blend(dst, src, mask):
+    """dst = paste(src, mask) 相当を in-place で計算（dst: uint8 view）。"""
+    mk = mask.astype(np.int32)[..., None]
+    dst[...] = _np_div255(
+        dst.astype(np.int32) * (255 - mk) + np.asarray(src, dtype=np.int32) * mk
+    )
+
+
+def _band_boxes(size, radius: int):
+    """角丸マスクが 255 未満になる外周の帯（src 座標の box、空の帯は除く）。"""
+    if radius <= 0:
+        return []
+    w, h = size
+    bt, bb, bl, br = _mask_bands(size, radius)
+    boxes = [
+        (0, 0, w, bt),
+        (0, h - bb, w, h),
+        (0, bt, bl, h - bb),
+        (w - br, bt, w, h - bb),
+    ]
+    return [b for b in boxes if b[2] > b[0] and b[3] > b[1]]
+
+
+def _round_corners_numpy(src, radius: int):
+    """Image.composite(src, 透明, mask) と同じ結果を、角の帯だけ in-place で作る。"""
+    mi = _rounded_rect_mask(src.size, radius)
+    for box in _band_boxes(src.size, radius):
+        sub = np.asarray(src.crop(box), dtype=np.int32)
+        mk = np.asarray(mi.crop(box), dtype=np.int32)[..., None]
+        src.paste(Image.fromarray(_np_div255(sub * mk).astype(np.uint8), "RGBA"), box[:2])
+    return src
+
+
+def _blend_region(canvas, box, src, mask):
+    """canvas の box 部分だけ取り出してブレンドし、書き戻す。"""
+    dst = np.array(canvas.crop(box))
+    _np_blend(dst, src, mask)
+    canvas.paste(Image.fromarray(dst, "RGBA"), box[:2])
+
+
+def _compose_numpy(
+    src, composited, canvas, bg_color, canvas_size, m, radius, blur, glow_color
+):
+    """
+    src を角丸で貼り付け、外側グローを付けた RGBA キャンバスを返す。
+    canvas は背景（Pillow RGBA、None なら bg_color 単色）で、直接書き換える。
+    composited=True なら src は角丸適用済み。
+    """
+    W, H = canvas_size
+    w, h = src.size
+    if canvas is None:
+        canvas = Image.new("RGBA", canvas_size, bg_color)
+    has_alpha = radius <= 0 and src.getextrema()[3][0] < 255
+    if has_alpha:
+        bt = bb = bl = br = None  # 透過のある画像は矩形全体をブレンド
+    else:
+        bt, bb, bl, br = _mask_bands((w, h), radius)
+
+    # グローはキャンバスのうち src に完全に覆われない部分だけ計算する
+    if blur > 0:
+        gm = _glow_mask((w, h), radius, blur, m)
+        gc = np.array(glow_color, dtype=np.int32)
+        if has_alpha:
+            regions = [(0, 0, W, H)]
+        else:
+            top, bottom = m + bt, m + h - bb
+            regions = [
+                (0, 0, W, top),
+                (0, bottom, W, H),
+                (0, top, m + bl, bottom),
+                (m + w - br, top, W, bottom),
+            ]
+        for box in regions:
+            if box[2] > box[0] and box[3] > box[1]:
+                _blend_region(canvas, box, gc, np.asarray(gm.crop(box)))
+
+    if has_alpha:
+        s = np.asarray(src)
+        _blend_region(canvas, (m, m, m + w, m + h), s, s[..., 3])
+        return canvas
+
+    # 角を含む外周の帯は、src を貼る前の背景とブレンドしておく
+    patches = []
+    if radius > 0:
+        mi = _rounded_rect_mask((w, h), radius)
+        for box in _band_boxes((w, h), radius):
+            x0, y0, x1, y1 = box
+            dst = np.array(canvas.crop((m + x0, m + y0, m + x1, m + y1)))
+            sub = np.asarray(src.crop(box))
+            mk = np.asarray(mi.crop(box))
+            if not composited:
+                # Image.composite(src, 透明, mask) 相当
+                sub = _np_div255(sub.astype(np.int32) * mk.astype(np.int32)[..., None])
+            _np_blend(dst, sub, mk)
+            patches.append(((m + x0, m + y0), dst))
+    canvas.paste(src, (m, m))
+    for pos, dst in patches:
+        canvas.paste(Image.fromarray(dst, "RGBA"), pos)
+    return canvas
+
+
 def generate_watermark(text=None, fill=(255, 255, 255, 160), size=48):
-    text = text or setting.get("watermark_text") or ""
+    text = text or current_plan().text
     font = _load_font(size)
     padding = int(size * 0.25)
     # テキストサイズを計算
@@ -137,16 +550,15 @@ def _draw_text_on_image(
     logo_w = logo_h = 0
     if logo_path and os.path.exists(logo_path):
         try:
-            tmp_logo = Image.open(logo_path).convert("RGBA")
+            mtime = _logo_mtime(logo_path)
+            tmp_logo = _logo_source(logo_path, mtime)
             target_h = max(12, int(th * 0.9))
             ratio = target_h / float(tmp_logo.height)
             logo_w = max(12, int(tmp_logo.width * ratio))
             logo_h = target_h
-            logo_img = tmp_logo.resize((logo_w, logo_h), Image.LANCZOS)
-            if logo_opacity < 1:
-                r, g, b, a = logo_img.split()
-                a = a.point(lambda v: int(v * max(0, min(1, logo_opacity))))
-                logo_img = Image.merge("RGBA", (r, g, b, a))
+            logo_img = _scaled_logo(
+                logo_path, (logo_w, logo_h), float(logo_opacity), mtime
+            )
         except Exception:
             logo_img = None
             logo_w = logo_h = 0
@@ -222,16 +634,15 @@ def _add_bottom_bar(
     logo_w = logo_h = 0
     if logo_path and os.path.exists(logo_path):
         try:
-            tmp_logo = Image.open(logo_path).convert("RGBA")
+            mtime = _logo_mtime(logo_path)
+            tmp_logo = _logo_source(logo_path, mtime)
             target_h = max(12, min(th, int(bar_h * 0.85)))
             ratio = target_h / float(tmp_logo.height)
             logo_w = max(12, int(tmp_logo.width * ratio))
             logo_h = target_h
-            logo_img = tmp_logo.resize((logo_w, logo_h), Image.LANCZOS)
-            if logo_opacity < 1:
-                r, g, b, a = logo_img.split()
-                a = a.point(lambda v: int(v * max(0, min(1, logo_opacity))))
-                logo_img = Image.merge("RGBA", (r, g, b, a))
+            logo_img = _scaled_logo(
+                logo_path, (logo_w, logo_h), float(logo_opacity), mtime
+            )
         except Exception:
             logo_img = None
             logo_w = logo_h = 0
@@ -278,17 +689,14 @@ def _add_bottom_bar(
 def _overlay_logo(img_rgba, logo_path, scale=0.12, opacity=0.9, margin=16):
     if not logo_path or not os.path.exists(logo_path):
         return img_rgba
-    logo = Image.open(logo_path).convert("RGBA")
+    mtime = _logo_mtime(logo_path)
+    logo = _logo_source(logo_path, mtime)
     W, H = img_rgba.size
     target_w = max(16, int(W * float(scale)))
     ratio = target_w / float(logo.width)
     target_h = max(16, int(logo.height * ratio))
-    logo = logo.resize((target_w, target_h), Image.LANCZOS)
-    # 不透明度
-    if opacity < 1:
-        r, g, b, a = logo.split()
-        a = a.point(lambda v: int(v * max(0, min(1, opacity))))
-        logo = Image.merge("RGBA", (r, g, b, a))
+    # リサイズ + 不透明度（キャッシュ）
+    logo = _scaled_logo(logo_path, (target_w, target_h), float(opacity), mtime)
     # 右下に配置
     pos = (W - target_w - margin, H - target_h - margin)
     out = img_rgba.copy()
@@ -296,93 +704,113 @@ def _overlay_logo(img_rgba, logo_path, scale=0.12, opacity=0.9, margin=16):
     return out
 
 
+# ベンチマーク用フック: 各段階の終わりに _stage_clock(段階名) を呼ぶ（通常は None）
+# 段階: prepare, background, compose, overlay, finalize, encode
+_stage_clock = None
+
+
+def _lap(stage: str):
+    if _stage_clock is not None:
+        _stage_clock(stage)
+
+
 def on_clipboard(data_type, value):
     if data_type == "image":
+        plan = current_plan()
         img = value
-        m = int(setting.get("margin", 0) or 0)
-        radius = int(setting.get("radius", 0) or 0)
-        blur = int(setting.get("edge_blur", 24) or 0)
-        edge_opacity = float(setting.get("edge_opacity", 0.5) or 0.0)
-        bg_color = _parse_hex_color(setting.get("background", "ffffff"))
-        edge_color = _parse_hex_color(setting.get("shadow", "000000"))
-        mode = (setting.get("watermark_type") or "none").lower()
+        m, radius, blur = plan.margin, plan.radius, plan.blur
+        bg_color, mode, use_numpy = plan.bg_color, plan.mode, plan.use_numpy
 
         # ソース画像(RGBA)と角丸マスク
         src = img.convert("RGBA")
         w, h = src.size
         mask_inner = _rounded_rect_mask((w, h), radius)
-        if radius > 0:
+        # NumPy 合成では角丸は角の帯だけで処理する（pf_blur は背景用に必要）
+        composited = radius > 0 and (mode == "pf_blur" or not use_numpy)
+        if composited and use_numpy:
+            src = _round_corners_numpy(src, radius)
+        elif composited:
             src = Image.composite(
                 src, Image.new("RGBA", (w, h), (0, 0, 0, 0)), mask_inner
             )
+        _lap("prepare")
 
         # 出力キャンバス
         canvas_size = (w + m * 2, h + m * 2)
         if mode == "pf_blur":
             # 背景を元画像のブラーで埋める（Vivo 風）
-            bg = src.resize(canvas_size, Image.LANCZOS).filter(
-                ImageFilter.GaussianBlur(max(10, blur))
+            canvas = _blurred_background(
+                src,
+                canvas_size,
+                max(10, blur),
+                plan.blur_quality,
             )
-            canvas = Image.new("RGBA", canvas_size)
-            canvas.paste(bg, (0, 0))
             # ブラーの上にもテキスト/ロゴを載せる（自動白黒）
             # フォントサイズは margin-5 に固定し、位置は下マージン中央に来るように調整
-            text = setting.get("watermark_text") or "Shot on CopyBento"
             H_total = canvas_size[1]
             bottom_offset = (m / float(2 * H_total)) if H_total > 0 else 0.08
             canvas = _draw_text_on_image(
                 canvas,
-                text,
-                align=(setting.get("pf_align") or "center"),
-                left_pad=int(setting.get("pf_left_margin", 24)),
-                logo_path=setting.get("watermark_image"),
-                logo_opacity=float(setting.get("watermark_opacity", 0.9)),
+                plan.frame_text,
+                align=plan.pf_align,
+                left_pad=plan.pf_left_margin,
+                logo_path=plan.logo_path,
+                logo_opacity=plan.logo_opacity,
                 spacing_ratio=0.25,
                 font_scale=0.0,
                 font_min=max(8, int(m) - 25),
                 bottom_offset_ratio=max(0.0, min(0.5, bottom_offset)),
             )
+        elif use_numpy:
+            canvas = None  # 単色背景は _compose_numpy が作る
         else:
             canvas = Image.new("RGBA", canvas_size, bg_color)
 
-        # 縁取りブラー（外側グロー）
-        if blur > 0:
-            mask_outer = Image.new("L", canvas_size, 0)
-            mask_outer.paste(mask_inner, (m, m))
-            blurred = mask_outer.filter(ImageFilter.GaussianBlur(blur))
-            glow_color = _apply_opacity(edge_color, edge_opacity)
-            glow_layer = Image.new("RGBA", canvas_size, glow_color)
-            canvas.paste(glow_layer, (0, 0), blurred)
+        _lap("background")
 
-        # 元画像（角丸適用済み）を重ねる
-        canvas.paste(src, (m, m), mask_inner if radius > 0 else src)
+        glow_color = plan.glow_color
+        if use_numpy:
+            canvas = _compose_numpy(
+                src,
+                composited,
+                canvas,
+                bg_color,
+                canvas_size,
+                m,
+                radius,
+                blur,
+                glow_color,
+            )
+        else:
+            # 縁取りブラー（外側グロー）
+            if blur > 0:
+                blurred = _glow_mask((w, h), radius, blur, m)
+                glow_layer = Image.new("RGBA", canvas_size, glow_color)
+                canvas.paste(glow_layer, (0, 0), blurred)
+
+            # 元画像（角丸適用済み）を重ねる
+            canvas.paste(src, (m, m), mask_inner if radius > 0 else src)
+        # 以降は src を使わない。大きな画像では仕上げの変換前に解放しておく
+        src = None
+        _lap("compose")
 
         # 写真フレーム/ウォーターマーク適用
         if mode == "pf":
-            text = setting.get("watermark_text") or "Shot on CopyBento"
             canvas = _add_bottom_bar(
                 canvas,
-                text,
-                logo_path=setting.get("watermark_image"),
-                logo_opacity=float(setting.get("watermark_opacity", 0.9)),
-                align=(setting.get("pf_align") or "center"),
-                left_pad=int(setting.get("pf_left_margin", 24)),
-                font_scale=float(setting.get("pf_font_scale", 0.45)),
-                font_min=int(setting.get("pf_font_min", 18)),
+                plan.frame_text,
+                logo_path=plan.logo_path,
+                logo_opacity=plan.logo_opacity,
+                align=plan.pf_align,
+                left_pad=plan.pf_left_margin,
+                font_scale=plan.pf_font_scale,
+                font_min=plan.pf_font_min,
             )
-        elif mode in ("watermark", "wotermark"):
+        elif mode == "watermark":
             wm = generate_watermark(
-                setting.get("watermark_text"),
-                fill=(
-                    255,
-                    255,
-                    255,
-                    int(255 * float(setting.get("watermark_opacity", 0.8))),
-                ),
-                size=max(
-                    int(setting.get("wm_font_min", 24)),
-                    int((w + m * 2) * float(setting.get("wm_font_scale", 0.05))),
-                ),
+                plan.text,
+                fill=plan.wm_fill,
+                size=max(plan.wm_font_min, int((w + m * 2) * plan.wm_font_scale)),
             )
             # 右下に配置
             W, H = canvas.size
@@ -392,30 +820,26 @@ def on_clipboard(data_type, value):
         elif mode == "logo":
             canvas = _overlay_logo(
                 canvas,
-                setting.get("watermark_image"),
-                scale=float(setting.get("watermark_scale", 0.12)),
-                opacity=float(setting.get("watermark_opacity", 0.9)),
+                plan.logo_path,
+                scale=plan.logo_scale,
+                opacity=plan.logo_opacity,
                 margin=max(8, m // 2),
             )
 
+        _lap("overlay")
+
         # 仕上げ: RGB に変換（背景あり）
         out = canvas.convert("RGB")
+        _lap("finalize")
         # canvas.save("better_shot_output.jpg", "PNG")  # debug 保存したいとき有効化
-        try:
+        # ペーストボードへの書き戻しは本体が行う（WRITE_BACK）。
+        # ここで一度だけエンコードし、同じバイト列を書き戻しと履歴保存に使う
+        if imagecodec is not None:
             try:
-                png_type = NSPasteboardTypePNG
+                encoded = imagecodec.encode(out)
+                _lap("encode")
+                return ("image", out, encoded)
             except Exception:
-                png_type = "public.png"
-
-            buf = io.BytesIO()
-            out.save(buf, format="PNG")
-            b = buf.getvalue()
-            nsdata = NSData.dataWithBytes_length_(b, len(b))
-
-            pb = NSPasteboard.generalPasteboard()
-            pb.clearContents()
-            pb.setData_forType_(nsdata, png_type)
-        except Exception:
-            pass
+                pass
         return ("image", out)
     return None
@@ -1,4 +1,6 @@
 NAME = "History Provider"
+# 履歴の読み出し専用（クリップボードイベントは受け取らない）
+TYPES = ()
 import os, json
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -22,10 +24,11 @@ def get_history():
                 if t not in ("text", "image"):
                     continue
                 # Ensure preview
-                if t == "text":
+                if t == "text" and "text" in it:
                     txt = it.get("text") or ""
                     it["preview"] = (txt[:100] + "...") if len(txt) > 100 else txt
                 else:
+                    # 画像と、本文が別ファイルの大きなテキスト（Library/textstore.py）は保存済みの preview
                     it.setdefault("preview", "[Image]")
                 out.append(it)
             out.sort(key=lambda r: r.get("ts", 0), reverse=True)
@@ -34,6 +37,13 @@ def get_history():
         return []
 
 
+def get_text(item):
+    """Full text of a history item (loads out-of-line texts on demand)."""
+    from Library import textstore
+
+    return textstore.load_text(item)
+
+
 def on_startup(event_manager):
     # Example: plugins can register hotkeys here if desired
     # event_manager.register_hotkey("shift+cmd+v", "open_history_gui")
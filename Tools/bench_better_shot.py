@@ -0,0 +1,232 @@
+"""
+Better Shot render benchmark suite.
+
+Renders synthetic screenshots at common resolutions through every mode
+(pf, pf_blur, watermark, logo, none) and radius/blur combination. Reports
+time per stage, peak memory and output size. Each case runs in a fresh
+subprocess so peak RSS is per case. The pasteboard write-back goes to
+mcb.MemoryPasteboard, so the suite runs headless (no AppKit needed).
+
+    python Tools/bench_better_shot.py [--runs 3] [--sizes 1920x1080,3840x2160]
+        [--modes pf,none] [--json out.json] [--compare baseline.json]
+
+With --compare, cases slower than the baseline by more than --threshold
+are listed and the exit status is 1.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+RESOLUTIONS = [(1280, 800), (1920, 1080), (2880, 1800), (3840, 2160)]
+MODES = ["pf", "pf_blur", "watermark", "logo", "none"]
+RADII = [0, 20]
+BLURS = [0, 10]
+STAGES = ["prepare", "background", "compose", "overlay", "finalize", "encode"]
+
+
+def _case_key(row):
+    return (row["size"], row["mode"], row["radius"], row["blur"], row.get("backend"))
+
+
+def _child(args):
+    from PIL import Image
+
+    from Library import mcb
+    from Plugins import better_shot
+    from Tools.bench_compose import _peak_rss_mb
+
+    mcb.set_backend(mcb.MemoryPasteboard())
+    with Image.open(args.image) as f:
+        img = f.convert("RGB")
+    better_shot.configure(
+        watermark_type=args.mode,
+        radius=args.radius,
+        edge_blur=args.blur,
+        watermark_image=args.logo,
+        backend=args.backend,
+    )
+    base = _peak_rss_mb()
+
+    laps = {}
+    last = [0.0]
+
+    def _clock(stage):
+        now = time.perf_counter()
+        laps.setdefault(stage, []).append(now - last[0])
+        last[0] = now
+
+    better_shot._stage_clock = _clock
+    totals = []
+    out = encoded = None
+    # 1 回目はアセットキャッシュ（マスク・フォント等）が空の状態
+    for _ in range(args.runs + 1):
+        t0 = last[0] = time.perf_counter()
+        result = better_shot.on_clipboard("image", img)
+        out = result[1]
+        encoded = result[2] if len(result) > 2 else None
+        last[0] = time.perf_counter()
+        mcb.MacClipboard.set_image(out, encoded)
+        _clock("writeback")
+        totals.append(time.perf_counter() - t0)
+    better_shot._stage_clock = None
+
+    warm = slice(1, None) if args.runs > 0 else slice(0, None)
+    row = {
+        "size": "%dx%d" % img.size,
+        "mode": args.mode,
+        "radius": args.radius,
+        "blur": args.blur,
+        "backend": args.backend,
+        "cold_ms": round(totals[0] * 1000, 2),
+        "ms": round(statistics.median(totals[warm]) * 1000, 2),
+        "stages_ms": {
+            name: round(statistics.median(vals[warm]) * 1000, 2)
+            for name, vals in laps.items()
+        },
+        "peak_rss_mb": (
+            round(_peak_rss_mb() - base, 1) if base is not None else None
+        ),
+        "output": "%dx%d" % out.size,
+        "output_bytes": len(mcb.MacClipboard.get_image_data().data),
+    }
+    print(json.dumps(row))
+
+
+def _print_row(row):
+    stages = " ".join(
+        "%s=%.1f" % (name[:4], row["stages_ms"].get(name, 0.0))
+        for name in STAGES + ["writeback"]
+    )
+    print(
+        "%-10s %-9s r=%-2d b=%-2d %8.1f ms (cold %7.1f)  peak +%6s MB  %7d KB  %s"
+        % (
+            row["size"],
+            row["mode"],
+            row["radius"],
+            row["blur"],
+            row["ms"],
+            row["cold_ms"],
+            row["peak_rss_mb"] if row["peak_rss_mb"] is not None else "-",
+            row["output_bytes"] // 1024,
+            stages,
+        )
+    )
+
+
+def _compare(results, baseline_path, threshold):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {_case_key(r): r for r in json.load(f).get("results", [])}
+    regressions = []
+    for row in results:
+        old = baseline.get(_case_key(row))
+        if not old or not old.get("ms"):
+            continue
+        ratio = row["ms"] / old["ms"]
+        if ratio > 1 + threshold:
+            regressions.append((row, old, ratio))
+    for row, old, ratio in regressions:
+        print(
+            "REGRESSION %-10s %-9s r=%-2d b=%-2d %.1f -> %.1f ms (x%.2f)"
+            % (
+                row["size"],
+                row["mode"],
+                row["radius"],
+                row["blur"],
+                old["ms"],
+                row["ms"],
+                ratio,
+            )
+        )
+    print("%d case(s) compared, %d regression(s)" % (len(results), len(regressions)))
+    return not regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=3, help="warm runs per case")
+    ap.add_argument("--sizes", help="e.g. 1920x1080,3840x2160")
+    ap.add_argument("--modes", help="comma-separated subset of %s" % ",".join(MODES))
+    ap.add_argument("--backend", default="auto", help="auto, numpy or pillow")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="baseline JSON from a previous run")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--image", help=argparse.SUPPRESS)
+    ap.add_argument("--logo", help=argparse.SUPPRESS)
+    ap.add_argument("--mode", help=argparse.SUPPRESS)
+    ap.add_argument("--radius", type=int, default=0, help=argparse.SUPPRESS)
+    ap.add_argument("--blur", type=int, default=0, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(args)
+        return
+
+    from PIL import Image, ImageDraw
+
+    from Tools.bench_blur import synthetic_screenshot
+
+    sizes = RESOLUTIONS
+    if args.sizes:
+        sizes = [tuple(int(v) for v in s.split("x")) for s in args.sizes.split(",")]
+    modes = args.modes.split(",") if args.modes else MODES
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        logo = os.path.join(tmp, "logo.png")
+        mark = Image.new("RGBA", (256, 256), (0, 0, 0, 0))
+        ImageDraw.Draw(mark).ellipse((16, 16, 240, 240), fill=(255, 255, 255, 220))
+        mark.save(logo)
+        for size in sizes:
+            image = os.path.join(tmp, "%dx%d.png" % size)
+            synthetic_screenshot(size).save(image, compress_level=1)
+            for mode, radius, blur in itertools.product(modes, RADII, BLURS):
+                proc = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--child",
+                        "--image", image,
+                        "--logo", logo,
+                        "--mode", mode,
+                        "--radius", str(radius),
+                        "--blur", str(blur),
+                        "--backend", args.backend,
+                        "--runs", str(args.runs),
+                    ],
+                    cwd=BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                if proc.returncode != 0:
+                    print(
+                        "%dx%d %s r=%d b=%d failed: %s"
+                        % (size + (mode, radius, blur, proc.stderr.strip()))
+                    )
+                    continue
+                row = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(row)
+                _print_row(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"runs": args.runs, "backend": args.backend, "results": results},
+                f,
+                indent=2,
+            )
+    if args.compare and not _compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Better Shot pf_blur background benchmark.
+
+Compares the exact path (full-size LANCZOS resize + GaussianBlur) with the
+downsampled fast paths at several resolutions, reporting time and a
+perceptual difference (SSIM on luma when NumPy is available, plus PSNR).
+
+    python Tools/bench_blur.py [--runs 5] [--json out.json]
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat  # noqa: E402
+
+from Plugins import better_shot  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:  # optional: SSIM is skipped without NumPy
+    np = None
+
+RESOLUTIONS = [(1280, 800), (1920, 1080), (2880, 1800), (3840, 2160), (5120, 2880)]
+QUALITIES = ["exact", "balanced", "fast"]
+
+
+def synthetic_screenshot(size):
+    """Window-like test image: gradient, UI blocks, text-ish stripes."""
+    w, h = size
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, w, max(20, h // 20)), fill=(236, 236, 236))
+    for i in range(12):
+        x = (i * 97) % max(1, w - 200)
+        y = (i * 151) % max(1, h - 120)
+        draw.rectangle((x, y, x + 200, y + 120), fill=(40 + i * 15, 90, 200 - i * 10))
+    for y in range(h // 8, h, max(6, h // 60)):
+        draw.line((w // 10, y, w // 2, y), fill=(20, 20, 20), width=2)
+    return img
+
+
+def _psnr(a, b):
+    diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+    mse = sum(v * v for v in ImageStat.Stat(diff).rms) / 3.0
+    return float("inf") if mse == 0 else 10 * math.log10(255.0 * 255.0 / mse)
+
+
+def _ssim(a, b):
+    if np is None:
+        return None
+    x = np.asarray(a.convert("L"), dtype=np.float64)
+    y = np.asarray(b.convert("L"), dtype=np.float64)
+
+    def _box(z, k=8):
+        # 非重複 8x8 ウィンドウの平均（局所統計の簡易版）
+        h, w = (z.shape[0] // k) * k, (z.shape[1] // k) * k
+        return z[:h, :w].reshape(h // k, k, w // k, k).mean(axis=(1, 3))
+
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = _box(x), _box(y)
+    vx = _box(x * x) - mx * mx
+    vy = _box(y * y) - my * my
+    cov = _box(x * y) - mx * my
+    s = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(s.mean())
+
+
+def _time(fn, runs):
+    out = None
+    secs = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = fn()
+        secs.append(time.perf_counter() - t0)
+    return out, statistics.median(secs)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--radius", type=float, default=10)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    margin = better_shot.current_plan().margin
+    results = []
+    for size in RESOLUTIONS:
+        src = synthetic_screenshot(size).convert("RGBA")
+        canvas = (size[0] + margin * 2, size[1] + margin * 2)
+        ref = None
+        for q in QUALITIES:
+            out, sec = _time(
+                lambda: better_shot._blurred_background(src, canvas, args.radius, q),
+                args.runs,
+            )
+            if ref is None:
+                ref, ref_sec = out, sec
+            row = {
+                "size": "%dx%d" % size,
+                "quality": q,
+                "ms": round(sec * 1000, 2),
+                "speedup": round(ref_sec / sec, 2) if sec else None,
+                "psnr_db": round(_psnr(ref, out), 2) if q != "exact" else None,
+                "ssim": (round(_ssim(ref, out), 5) if q != "exact" and np else None),
+            }
+            results.append(row)
+            print(
+                "%-10s %-9s %8.1f ms  x%-6s psnr %-7s ssim %s"
+                % (
+                    row["size"],
+                    q,
+                    row["ms"],
+                    row["speedup"],
+                    row["psnr_db"] if row["psnr_db"] is not None else "-",
+                    row["ssim"] if row["ssim"] is not None else "-",
+                )
+            )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"radius": args.radius, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+End-to-end capture benchmark.
+
+Drives main.py's capture pipeline (change detection -> PluginManager.process
+-> history persistence) through mcb.MemoryPasteboard, so it runs headless on
+Linux. Each workload runs in a fresh subprocess with settings and history in
+a temporary directory. Reported per workload:
+
+- copy -> persisted latency: first history write, and final write (for
+  types rendered in the worker pool, after the result was written back)
+- CPU seconds per idle minute of the watcher
+- burst: copies captured vs lost, and captures per second
+- history read time (history.json and the History Provider plugin)
+
+    python Tools/bench_capture.py [--workloads text,image] [--copies 20]
+        [--burst 50] [--gap-ms 20] [--idle 10] [--json out.json]
+        [--compare baseline.json] [--threshold 0.15]
+
+With --compare, workloads worse than the baseline by more than --threshold
+(latency, idle CPU or burst throughput) are listed and the exit status is 1.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+WORKLOADS = ["text", "image"]
+# 比較する指標と向き（+1: 大きいほど悪い、-1: 小さいほど悪い）
+METRICS = {
+    "first_p50_ms": 1,
+    "final_p50_ms": 1,
+    "idle_cpu_s_per_min": 1,
+    "burst_per_s": -1,
+}
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class _Recorder:
+    """Wraps main._persist_history and records when each write finished."""
+
+    def __init__(self, main):
+        self.events = []  # (perf_counter, ts, data_type)
+        self._cond = threading.Condition()
+        persist = main._persist_history
+
+        def _tracked(ts, data_type, value, *args, **kwargs):
+            persist(ts, data_type, value, *args, **kwargs)
+            with self._cond:
+                self.events.append((time.perf_counter(), ts, data_type))
+                self._cond.notify_all()
+
+        main._persist_history = _tracked
+
+    def wait_for(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.events) < count:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def wait_quiet(self, since, quiet, timeout):
+        """Wait until nothing has been persisted for quiet seconds after since."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                last = max(since, self.events[-1][0] if self.events else 0.0)
+            if time.perf_counter() - last >= quiet:
+                return True
+            time.sleep(0.05)
+        return False
+
+
+def _make_copies(workload, count, args):
+    """Pre-built pasteboard payloads (each distinct, so every copy is a change)."""
+    from Library import imagecodec, mcb
+
+    if workload == "text":
+        body = "x" * max(0, args.text_bytes - 32)
+        return [
+            (lambda i=i: mcb.MacClipboard.set_text("bench %06d %s" % (i, body)))
+            for i in range(count)
+        ]
+
+    from PIL import ImageDraw
+
+    from Tools.bench_blur import synthetic_screenshot
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    base = synthetic_screenshot(size)
+    copies = []
+    for i in range(count):
+        img = base.copy()
+        ImageDraw.Draw(img).rectangle((0, 0, 40 + i % 200, 12), fill=(i % 256, 0, 0))
+        enc = imagecodec.encode(img, {"format": "png", "compress_level": 1})
+        copies.append(lambda enc=enc: mcb.MacClipboard.set_image_data(enc))
+    return copies
+
+
+def start_pipeline(tmp, watcher=True):
+    """
+    Import main.py with settings and history under tmp and the in-memory
+    pasteboard, load the plugins and (with watcher) start the event loop.
+    Must run before anything imports Library.settings. Returns (main, recorder).
+    """
+    # 設定と履歴は一時ディレクトリへ（実際の ~/.config と History/ には触れない）
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(tmp, "config")
+    from Library import mcb
+
+    mcb.set_backend(mcb.MemoryPasteboard())
+
+    import main
+    from Plugins import history_provider
+
+    main.HIST_DIR = os.path.join(tmp, "History")
+    main.HIST_JSON = os.path.join(main.HIST_DIR, "history.json")
+    history_provider.HIST_JSON = main.HIST_JSON
+    os.makedirs(main.HIST_DIR, exist_ok=True)
+
+    recorder = _Recorder(main)
+    main._load_plugins()
+    if watcher:
+        threading.Thread(target=main._run_asyncio, daemon=True).start()
+    return main, recorder
+
+
+def history_read_ms(main, runs=20):
+    """Median ms to read history.json and the History Provider's list."""
+    from Plugins import history_provider
+
+    reads_json, reads_provider = [], []
+    for _ in range(runs):
+        t = time.perf_counter()
+        main._load_history_file()
+        reads_json.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        history_provider.get_history()
+        reads_provider.append(time.perf_counter() - t)
+    return (
+        round(statistics.median(reads_json) * 1000, 2),
+        round(statistics.median(reads_provider) * 1000, 2),
+    )
+
+
+def _child(args):
+    main, recorder = start_pipeline(args.tmp)
+
+    copies = _make_copies(args.workload, 1 + args.copies + args.burst, args)
+    expected = 1
+    if main.plugins.renders_async(args.workload) and main.plugins.runtime.get(
+        "passthrough", True
+    ):
+        expected = 2  # 元のコピーを記録 -> 結果で差し替え
+    time.sleep(0.6)  # 監視が初期状態を読み込むまで待つ
+
+    jitter = random.Random(0)
+
+    def _one(copy):
+        n0 = len(recorder.events)
+        t0 = time.perf_counter()
+        copy()
+        if not recorder.wait_for(n0 + expected, args.timeout):
+            return None
+        events = recorder.events
+        first, final = events[n0][0] - t0, events[n0 + expected - 1][0] - t0
+        # 結果の書き戻しを監視が読み飛ばし、次の変化を待ち始めるまで待つ。
+        # 揺らぎを入れて、コピーの時刻が監視のポーリング周期に揃わないようにする
+        time.sleep(args.settle + jitter.uniform(0.0, 0.5))
+        return first, final
+
+    cold = _one(copies[0])  # ワーカー起動・プラグインの import を含む
+    firsts, finals, timeouts = [], [], 0
+    for copy in copies[1 : 1 + args.copies]:
+        got = _one(copy)
+        if got is None:
+            timeouts += 1
+            continue
+        firsts.append(got[0])
+        finals.append(got[1])
+
+    # アイドル時の CPU（監視スレッドのポーリング分）
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    time.sleep(args.idle)
+    idle_cpu = (time.process_time() - cpu0) / (time.perf_counter() - wall0) * 60.0
+
+    # バースト: 間隔 gap_ms で連続コピーし、記録された件数と速さを見る
+    n0 = len(recorder.events)
+    t0 = time.perf_counter()
+    for copy in copies[1 + args.copies :]:
+        copy()
+        if args.gap_ms:
+            time.sleep(args.gap_ms / 1000.0)
+    recorder.wait_quiet(time.perf_counter(), max(2.0, args.settle * 4), args.timeout)
+    burst_events = recorder.events[n0:]
+    captured = len({ts for _, ts, _ in burst_events})
+    burst_secs = (burst_events[-1][0] - t0) if burst_events else None
+
+    read_json_ms, read_provider_ms = history_read_ms(main)
+
+    def _ms(v):
+        return round(v * 1000, 2) if v is not None else None
+
+    row = {
+        "workload": args.workload,
+        "size": args.size if args.workload == "image" else "%dB" % args.text_bytes,
+        "plugins": [p["key"] for p in main.plugins.plugins if p.get("enabled")],
+        "cold_ms": _ms(cold[1]) if cold else None,
+        "copies": len(finals),
+        "timeouts": timeouts,
+        "first_p50_ms": _ms(_percentile(firsts, 0.5)),
+        "first_p95_ms": _ms(_percentile(firsts, 0.95)),
+        "final_p50_ms": _ms(_percentile(finals, 0.5)),
+        "final_p95_ms": _ms(_percentile(finals, 0.95)),
+        "idle_cpu_s_per_min": round(idle_cpu, 3),
+        "burst": args.burst,
+        "burst_gap_ms": args.gap_ms,
+        "burst_captured": captured,
+        "burst_lost": args.burst - captured,
+        "burst_per_s": round(captured / burst_secs, 2) if burst_secs else None,
+        "history_items": len(main._load_history_file()),
+        "history_read_ms": read_json_ms,
+        "provider_read_ms": read_provider_ms,
+    }
+    main.plugins.shutdown()
+    print(json.dumps(row))
+
+
+def _print_row(row):
+    print(
+        "%-5s %-9s first p50 %7s ms  final p50 %7s / p95 %7s ms (cold %s)  "
+        "idle %.3f cpu-s/min  burst %d/%d at %s/s  read %s ms"
+        % (
+            row["workload"],
+            row["size"],
+            row["first_p50_ms"],
+            row["final_p50_ms"],
+            row["final_p95_ms"],
+            row["cold_ms"],
+            row["idle_cpu_s_per_min"],
+            row["burst_captured"],
+            row["burst"],
+            row["burst_per_s"],
+            row["history_read_ms"],
+        )
+    )
+
+
+def _compare(results, baseline_path, threshold):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["workload"]: r for r in json.load(f).get("results", [])}
+    regressions = []
+    for row in results:
+        old = baseline.get(row["workload"])
+        if not old:
+            continue
+        for metric, sign in METRICS.items():
+            new_v, old_v = row.get(metric), old.get(metric)
+            if not new_v or not old_v:
+                continue
+            ratio = new_v / old_v if sign > 0 else old_v / new_v
+            if ratio > 1 + threshold:
+                regressions.append((row["workload"], metric, old_v, new_v, ratio))
+    for workload, metric, old_v, new_v, ratio in regressions:
+        print(
+            "REGRESSION %-5s %-18s %s -> %s (x%.2f)"
+            % (workload, metric, old_v, new_v, ratio)
+        )
+    print("%d workload(s) compared, %d regression(s)" % (len(results), len(regressions)))
+    return not regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--workloads", help="comma-separated subset of %s" % ",".join(WORKLOADS))
+    ap.add_argument("--copies", type=int, default=20, help="timed copies per workload")
+    ap.add_argument("--burst", type=int, default=50, help="copies in the burst")
+    ap.add_argument("--gap-ms", type=float, default=20.0, help="gap between burst copies")
+    ap.add_argument("--idle", type=float, default=10.0, help="idle seconds to measure")
+    ap.add_argument("--size", default="1920x1080", help="image workload resolution")
+    ap.add_argument("--text-bytes", type=int, default=1024)
+    ap.add_argument("--settle", type=float, default=0.3, help=argparse.SUPPRESS)
+    ap.add_argument("--timeout", type=float, default=30.0, help=argparse.SUPPRESS)
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="baseline JSON from a previous run")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--workload", help=argparse.SUPPRESS)
+    ap.add_argument("--tmp", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(args)
+        return
+
+    workloads = args.workloads.split(",") if args.workloads else WORKLOADS
+    results = []
+    for workload in workloads:
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--child",
+                "--workload", workload,
+                "--tmp", tmp,
+                "--copies", str(args.copies),
+                "--burst", str(args.burst),
+                "--gap-ms", str(args.gap_ms),
+                "--idle", str(args.idle),
+                "--size", args.size,
+                "--text-bytes", str(args.text_bytes),
+                "--settle", str(args.settle),
+                "--timeout", str(args.timeout),
+            ]
+            proc = subprocess.run(cmd, cwd=BASE_DIR, capture_output=True, text=True)
+        lines = proc.stdout.strip().splitlines()
+        if proc.returncode != 0 or not lines:
+            print("%s failed: %s" % (workload, proc.stderr.strip()[-2000:]))
+            continue
+        row = json.loads(lines[-1])
+        results.append(row)
+        _print_row(row)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+    if args.compare and not _compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
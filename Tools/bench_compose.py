@@ -0,0 +1,150 @@
+"""
+Better Shot compositing backend benchmark.
+
+Renders the same synthetic screenshot with the Pillow and NumPy backends at
+several resolutions and reports median time, the maximum per-channel pixel
+difference between the two outputs, and peak RSS. Each backend/resolution
+pair runs in a fresh subprocess so the peak-memory figures do not bleed into
+each other.
+
+    python Tools/bench_compose.py [--runs 5] [--mode pf] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+RESOLUTIONS = [(1280, 800), (1920, 1080), (2880, 1800), (3840, 2160), (5120, 2880)]
+BACKENDS = ["pillow", "numpy"]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KiB
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _child(args):
+    """Run one backend at one size and print a JSON row (subprocess side)."""
+    from Plugins import better_shot
+    from Tools.bench_blur import synthetic_screenshot
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    img = synthetic_screenshot(size)
+    better_shot.configure(backend=args.backend, watermark_type=args.mode)
+    base_rss = _peak_rss_mb()
+    secs = []
+    out = None
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        out = better_shot.on_clipboard("image", img)[1]
+        secs.append(time.perf_counter() - t0)
+    row = {
+        "size": args.size,
+        "backend": args.backend,
+        "ms": round(statistics.median(secs) * 1000, 2),
+        "base_rss_mb": base_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if args.dump:
+        out.save(args.dump, "PNG", compress_level=0)
+    print(json.dumps(row))
+
+
+def _max_diff(a_path, b_path):
+    from PIL import Image, ImageChops
+
+    with Image.open(a_path) as a, Image.open(b_path) as b:
+        if a.size != b.size:
+            return None
+        extrema = ImageChops.difference(a.convert("RGB"), b.convert("RGB")).getextrema()
+        return max(hi for _, hi in extrema)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--mode", default="pf", help="watermark_type to render")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--size", help=argparse.SUPPRESS)
+    ap.add_argument("--backend", help=argparse.SUPPRESS)
+    ap.add_argument("--dump", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(args)
+        return
+
+    import tempfile
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in RESOLUTIONS:
+            label = "%dx%d" % size
+            rows = {}
+            for backend in BACKENDS:
+                dump = os.path.join(tmp, "%s-%s.png" % (label, backend))
+                proc = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--child",
+                        "--size", label,
+                        "--backend", backend,
+                        "--mode", args.mode,
+                        "--runs", str(args.runs),
+                        "--dump", dump,
+                    ],
+                    cwd=BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                if proc.returncode != 0:
+                    print("%-10s %-7s failed: %s" % (label, backend, proc.stderr.strip()))
+                    continue
+                rows[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+                rows[backend]["dump"] = dump
+            if len(rows) == len(BACKENDS):
+                diff = _max_diff(rows["pillow"]["dump"], rows["numpy"]["dump"])
+                base_ms = rows["pillow"]["ms"]
+            else:
+                diff, base_ms = None, None
+            for backend, row in rows.items():
+                row.pop("dump", None)
+                row["speedup"] = round(base_ms / row["ms"], 2) if base_ms else None
+                row["max_abs_diff"] = diff
+                mp = size[0] * size[1] / 1e6
+                if row["peak_rss_mb"] is not None and row["base_rss_mb"] is not None:
+                    row["rss_mb_per_mp"] = round(
+                        (row["peak_rss_mb"] - row["base_rss_mb"]) / mp, 2
+                    )
+                results.append(row)
+                print(
+                    "%-10s %-7s %8.1f ms  x%-6s peak %7s MB  diff %s"
+                    % (
+                        label,
+                        backend,
+                        row["ms"],
+                        row["speedup"],
+                        "%.1f" % row["peak_rss_mb"] if row["peak_rss_mb"] else "-",
+                        diff if diff is not None else "-",
+                    )
+                )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mode": args.mode, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
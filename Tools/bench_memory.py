@@ -0,0 +1,117 @@
+"""
+Peak memory of the image ingest path per megapixel.
+
+For each resolution the parent writes a PNG (standing in for the pasteboard
+bytes); a fresh subprocess then decodes it, applies the max-pixels cap,
+runs Better Shot and encodes the result for history, and reports its peak
+RSS above the baseline measured right after reading the PNG bytes.
+
+    python Tools/bench_memory.py [--max-pixels 40000000] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+RESOLUTIONS = [(3840, 2160), (5120, 2880), (7680, 4320), (10240, 5760)]
+
+
+def _peak_rss_mb():
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KiB
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def _child(args):
+    from Library import imagecodec
+    from Plugins import better_shot
+
+    with open(args.png, "rb") as f:
+        encoded = imagecodec.EncodedImage("png", f.read())
+    base = _peak_rss_mb()
+    t0 = time.perf_counter()
+    img = encoded.decode()
+    mp = img.width * img.height / 1e6
+    img = imagecodec.fit_pixels(img, args.max_pixels)
+    out = better_shot.on_clipboard("image", img)
+    if len(out) < 3:
+        imagecodec.encode(out[1])
+    print(
+        json.dumps(
+            {
+                "size": os.path.basename(args.png).split(".")[0],
+                "max_pixels": args.max_pixels,
+                "processed": "%dx%d" % img.size,
+                "ms": round((time.perf_counter() - t0) * 1000, 1),
+                "peak_mb": round(_peak_rss_mb() - base, 1),
+                "mb_per_mp": round((_peak_rss_mb() - base) / mp, 2),
+            }
+        )
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument(
+        "--max-pixels", type=int, default=40_000_000, help="cap to compare (0 = off)"
+    )
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--png", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        _child(args)
+        return
+
+    from Tools.bench_blur import synthetic_screenshot
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in RESOLUTIONS:
+            png = os.path.join(tmp, "%dx%d.png" % size)
+            synthetic_screenshot(size).save(png, "PNG", compress_level=1)
+            for cap in (0, args.max_pixels):
+                proc = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--child",
+                        "--png", png,
+                        "--max-pixels", str(cap),
+                    ],
+                    cwd=BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                if proc.returncode != 0:
+                    print("%dx%d cap=%d failed: %s" % (size + (cap, proc.stderr.strip())))
+                    continue
+                row = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(row)
+                print(
+                    "%-11s cap %-10s -> %-11s %8.1f ms  peak +%7.1f MB  %6.2f MB/MP"
+                    % (
+                        row["size"],
+                        cap or "off",
+                        row["processed"],
+                        row["ms"],
+                        row["peak_mb"],
+                        row["mb_per_mp"],
+                    )
+                )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
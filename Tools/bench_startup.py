@@ -0,0 +1,200 @@
+"""
+Startup benchmark.
+
+Measures, in fresh interpreters:
+
+- cold PluginManager construction, eager loading (every plugin imported,
+  the old behaviour) vs lazy loading from the cached manifest;
+- time to first capture: from launching the daemon (main.main() on the
+  in-memory pasteboard, settings and history in a temp dir) until the
+  first copy is persisted, while a copier changes the pasteboard every 5 ms.
+  This is the tracked startup metric;
+- an import-time report of "import main" from python -X importtime.
+
+    python Tools/bench_startup.py [--runs 7] [--importtime 15] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SNIPPET = """
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {base!r})
+from Library.plugin import PluginManager
+m = PluginManager({plugins!r}, lazy={lazy!r})
+t1 = time.perf_counter()
+loaded = sum(1 for p in m.plugins if p.get("module") is not None)
+print(json.dumps({{"seconds": t1 - t0, "loaded": loaded, "modules": len(sys.modules)}}))
+"""
+
+
+def _run_once(lazy: bool) -> dict:
+    code = _SNIPPET.format(
+        base=BASE_DIR, plugins=os.path.join(BASE_DIR, "Plugins"), lazy=lazy
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _first_capture_child(t0: float):
+    """Run the daemon and exit at the first persisted copy (subprocess side)."""
+    import threading
+
+    sys.path.insert(0, BASE_DIR)
+    from Library import mcb
+
+    pb = mcb.MemoryPasteboard()
+    mcb.set_backend(pb)
+
+    def _copier():
+        i = 0
+        while True:
+            i += 1
+            pb.clearContents()
+            pb.setString_forType_("first capture %d" % i, mcb.NSStringPboardType)
+            time.sleep(0.005)
+
+    threading.Thread(target=_copier, daemon=True).start()
+    t_import = time.time()
+    import main
+
+    t_main = time.time()
+    main.HIST_DIR = os.path.join(os.environ["XDG_CONFIG_HOME"], "History")
+    main.HIST_JSON = os.path.join(main.HIST_DIR, "history.json")
+    os.makedirs(main.HIST_DIR, exist_ok=True)
+    persist = main._persist_history
+
+    def _first(*args, **kwargs):
+        persist(*args, **kwargs)
+        now = time.time()
+        row = {
+            "first_capture_ms": (now - t0) * 1000,
+            "interpreter_ms": (t_import - t0) * 1000,
+            "import_main_ms": (t_main - t_import) * 1000,
+            "main_to_capture_ms": (now - t_main) * 1000,
+            "modules": len(sys.modules),
+            "pil_loaded": "PIL.Image" in sys.modules,
+        }
+        print(json.dumps(row), flush=True)
+        os._exit(0)
+
+    main._persist_history = _first
+    main.main()
+
+
+def _first_capture_once() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, XDG_CONFIG_HOME=tmp)
+        env.pop("COPYBENTO_PROFILE", None)
+        t0 = time.time()
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--first-capture", repr(t0)],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=60,
+            env=env,
+            cwd=tmp,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _importtime(top: int):
+    """(module, self ms, cumulative ms) for "import main", slowest first."""
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys; sys.path.insert(0, %r); import main" % BASE_DIR,
+        ],
+        capture_output=True,
+        text=True,
+        cwd=BASE_DIR,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3:
+            continue
+        rows.append(
+            (parts[2].rstrip(), int(parts[0]) / 1000.0, int(parts[1]) / 1000.0)
+        )
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return rows[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--importtime", type=int, default=15, help="modules to list (0: skip)")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--first-capture", type=float, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.first_capture is not None:
+        _first_capture_child(args.first_capture)
+        return
+
+    results = {}
+    _run_once(True)  # manifest を温めておく
+    for label, lazy in (("eager", False), ("lazy", True)):
+        runs = [_run_once(lazy) for _ in range(args.runs)]
+        secs = [r["seconds"] for r in runs]
+        results["plugins_" + label + "_ms"] = round(statistics.median(secs) * 1000, 2)
+        print(
+            "%-6s median %7.1f ms  min %7.1f ms  plugins imported %d  sys.modules %d"
+            % (
+                label,
+                statistics.median(secs) * 1000,
+                min(secs) * 1000,
+                runs[-1]["loaded"],
+                runs[-1]["modules"],
+            )
+        )
+
+    runs = [_first_capture_once() for _ in range(args.runs)]
+    for key in ("first_capture_ms", "interpreter_ms", "import_main_ms", "main_to_capture_ms"):
+        results[key] = round(statistics.median(r[key] for r in runs), 1)
+    results["pil_loaded"] = runs[-1]["pil_loaded"]
+    print(
+        "first capture median %7.1f ms  (interpreter %.1f, import main %.1f, "
+        "main() -> capture %.1f ms; PIL loaded: %s)"
+        % (
+            results["first_capture_ms"],
+            results["interpreter_ms"],
+            results["import_main_ms"],
+            results["main_to_capture_ms"],
+            results["pil_loaded"],
+        )
+    )
+
+    if args.importtime:
+        rows = _importtime(args.importtime)
+        results["importtime"] = [
+            {"module": m.strip(), "self_ms": s, "cumulative_ms": c} for m, s, c in rows
+        ]
+        print("\nimport main (python -X importtime), slowest cumulative:")
+        for name, self_ms, cum_ms in rows:
+            print("  %8.1f ms  %8.1f ms self  %s" % (cum_ms, self_ms, name))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
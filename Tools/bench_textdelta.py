@@ -0,0 +1,155 @@
+"""
+Delta storage benchmark for large history texts.
+
+Builds edit traces from real files (main.py as code, README.md as prose, or
+--seed files): each step applies a few local edits (changed lines, inserted
+and deleted blocks, now and then a moved block) and "copies" the result.
+Every trace is stored through Library/textstore.py the way main.py does it
+(the previous entry is the delta base) with plain compression and with
+delta chains of several lengths, and reports stored bytes, store time and
+read time with a cold and a warm cache.
+
+    python Tools/bench_textdelta.py [--steps 60] [--scale 4] [--seed FILE ...]
+        [--chains 4,8,16] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+
+def _edit(lines, rng):
+    """One editing pass: a few local changes, like between two copies."""
+    lines = list(lines)
+    for _ in range(rng.randint(1, 4)):
+        i = rng.randrange(max(1, len(lines)))
+        roll = rng.random()
+        if roll < 0.5 and lines:
+            # 行の書き換え（変数名の変更や値の修正）
+            line = lines[i]
+            cut = rng.randrange(max(1, len(line)))
+            lines[i] = line[:cut] + "x%d" % rng.randrange(1000) + line[cut:]
+        elif roll < 0.75:
+            block = lines[i : i + rng.randint(1, 6)] or ["\n"]
+            lines[i:i] = ["    # edit %d\n" % rng.randrange(10000)] + block
+        elif roll < 0.95:
+            del lines[i : i + rng.randint(1, 5)]
+        else:
+            # ブロックの移動
+            n = rng.randint(3, 15)
+            block = lines[i : i + n]
+            del lines[i : i + n]
+            j = rng.randrange(max(1, len(lines)))
+            lines[j:j] = block
+    return lines
+
+
+def make_trace(seed_text, steps, scale, rng):
+    lines = seed_text.splitlines(keepends=True) * max(1, scale)
+    out = ["".join(lines)]
+    for _ in range(steps - 1):
+        lines = _edit(lines, rng)
+        out.append("".join(lines))
+    return out
+
+
+def _ms(values):
+    values = sorted(values)
+    return (
+        round(statistics.median(values) * 1000, 2),
+        round(values[int(len(values) * 0.95) - 1 if len(values) > 1 else 0] * 1000, 2),
+    )
+
+
+def run(name, texts, options):
+    from Library import textstore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        textstore.clear_cache()
+        records, store_secs = [], []
+        base = None
+        for i, text in enumerate(texts):
+            t = time.perf_counter()
+            rec = textstore.store(tmp, 1000.0 + i, text, options, base)
+            store_secs.append(time.perf_counter() - t)
+            records.append(rec)
+            if rec.get("text_path"):
+                base = rec
+        stored = sum(os.path.getsize(r["text_path"]) for r in records if r.get("text_path"))
+
+        cold, warm = [], []
+        for rec, text in zip(records, texts):
+            textstore.clear_cache()
+            t = time.perf_counter()
+            out = textstore.load_text(rec)
+            cold.append(time.perf_counter() - t)
+            t = time.perf_counter()
+            textstore.load_text(rec)
+            warm.append(time.perf_counter() - t)
+            if out != text:
+                raise SystemExit("%s: entry %s did not round-trip" % (name, rec.get("text_path")))
+        raw = sum(len(t.encode("utf-8")) for t in texts)
+        deltas = [r for r in records if r.get("text_codec") == "delta"]
+        store_p50, store_p95 = _ms(store_secs)
+        cold_p50, cold_p95 = _ms(cold)
+        return {
+            "trace": name,
+            "mode": "delta/%d" % options["delta_max_chain"] if options.get("delta") else "full",
+            "entries": len(texts),
+            "raw_kb": round(raw / 1024, 1),
+            "stored_kb": round(stored / 1024, 1),
+            "ratio": round(raw / max(1, stored), 1),
+            "deltas": len(deltas),
+            "mean_depth": (
+                round(statistics.mean(r["text_depth"] for r in deltas), 1) if deltas else 0
+            ),
+            "store_p50_ms": store_p50,
+            "store_p95_ms": store_p95,
+            "read_cold_p50_ms": cold_p50,
+            "read_cold_p95_ms": cold_p95,
+            "read_warm_p50_ms": round(statistics.median(warm) * 1000, 3),
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--steps", type=int, default=60, help="copies per trace")
+    ap.add_argument("--scale", type=int, default=4, help="repeat the seed file N times")
+    ap.add_argument("--seed", nargs="*", help="files to build traces from")
+    ap.add_argument("--chains", default="4,8,16", help="delta_max_chain values to try")
+    ap.add_argument("--codec", default="zlib", choices=["zlib", "lzma"])
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    seeds = args.seed or [os.path.join(BASE_DIR, "main.py"), os.path.join(BASE_DIR, "README.md")]
+    rng = random.Random(1)
+    rows = []
+    for seed in seeds:
+        with open(seed, "r", encoding="utf-8") as f:
+            texts = make_trace(f.read(), args.steps, args.scale, rng)
+        name = os.path.basename(seed)
+        base_opts = {"inline_max_bytes": 1024, "codec": args.codec, "level": 6}
+        rows.append(run(name, texts, dict(base_opts, delta=False, delta_max_chain=0)))
+        for chain in [int(c) for c in args.chains.split(",") if c.strip()]:
+            opts = dict(base_opts, delta=True, delta_max_chain=chain, delta_max_ratio=0.5)
+            rows.append(run(name, texts, opts))
+
+    keys = list(rows[0].keys())
+    print("  ".join("%-10s" % k[:10] for k in keys))
+    for row in rows:
+        print("  ".join("%-10s" % row[k] for k in keys))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Trigger profiling dumps in a running CopyBento process.
+
+The process must be started with COPYBENTO_PROFILE=1 (or settings
+"profiling".enabled); see Library/profiling.py.
+
+    python Tools/profilectl.py cpu [daemon|gui]   # start / stop+write a CPU profile
+    python Tools/profilectl.py mem [daemon|gui]   # start tracemalloc / write a snapshot
+    python Tools/profilectl.py list               # dumps under the config dir
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("command", choices=["cpu", "mem", "list"])
+    ap.add_argument("process", nargs="?", default="daemon", choices=["daemon", "gui"])
+    args = ap.parse_args()
+
+    from Library import profiling
+
+    directory = profiling.profiles_dir()
+    if args.command == "list":
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            names = []
+        for name in names:
+            print(os.path.join(directory, name))
+        return
+
+    pid_file = os.path.join(directory, "%s.pid" % args.process)
+    try:
+        with open(pid_file, "r") as f:
+            pid = int(f.read().strip())
+    except (OSError, ValueError):
+        sys.exit("%s is not armed for profiling (no %s)" % (args.process, pid_file))
+    sig = signal.SIGUSR1 if args.command == "cpu" else signal.SIGUSR2
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        sys.exit("%s (pid %d) is not running" % (args.process, pid))
+    print("sent %s to %s (pid %d); dumps go to %s" % (sig.name, args.process, pid, directory))
+
+
+if __name__ == "__main__":
+    main()
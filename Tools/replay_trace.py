@@ -0,0 +1,185 @@
+"""
+Replay a clipboard trace through the capture pipeline.
+
+Reads a trace recorded with settings "trace" (Library/trace.py) and copies
+each entry onto mcb.MemoryPasteboard at the recorded pace (divided by
+--speed), with main.py's watcher, plugins and history persistence running
+against a temporary config and history directory. Entries without a stored
+payload get a synthetic one of the same size (same digest -> same payload,
+so repeats stay repeats). Our own write-backs (source "plugin") are skipped
+since the pipeline produces them again.
+
+--direct triggers clipboard_changed itself instead of waiting for the
+watcher's poll, so traces can be replayed faster than the poll interval.
+
+    python Tools/replay_trace.py TRACE.jsonl [--speed 10] [--max-gap 2]
+        [--direct] [--limit N] [--settings settings.json] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+
+def _synthetic_text(entry):
+    chars = int(entry.get("chars") or entry.get("size") or 16)
+    seed = (entry.get("digest") or "0" * 32) + " "
+    return (seed * (chars // len(seed) + 1))[:chars]
+
+
+def _synthetic_image(entry):
+    from PIL import ImageDraw
+
+    from Library import imagecodec
+    from Tools.bench_blur import synthetic_screenshot
+
+    size = (int(entry.get("width") or 640), int(entry.get("height") or 480))
+    img = synthetic_screenshot(size)
+    digest = entry.get("digest") or "0" * 32
+    color = tuple(int(digest[i : i + 2], 16) for i in (0, 2, 4))
+    ImageDraw.Draw(img).rectangle((0, 0, min(size[0], 64), min(size[1], 16)), fill=color)
+    return imagecodec.encode(img, {"format": "png", "compress_level": 1})
+
+
+def _payloads(entries):
+    """(entry, payload) pairs; payload is text or an EncodedImage."""
+    from Library import imagecodec
+
+    images = {}
+    out = []
+    for entry in entries:
+        if entry.get("type") == "text":
+            payload = entry.get("text")
+            if payload is None:
+                payload = _synthetic_text(entry)
+        elif entry.get("type") == "image":
+            key = entry.get("digest") or len(images)
+            payload = images.get(key)
+            if payload is None:
+                path = entry.get("file")
+                if path and os.path.exists(path):
+                    with open(path, "rb") as f:
+                        payload = imagecodec.EncodedImage(entry.get("fmt") or "png", f.read())
+                else:
+                    payload = _synthetic_image(entry)
+                images[key] = payload
+        else:
+            continue
+        out.append((entry, payload))
+    return out
+
+
+def _copy(mcb, entry, payload):
+    if entry["type"] == "text":
+        mcb.MacClipboard.set_text(payload)
+    else:
+        mcb.MacClipboard.set_image_data(payload)
+    if entry.get("source"):
+        mcb.MacClipboard.set_source_marker(entry["source"])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("trace", help="trace-YYYYMMDD.jsonl")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    ap.add_argument(
+        "--max-gap", type=float, default=2.0, help="cap on idle seconds between copies"
+    )
+    ap.add_argument("--direct", action="store_true", help="bypass the watcher poll")
+    ap.add_argument("--limit", type=int, help="replay only the first N entries")
+    ap.add_argument("--settings", help="settings.json to replay with (plugins, limits)")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    from Library import trace
+
+    entries = [
+        e for e in trace.load(args.trace) if not str(e.get("source", "")).startswith("plugin")
+    ]
+    if args.limit:
+        entries = entries[: args.limit]
+    if not entries:
+        print("no entries in %s" % args.trace)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.settings:
+            os.makedirs(os.path.join(tmp, "config", "copybento"))
+            shutil.copy(args.settings, os.path.join(tmp, "config", "copybento", "settings.json"))
+
+        from Tools.bench_capture import history_read_ms, start_pipeline
+
+        main_mod, recorder = start_pipeline(tmp, watcher=not args.direct)
+        from Library import mcb
+
+        payloads = _payloads(entries)
+        if not args.direct:
+            time.sleep(0.6)  # 監視が初期状態を読み込むまで待つ
+
+        handler_secs = []
+        cpu0 = time.process_time()
+        start = time.perf_counter()
+        due = 0.0
+        prev_t = entries[0].get("t", 0.0)
+        for entry, payload in payloads:
+            gap = max(0.0, (entry.get("t", prev_t) - prev_t) / max(args.speed, 1e-6))
+            prev_t = entry.get("t", prev_t)
+            due += min(gap, args.max_gap) if args.max_gap > 0 else gap
+            wait = start + due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            _copy(mcb, entry, payload)
+            if args.direct:
+                if entry["type"] == "image":
+                    value, encoded = payload.decode(), payload
+                else:
+                    value, encoded = payload, None
+                t = time.perf_counter()
+                main_mod.event.trigger("clipboard_changed", entry["type"], value, encoded)
+                handler_secs.append(time.perf_counter() - t)
+        replayed = time.perf_counter() - start
+        recorder.wait_quiet(time.perf_counter(), 2.0, 120.0)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu0
+
+        captured = len({ts for _, ts, _ in recorder.events})
+        read_json_ms, read_provider_ms = history_read_ms(main_mod)
+        row = {
+            "trace": os.path.basename(args.trace),
+            "entries": len(payloads),
+            "texts": sum(1 for e, _ in payloads if e["type"] == "text"),
+            "images": sum(1 for e, _ in payloads if e["type"] == "image"),
+            "trace_secs": round(entries[-1].get("t", 0.0) - entries[0].get("t", 0.0), 1),
+            "speed": args.speed,
+            "direct": args.direct,
+            "replay_secs": round(replayed, 2),
+            "settle_secs": round(elapsed - replayed, 2),
+            "cpu_secs": round(cpu, 2),
+            "captured": captured,
+            "lost": len(payloads) - captured,
+            "handler_p50_ms": (
+                round(statistics.median(handler_secs) * 1000, 2) if handler_secs else None
+            ),
+            "history_items": len(main_mod._load_history_file()),
+            "history_read_ms": read_json_ms,
+            "provider_read_ms": read_provider_ms,
+        }
+        main_mod.plugins.shutdown()
+
+    for key, value in row.items():
+        print("%-16s %s" % (key, value))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(row, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
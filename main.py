@@ -1,11 +1,8 @@
 import os
 import json
 import logging
-import pyperclip
 from Library import event
 import time
-import asyncio
-import rumps
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,27 +13,27 @@ event = event.EventManager()
 
 import time
 from Library import mcb
-from Library.plugin import PluginManager
+from Library import imagecodec
+from Library import imagehash
+from Library import textstore
+from Library import retention
+from Library.cache import payload_digest
+from Library import trace
+from Library import profiling
+from Library.plugin import PluginManager, PluginStats, ProcessResult
 from Library import settings as app_settings
 import threading
 
 history = {}
 MacClipboard = mcb.MacClipboard
-plugins = PluginManager(os.path.join(os.path.dirname(__file__), "Plugins"))
+plugins = None  # PluginManager (created in main())
 
-# Apply persisted plugin enabled states BEFORE startup hooks
-try:
-    persisted = app_settings.get_plugins_enabled()
-    for p in plugins.plugins:
-        try:
-            desired = persisted.get(
-                p.get("name"), persisted.get(p.get("key"), p.get("enabled", True))
-            )
-            p["enabled"] = bool(desired)
-        except Exception:
-            pass
-except Exception:
-    pass
+
+def _load_plugins():
+    global plugins
+    # Persisted plugin enabled states are applied by the manager itself (before
+    # startup hooks) and re-applied whenever settings.json changes
+    plugins = PluginManager(os.path.join(os.path.dirname(__file__), "Plugins"))
 
 
 # == Permissions ==
@@ -100,6 +97,8 @@ def _ensure_accessibility_permission():
             "Accessibility check not available or not granted; continuing without prompt"
         )
         try:
+            import rumps
+
             rumps.alert(
                 "Permission Required",
                 "キーボードショートカットを使うには『アクセシビリティ』の許可が必要です。\nシステム設定 > プライバシーとセキュリティ > アクセシビリティ で Python/CopyBento を有効にしてください。",
@@ -110,6 +109,8 @@ def _ensure_accessibility_permission():
 
     if not trusted:
         try:
+            import rumps
+
             rumps.alert(
                 "Permission Required",
                 "キーボードショートカットを使うには『アクセシビリティ』の許可が必要です。\nシステム設定 > プライバシーとセキュリティ > アクセシビリティ で Python/CopyBento を有効にしてください。",
@@ -135,16 +136,10 @@ def _open_accessibility_pane():
         pass
 
 
-# Let plugins do startup registration (e.g., register hotkeys) only if enabled
-for p in plugins.plugins:
-    if not p.get("enabled", True):
-        continue
-    try:
-        mod = p.get("module")
-        if mod and hasattr(mod, "on_startup") and callable(mod.on_startup):
-            mod.on_startup(event)
-    except Exception:
-        pass
+def _run_startup_hooks():
+    # Let plugins do startup registration (e.g., register hotkeys) only if enabled
+    plugins.run_startup(event)
+
 
 # Hotkeys and GUI opener are registered by Plugins/GUI.py:on_startup
 
@@ -172,133 +167,632 @@ def _save_history_file(items):
         logger.exception("Failed to save history.json: %s", e)
 
 
-def _persist_history(ts: float, data_type: str, value):
-    items = _load_history_file()
+# history.json の読み書き（監視スレッドとプラグイン結果のコールバックから呼ばれる）
+_history_lock = threading.RLock()
+# history.json のメモリ上の写し（新しい順）。書くのはこのプロセスだけなので、
+# ファイルの mtime が自分で書いたときと違う（手で編集された等）ときだけ読み直す
+_history_items = None
+_history_mtime = None
+
+
+def _history_mtime_now():
+    try:
+        return os.stat(HIST_JSON).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _history_records():
+    """history.json の記録（_history_lock を持って呼ぶ。返した list は変更しない）。"""
+    global _history_items, _history_mtime, _text_index, _ledger
+    mtime = _history_mtime_now()
+    if _history_items is None or mtime != _history_mtime:
+        if _history_items is not None:
+            # 外で書き換えられた: 記録から作った索引も作り直す
+            _text_index = _ledger = None
+        _history_items = _load_history_file()
+        _history_mtime = mtime
+    return _history_items
+
+
+def _store_history(items):
+    global _history_items, _history_mtime
+    _save_history_file(items)
+    _history_items = items
+    _history_mtime = _history_mtime_now()
+
+
+def _persist_history(
+    ts: float, data_type: str, value, encoded=None, original=None, meta=None
+):
     record = {"ts": ts, "type": data_type}
+    if meta:
+        record.update(meta)
     if data_type == "text":
         text = value if isinstance(value, str) else str(value)
-        record["text"] = text
         record["preview"] = (text[:100] + "...") if len(text) > 100 else text
+        record["digest"] = payload_digest("text", text)
     elif data_type == "image":
         try:
-            from PIL import Image
-
-            # 保存先パス
-            fname = f"img_{int(ts*1000)}.png"
-            fpath = os.path.join(HIST_DIR, fname)
-            value.convert("RGBA").save(fpath, "PNG")
+            if encoded is None:
+                # RGB/RGBA などはそのまま保存できるので全体の RGBA 変換はしない
+                if value.mode not in ("RGB", "RGBA", "L", "LA"):
+                    value = value.convert("RGBA")
+                encoded = imagecodec.encode(value)
+            # エンコード済みのバイト列をそのまま保存（再エンコードしない）
+            fpath = os.path.join(HIST_DIR, f"img_{int(ts*1000)}{encoded.ext}")
+            _write_file_atomic(fpath, encoded.data)
             record["image_path"] = fpath
             record["preview"] = "[Image]"
+            if original is not None:
+                # 上限超えで縮小した画像の元データ（ペーストボードのバイト列そのまま）
+                opath = os.path.join(HIST_DIR, f"img_{int(ts*1000)}_orig{original.ext}")
+                _write_file_atomic(opath, original.data)
+                record["original_path"] = opath
         except Exception as e:
             logger.exception("Failed to persist image: %s", e)
             return
-    items.append(record)
-    # 最新200件に制限
-    items = sorted(items, key=lambda r: r.get("ts", 0), reverse=True)[:200]
-    _save_history_file(items)
+    with _history_lock:
+        items = _history_records()
+        text_index = _text_dedup_index(items)
+        ledger = _history_ledger(items)
+        # 同じ ts の記録（パススルーで先に記録した元のコピー）は差し替える
+        replaced = [r for r in items if r.get("ts") == ts]
+        for r in replaced:
+            if text_index.get(r.get("digest")) is r:
+                del text_index[r["digest"]]
+        prev = None
+        if data_type == "text":
+            # 同じテキストの再コピー: 既存の記録を索引から引いて先頭へ移し、回数を数える
+            prev = text_index.get(record["digest"])
+        items = [r for r in items if r.get("ts") != ts and r is not prev]
+        if data_type == "text":
+            if prev is not None:
+                prev_ts = prev.get("ts")
+                ledger.remove(prev)
+                history.pop(prev_ts, None)
+                record["count"] = int(prev.get("count") or 1) + 1
+                record["first_ts"] = prev.get("first_ts", prev_ts)
+            if prev is not None and prev.get("text_path"):
+                # 同じ内容なので圧縮済みの本文はそのまま使う
+                for key in (
+                    "text_path",
+                    "text_size",
+                    "text_codec",
+                    "chars",
+                    "text_depth",
+                    "text_deps",
+                ):
+                    if key in prev:
+                        record[key] = prev[key]
+            else:
+                # 差分保存の元は直近の別ファイルのテキスト
+                base = next(
+                    (r for r in items if r.get("type") == "text" and r.get("text_path")), None
+                )
+                record.update(_store_text(ts, text, base))
+            text_index[record["digest"]] = record
+        record["bytes"] = retention.record_bytes(record)
+        ledger.add(record)
+        items.append(record)
+        items = sorted(items, key=lambda r: r.get("ts", 0), reverse=True)
+        # 件数・容量・経過日数の上限を超えた古い記録から消す
+        evicted = retention.enforce(items, ledger, _retention_policies(), time.time())
+        _unindex(evicted)
+        _store_history(items)
+    _remove_files(replaced, ledger, keep=record)
+    if evicted:
+        logger.info(
+            "Evicted %d history entries (%d entries, %.1f MB kept)",
+            len(evicted),
+            ledger.count(),
+            ledger.bytes() / 1e6,
+        )
+        _remove_files(evicted, ledger, keep=record)
 
 
-def wait_for_clipboard_change():
-    last_text = MacClipboard.get_text()
-    last_img = MacClipboard.get_image()
+def _remove_history(ts: float):
+    """ts の記録と画像ファイルを削除（パススルーで記録したコピーがスキップされたとき）。"""
+    history.pop(ts, None)
+    with _history_lock:
+        items = _history_records()
+        ledger = _history_ledger(items)
+        removed = [r for r in items if r.get("ts") == ts]
+        if removed:
+            _unindex(removed)
+            _store_history([r for r in items if r.get("ts") != ts])
+    if removed:
+        _remove_files(removed, ledger)
+
+
+def _store_text(ts, text, base=None):
+    """大きなテキストは圧縮して別ファイルへ（settings "text_storage"）。"""
+    try:
+        return textstore.store(
+            HIST_DIR, ts, text, app_settings.get_text_storage_settings(), base
+        )
+    except Exception as e:
+        logger.warning("Failed to store text out of line: %s", e)
+        return {"text": text}
+
+
+# テキストの内容ダイジェスト -> 履歴の記録（初回に history.json から作る）
+_text_index = None
 
-    while True:
-        time.sleep(0.5)
-        current_text = MacClipboard.get_text()
-        current_img = MacClipboard.get_image()
 
-        # テキストの変化検出
-        if current_text != last_text and current_text is not None:
-            last_text = current_text
-            return ("text", current_text)
+def _text_dedup_index(items):
+    """Digest -> text record in items (built on first use)."""
+    global _text_index
+    if _text_index is None:
+        index = {}
+        # 古い順に入れて、同じ内容が複数あれば最新の記録を残す
+        for r in sorted(items, key=lambda r: r.get("ts", 0)):
+            if r.get("type") == "text":
+                if not r.get("digest"):
+                    r["digest"] = payload_digest("text", r.get("text") or "")
+                index[r["digest"]] = r
+        _text_index = index
+    return _text_index
 
-        # 画像の変化検出（バイト比較すると確実）
-        if (current_img is not None) and not images_equal(current_img, last_img):
-            last_img = current_img
 
-            return ("image", current_img)
+# 履歴の件数と容量の台帳（初回に history.json から作り、以降は追加・削除で更新）
+# 差分の元として残っている本文ファイルも参照の数で数える（消してよいかもここで分かる）
+_ledger = None
 
 
-def images_equal(img1, img2):
-    if img1 is None or img2 is None:
-        return False
-    return list(img1.getdata()) == list(img2.getdata())
+def _history_ledger(items):
+    global _ledger
+    if _ledger is None:
+        _ledger = retention.Ledger(items)
+    return _ledger
+
+
+def _retention_policies():
+    try:
+        return retention.policies_from_settings(app_settings.get_retention_settings())
+    except Exception as e:
+        logger.warning("Invalid retention settings: %s", e)
+        return [retention.MaxEntries(200)]
+
+
+def _unindex(records):
+    """履歴から外した記録をテキスト・画像の索引と容量の台帳から除く。"""
+    for r in records:
+        history.pop(r.get("ts"), None)
+        if _ledger is not None:
+            _ledger.remove(r)
+        if r.get("type") == "text" and _text_index is not None:
+            digest = r.get("digest")
+            if digest and _text_index.get(digest) is r:
+                del _text_index[digest]
+        elif r.get("type") == "image" and _image_index is not None:
+            _image_index.remove(r.get("ts"))
+
+
+def _remove_files(records, ledger, keep=None):
+    keep_paths = (
+        {keep.get("image_path"), keep.get("original_path"), keep.get("text_path")}
+        if keep
+        else set()
+    )
+    for r in records:
+        paths = [r.get("image_path"), r.get("original_path")] + textstore.blob_paths(r)
+        for path in paths:
+            # 残っている記録が差分の元として使っている本文は消さない（台帳に残っている）
+            if path and path not in keep_paths and not ledger.holds(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _write_file_atomic(path: str, data: bytes):
+    # GUI が書き込み途中のファイルを読まないように、一時ファイルから置き換える
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# 最後に書き戻した画像の指紋（監視側はデコードせずに読み飛ばす）
+_written_fingerprint = None
+# 最後に書き戻したテキストと書き込み後の changeCount（監視側はその 1 回だけ読み飛ばす）
+_written_text = None
+
+
+def _image_fingerprint(encoded):
+    return encoded.fingerprint if encoded is not None else None
+
+
+# ポーリング間隔（秒）。変化の有無は changeCount だけで判定し、変わったときだけ内容を読む
+CLIPBOARD_POLL_INTERVAL = 0.1
+# 前回の呼び出しで見た [changeCount, テキスト, 画像の指紋]（呼び出しの間の変化も拾う）
+_watch_state = None
+
+
+def wait_for_clipboard_change():
+    global _watch_state, _written_text
+    if _watch_state is None:
+        _watch_state = [
+            MacClipboard.change_count(),
+            MacClipboard.get_text(),
+            _image_fingerprint(MacClipboard.get_image_data()),
+        ]
+    state = _watch_state
+
+    while True:
+        count = MacClipboard.change_count()
+        if count is None or count != state[0]:
+            current_text = MacClipboard.get_text()
+            current_enc = MacClipboard.get_image_data()
+            if current_text is not None or current_enc is not None:
+                # clearContents 直後（中身がまだ無い）なら次の周期に読み直す
+                state[0] = count
+
+            current_fp = _image_fingerprint(current_enc)
+            image_changed = current_fp is not None and current_fp != state[2]
+
+            # テキストの変化検出。changeCount が変わっていれば同じテキストの再コピーも
+            # 報告する（履歴の回数を数えるため。自分の書き戻しは _written_text と印で除く）。
+            # changeCount が取れない環境では内容の比較だけで判定する
+            if current_text is not None and (
+                current_text != state[1] or (count is not None and not image_changed)
+            ):
+                state[1] = current_text
+                if _written_text == (current_text, count):
+                    # 自分で書き戻したプラグイン結果（印が付く前に見えることがある）
+                    _written_text = None
+                else:
+                    return ("text", current_text)
+
+            # 画像の変化検出（エンコード済みバイト列の指紋を比較し、変わったときだけデコード）
+            if image_changed:
+                state[2] = current_fp
+                if current_fp != _written_fingerprint:  # 自分で書き戻したプラグイン結果は除く
+                    try:
+                        return ("image", current_enc.decode(), current_enc)
+                    except Exception as e:
+                        logger.warning("Failed to decode clipboard image: %s", e)
+        time.sleep(CLIPBOARD_POLL_INTERVAL if count is not None else 0.5)
 
 
 event.add("clipboard_changed", wait_for_clipboard_change)
 
 
 @event.event("clipboard_changed")
-def on_clipboard_changed(data_type, value):
+def on_clipboard_changed(data_type, value, encoded=None):
+    try:
+        mark = MacClipboard.get_source_marker()
+    except Exception:
+        mark = None
+    mark = str(mark).lower() if mark else ""
+    _trace(data_type, value, encoded, mark)
+    if mark.startswith("plugin"):
+        # プラグイン結果の書き戻し（元のコピーとして記録済み）
+        return
     # GUI からの画像コピーはプラグイン適用をスキップ
+    if data_type == "image" and mark.startswith("gui"):
+        _on_processed(ProcessResult.make(data_type, value, encoded=encoded))
+        return
+    # コピー 1 件分の状態（結果が届いたときの書き戻し判定・履歴の差し替え・遅延計測用）
+    capture = {
+        "ts": time.time(),
+        "started": time.perf_counter(),
+        "change_count": MacClipboard.change_count(),
+        "original": None,
+        "recorded": False,
+    }
+    source = encoded
     if data_type == "image":
-        try:
-            mark = MacClipboard.get_source_marker()
-        except Exception:
-            mark = None
-        if mark and str(mark).lower().startswith("gui"):
-            processed = (data_type, value)
-        else:
-            processed = plugins.process(data_type, value)
-    else:
-        # Plugins can transform or skip the clipboard event
-        processed = plugins.process(data_type, value)
+        value, encoded, capture["original"], run_plugins = _apply_image_limit(
+            value, encoded
+        )
+        _find_near_duplicates(capture, value)
+        if not run_plugins:
+            _on_processed(ProcessResult.make(data_type, value, encoded=encoded), capture)
+            return
+    if plugins.renders_async(data_type) and plugins.runtime.get("passthrough", True):
+        # 描画はワーカーで行い、元のコピーはすぐ履歴に記録する（結果が届いたら差し替え）
+        _record_capture(capture, data_type, value, source)
+    capture["input"] = value
+    # Plugins can transform or skip the clipboard event.
+    # Pool plugins render off this thread so change detection keeps running.
+    plugins.process_async(
+        data_type,
+        value,
+        lambda processed: _on_processed(processed, capture),
+        encoded=encoded,
+    )
+
+
+_tracer = None
+
+
+def _trace(data_type, value, encoded, mark):
+    """settings "trace" が有効なら変化を記録（書き込みは別スレッド）。"""
+    global _tracer
+    try:
+        conf = app_settings.get_trace_settings()
+        if not conf.get("enabled"):
+            return
+        if _tracer is None:
+            _tracer = trace.TraceRecorder(
+                os.path.join(app_settings.get_config_dir(), "traces")
+            )
+        _tracer.payloads = bool(conf.get("payloads"))
+        _tracer.record(data_type, value, encoded, source=mark)
+    except Exception as e:
+        logger.warning("Failed to trace clipboard change: %s", e)
+
+
+def _record_capture(capture, data_type, value, source):
+    """パススルー: 元のコピーをそのまま履歴に記録する（画像はペーストボードのバイト列）。"""
+    try:
+        history[capture["ts"]] = (data_type, value)
+        _persist_history(
+            capture["ts"], data_type, value, source, meta=capture.get("meta")
+        )
+        capture["recorded"] = True
+    except Exception as e:
+        logger.exception("Failed to record capture: %s", e)
+
+
+def _apply_image_limit(value, encoded):
+    """
+    画素数上限（settings "image_limit"）を適用する。
+    (value, encoded, original, run_plugins) を返す。original は履歴に残す元データ。
+    """
+    try:
+        limit = app_settings.get_image_limit_settings()
+        max_pixels = int(limit.get("max_pixels") or 0)
+    except Exception:
+        return value, encoded, None, True
+    w, h = value.size
+    if max_pixels <= 0 or w * h <= max_pixels:
+        return value, encoded, None, True
+    if str(limit.get("policy", "downscale")).lower() == "skip":
+        logger.info("Image %dx%d over max_pixels; plugins skipped", w, h)
+        return value, encoded, None, False
+    small = imagecodec.fit_pixels(value, max_pixels)
+    logger.info("Image %dx%d over max_pixels; processing at %dx%d", w, h, *small.size)
+    original = encoded if limit.get("keep_original", True) else None
+    # 縮小した画像は元のバイト列と一致しないので encoded は引き継がない
+    return small, None, original, True
+
+
+def _on_processed(processed, capture=None):
     print(processed)
+    capture = capture or {}
+    ts = capture.get("ts") or time.time()
     if processed is PluginManager.SKIP:
         logger.info("Clipboard event skipped by plugin")
+        if capture.get("recorded"):
+            _remove_history(ts)
         return
     data_type, value = processed
-
-    # 変更履歴に追加
-    history[time.time()] = (data_type, value)
+    # プラグインまたはペーストボードのエンコード結果（書き戻しと履歴で共有）
+    encoded = getattr(processed, "encoded", None)
+    if getattr(processed, "write_back", False):
+        written = _write_back(data_type, value, capture.get("change_count"), encoded)
+        if written is not None:
+            encoded = written
+            _record_latency(data_type, capture)
+        elif "started" in capture:
+            _record_latency(data_type, capture, stale=True)
+
+    if capture.get("recorded") and value is capture.get("input"):
+        # 変換されなかった（パススルーで記録済みのまま）
+        _index_image(capture)
+        return
+    # 変更履歴に追加（パススルーで記録済みなら同じ ts の記録を差し替える）
+    history[ts] = (data_type, value)
     # 永続化（GUI 用）
     try:
-        _persist_history(list(history.keys())[-1], data_type, value)
+        _persist_history(
+            ts, data_type, value, encoded, capture.get("original"), capture.get("meta")
+        )
+    except Exception:
+        pass
+    _index_image(capture)
+
+
+# == Near-duplicate images ==
+# 履歴の ts -> dHash（初回に history.json から作る）
+_image_index = None
+_image_index_size = None
+_image_index_lock = threading.Lock()
+
+
+def _image_dedup_index(size):
+    global _image_index, _image_index_size
+    with _image_index_lock:
+        if _image_index is None or _image_index_size != size:
+            index = imagehash.BKTree()
+            width = len(imagehash.to_hex(0, size))
+            for r in _load_history_file():
+                text = r.get("dhash")
+                if isinstance(text, str) and len(text) == width:
+                    value = imagehash.from_hex(text)
+                    if value is not None:
+                        index.add(r.get("ts"), value)
+            _image_index, _image_index_size = index, size
+        return _image_index
+
+
+def _find_near_duplicates(capture, value):
+    """取り込んだ画像の dHash を求め、しきい値以内の履歴を capture に記録する。"""
+    try:
+        conf = app_settings.get_image_dedup_settings()
+        if not conf.get("enabled"):
+            return
+        size = max(2, int(conf.get("hash_size") or 8))
+        value_hash = imagehash.dhash(value, size)
+        matches = _image_dedup_index(size).search(
+            value_hash, int(conf.get("threshold") or 0)
+        )
+    except Exception as e:
+        logger.warning("Failed to hash image: %s", e)
+        return
+    meta = {"dhash": imagehash.to_hex(value_hash, size)}
+    capture["dhash"] = (value_hash, size)
+    if matches:
+        if str(conf.get("action", "flag")).lower() == "collapse":
+            capture["collapse"] = [ts for _, ts in matches]
+            meta["collapsed"] = len(matches)
+        else:
+            meta["near_duplicate_of"] = matches[0][1]
+            meta["near_distance"] = matches[0][0]
+    capture["meta"] = meta
+
+
+def _index_image(capture):
+    """記録した画像を索引に加え、collapse なら似た古い記録を消す。"""
+    if "dhash" not in capture:
+        return
+    value_hash, size = capture["dhash"]
+    _image_dedup_index(size).add(capture["ts"], value_hash)
+    for ts in capture.get("collapse", ()):
+        if ts != capture["ts"]:
+            logger.info("Collapsing near-duplicate image %s", ts)
+            _remove_history(ts)
+
+
+# コピーから変換結果がペーストボードに載るまでの時間（データ型ごと）
+_latency = {}
+_latency_lock = threading.Lock()
+
+
+def _record_latency(data_type, capture, stale=False):
+    started = capture.get("started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    with _latency_lock:
+        entry = _latency.get(data_type)
+        if entry is None:
+            entry = _latency[data_type] = {"stats": PluginStats(), "stale": 0}
+        if stale:
+            # 処理中に新しいコピーがあり、結果は書き戻さなかった
+            entry["stale"] += 1
+        else:
+            entry["stats"].record(elapsed)
+        snapshot = {
+            t: dict(e["stats"].snapshot(), stale=e["stale"]) for t, e in _latency.items()
+        }
+    if not stale:
+        logger.info("Processed %s available after %.0f ms", data_type, elapsed * 1000)
+    try:
+        app_settings.set_latency_stats(snapshot)
     except Exception:
         pass
 
 
+def _write_back(data_type, value, change_count, encoded=None):
+    """
+    プラグイン結果をペーストボードへ戻す（処理中に新しいコピーがあれば何もしない）。
+    画像は書き込んだ EncodedImage を返す。
+    """
+    global _written_fingerprint, _written_text
+    try:
+        if change_count is not None and MacClipboard.change_count() != change_count:
+            logger.info("Clipboard changed while processing; result not written back")
+            return None
+        if data_type == "image":
+            if encoded is None:
+                encoded = imagecodec.encode(value)
+            # 監視側が自分の書き込みを読み飛ばせるよう、書く前に指紋を登録する
+            _written_fingerprint = encoded.fingerprint
+            MacClipboard.set_image(value, encoded)
+        else:
+            # 印は書き込み（clearContents）の後にしか付けられないので、同じく書く前に登録する
+            count = MacClipboard.change_count()
+            _written_text = (value, count + 1 if count is not None else None)
+            MacClipboard.set_text(value)
+        MacClipboard.set_source_marker("PLUGIN_" + data_type.upper())
+        return encoded if data_type == "image" else None
+    except Exception as e:
+        logger.exception("Failed to write plugin result back: %s", e)
+        return None
+
+
 # Run the async EventManager in a background thread
-_loop = asyncio.new_event_loop()
+_loop = None
+# 起動直後に必須でない初期化（アクセシビリティ権限の確認）を遅らせる秒数
+STARTUP_DEFER_SECONDS = 1.0
 
 
 def _run_asyncio():
+    global _loop
+    # asyncio はこのスレッドで import する（メインスレッドの起動処理を待たせない）
+    import asyncio
+
+    _loop = asyncio.new_event_loop()
     asyncio.set_event_loop(_loop)
     _loop.create_task(event.run(interval=0.1))
     _loop.run_forever()
 
 
-threading.Thread(target=_run_asyncio, daemon=True).start()
-
-# == Minimal Cocoa app (no menu bar icon) ==
-try:
-    from Cocoa import NSApplication, NSObject, NSApplicationActivationPolicyAccessory
-
-    class MinimalAppDelegate(NSObject):
-        def applicationDidFinishLaunching_(self, _):
-            try:
-                # Install hotkey monitors on the main thread
-                event.install_hotkey_monitors_on_main_thread()
-            except Exception:
-                pass
-            # Accessibility permission prompt (best-effort)
-            try:
-                _ensure_accessibility_permission()
-            except Exception:
-                pass
-
-    _nsapp = NSApplication.sharedApplication()
-    _delegate = MinimalAppDelegate.alloc().init()
-    _nsapp.setDelegate_(_delegate)
+def _run_app():
+    # == Minimal Cocoa app (no menu bar icon) ==
     try:
-        _nsapp.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
-    except Exception:
-        pass
-    _nsapp.run()
-except Exception:
-    # Fallback: keep process alive if Cocoa is unavailable
-    import time as _t
+        from Cocoa import (
+            NSApplication,
+            NSObject,
+            NSApplicationActivationPolicyAccessory,
+        )
 
-    event.install_hotkey_monitors_on_main_thread()
-    while True:
-        _t.sleep(1)
+        class MinimalAppDelegate(NSObject):
+            def applicationDidFinishLaunching_(self, _):
+                try:
+                    # Install hotkey monitors on the main thread
+                    event.install_hotkey_monitors_on_main_thread()
+                except Exception:
+                    pass
+                # 権限チェック（bundle の読み込みが重い）は監視の開始後に回す
+                try:
+                    self.performSelector_withObject_afterDelay_(
+                        "deferredStartup:", None, STARTUP_DEFER_SECONDS
+                    )
+                except Exception:
+                    self.deferredStartup_(None)
+
+            def deferredStartup_(self, _):
+                # Accessibility permission prompt (best-effort)
+                try:
+                    _ensure_accessibility_permission()
+                except Exception:
+                    pass
+
+        _nsapp = NSApplication.sharedApplication()
+        _delegate = MinimalAppDelegate.alloc().init()
+        _nsapp.setDelegate_(_delegate)
+        try:
+            _nsapp.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
+        except Exception:
+            pass
+        _nsapp.run()
+    except Exception:
+        # Fallback: keep process alive if Cocoa is unavailable
+        import time as _t
+
+        event.install_hotkey_monitors_on_main_thread()
+        while True:
+            _t.sleep(1)
+
+
+def main():
+    # COPYBENTO_PROFILE / settings "profiling" のときだけ（スレッドを作る前に）
+    profiling.install("daemon", threads=("events", "hotkeys"), event_manager=event)
+    _load_plugins()
+    # 監視を先に開始し、プラグインの import（GUI の PyObjC など）はその後
+    threading.Thread(target=_run_asyncio, name="events", daemon=True).start()
+    _run_startup_hooks()
+    # Plugins/ と ~/.config/copybento/plugins/ の変更を検知して差し替える
+    plugins.start_watching()
+    _run_app()
+
+
+# プロセスプール（spawn）のワーカーは本モジュールを __mp_main__ として import するため、
+# 起動処理は __main__ のときだけ行う
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """A fresh ~/.config/copybento under tmp_path with its own settings store."""
+    from Library import settings
+
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setattr(settings, "_config_dir_ready", False)
+    monkeypatch.setattr(settings, "_store", settings._Store())
+    # 別プロセス（GUI）の書き込みをすぐ読み直す
+    monkeypatch.setattr(settings._Store, "CHECK_INTERVAL", 0.0)
+    return settings.get_config_dir()
@@ -0,0 +1,52 @@
+from Library import settings
+from Library.plugin import PluginManager
+
+HANG = """
+import time
+CACHEABLE = False
+
+def on_clipboard(data_type, value):
+    time.sleep(0.3)
+"""
+
+FAIL = """
+CACHEABLE = False
+
+def on_clipboard(data_type, value):
+    raise ValueError("broken")
+"""
+
+
+def make_manager(tmp_path, source, **runtime):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "p.py").write_text(source)
+    pm = PluginManager(str(plugin_dir))
+    pm.runtime.update(runtime)
+    return pm
+
+
+def test_timeout_trip_is_session_only(tmp_path, config_dir):
+    pm = make_manager(tmp_path, HANG, timeout=0.05, max_strikes=2)
+    p = pm.plugins[0]
+    for i in range(2):
+        pm.process("text", str(i))
+        p["_thread"].join()  # 次の呼び出しを「実行中」で飛ばさない
+    assert p["tripped"] == "timeout"
+    assert not p["enabled"]
+    settings.flush()
+    assert settings.get_plugins_enabled() == {}
+
+
+def test_error_trip_is_persisted_and_reenable_resets(tmp_path, config_dir):
+    pm = make_manager(tmp_path, FAIL, max_strikes=2)
+    p = pm.plugins[0]
+    pm.process("text", "a")
+    pm.process("text", "b")
+    assert p["tripped"] == "error"
+    assert settings.get_plugins_enabled() == {"p": False}
+
+    settings.set_plugins_enabled({"p": True})
+    pm.process("text", "c")
+    assert p["enabled"]
+    assert p["stats"].strikes == 1  # 数え直し（リセット後の 1 回目の失敗）
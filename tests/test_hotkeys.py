@@ -0,0 +1,38 @@
+from Library import event
+
+CMD = event._MOD_BITS["cmd"]
+# AZERTY: A と Q、Z と W の位置が US と入れ替わっている
+AZERTY = {"a": 12, "q": 0, "z": 13, "w": 6}
+
+
+def fired(em):
+    out = []
+    while not em._hotkey_queue.empty():
+        out.append(em._hotkey_queue.get())
+    return out
+
+
+def test_character_keys_follow_layout(monkeypatch):
+    monkeypatch.setattr(event, "_layout_codes", dict(AZERTY))
+    em = event.EventManager()
+    monkeypatch.setattr(em, "_start_hotkey_worker", lambda: None)
+    em.register_hotkey("cmd+z", "undo")
+    em.register_hotkey("cmd+1", "first")
+
+    em._handle_key((CMD, 6))  # US の Z の位置（AZERTY では W）
+    em._handle_key((CMD, 13))
+    em._handle_key((CMD, 18))  # 配列に無い文字は US の位置
+    assert fired(em) == ["undo", "first"]
+
+
+def test_layout_change_rebuilds_keymap(monkeypatch):
+    monkeypatch.setattr(event, "_layout_codes", dict(AZERTY))
+    em = event.EventManager()
+    monkeypatch.setattr(em, "_start_hotkey_worker", lambda: None)
+    em.register_hotkey("cmd+a", "all")
+
+    monkeypatch.setattr(event, "_layout_keycodes", lambda: {})  # US 配列に切り替え
+    em.refresh_keyboard_layout()
+    em._handle_key((CMD, 12))
+    em._handle_key((CMD, 0))
+    assert fired(em) == ["all"]
@@ -0,0 +1,54 @@
+import threading
+
+from Library.plugin import PluginManager
+
+PLUGIN = """
+import time
+CACHEABLE = False
+
+def on_clipboard(data_type, value):
+    time.sleep(0.05 if value == "0" else 0.0)  # 先頭だけ遅らせて追い越しを起こす
+    return ("text", value + "!")
+"""
+
+
+def make_manager(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "bang.py").write_text(PLUGIN)
+    pm = PluginManager(str(plugin_dir))
+    pm._pool_types = frozenset(["text"])  # 必ず dispatcher 経由にする
+    return pm
+
+
+def test_callbacks_in_submission_order(tmp_path, config_dir):
+    pm = make_manager(tmp_path)
+    got, done = [], threading.Event()
+
+    def cb(res):
+        got.append(res[1])
+        if len(got) == 5:
+            done.set()
+
+    for i in range(5):
+        pm.process_async("text", str(i), cb)
+    assert done.wait(5)
+    assert got == ["0!", "1!", "2!", "3!", "4!"]
+    pm.shutdown()
+
+
+def test_callback_may_submit_again(tmp_path, config_dir):
+    pm = make_manager(tmp_path)
+    got, done = [], threading.Event()
+
+    def cb(res):
+        got.append(res[1])
+        if len(got) < 3:
+            pm.process_async("text", res[1], cb)
+        else:
+            done.set()
+
+    pm.process_async("text", "a", cb)
+    assert done.wait(5)
+    assert got == ["a!", "a!!", "a!!!"]
+    pm.shutdown()
@@ -0,0 +1,69 @@
+import json
+import os
+
+from Library.plugin import PluginManager
+
+PLUGIN = """
+CACHEABLE = False
+
+def on_clipboard(data_type, value):
+    return ("text", value.upper())
+"""
+
+_tick = [0]
+
+
+def write_settings(config_dir, data):
+    """Write settings.json as the GUI process would (new mtime each time)."""
+    path = os.path.join(config_dir, "settings.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    _tick[0] += 1
+    stamp = 1_000_000_000 + _tick[0]
+    os.utime(path, ns=(stamp * 10**9, stamp * 10**9))
+
+
+def make_manager(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "upper.py").write_text(PLUGIN)
+    return PluginManager(str(plugin_dir))
+
+
+def test_gui_toggle_reaches_running_manager(tmp_path, config_dir):
+    pm = make_manager(tmp_path)
+    assert pm.process("text", "a") == ("text", "A")
+
+    write_settings(config_dir, {"plugins": {"upper": False}})
+    assert pm.process("text", "b") == ("text", "b")
+    assert pm.list_plugins() == [("upper", False)]
+
+    write_settings(config_dir, {"plugins": {"upper": True}})
+    assert pm.process("text", "c") == ("text", "C")
+
+
+def test_reenable_clears_strikes(tmp_path, config_dir):
+    pm = make_manager(tmp_path)
+    p = pm.plugins[0]
+    p["stats"].strikes = 2
+    p["enabled"], p["tripped"] = False, "error"
+    pm._rebuild_dispatch()
+
+    write_settings(config_dir, {"plugins": {"upper": False}})
+    pm.sync_settings()
+    write_settings(config_dir, {"plugins": {"upper": True}})
+    assert pm.process("text", "a") == ("text", "A")
+    assert p["stats"].strikes == 0
+    assert "tripped" not in p
+
+
+def test_session_trip_survives_unrelated_edit(tmp_path, config_dir):
+    write_settings(config_dir, {"plugins": {"upper": True}})
+    pm = make_manager(tmp_path)
+    p = pm.plugins[0]
+    p["enabled"], p["tripped"] = False, "timeout"  # session-only trip
+    pm._rebuild_dispatch()
+
+    write_settings(config_dir, {"plugins": {"upper": True}, "plugin_runtime": {"timeout": 9.0}})
+    assert pm.process("text", "a") == ("text", "a")
+    assert pm.runtime["timeout"] == 9.0
@@ -0,0 +1,62 @@
+import os
+
+from Library import retention, textstore
+
+OPTIONS = {
+    "inline_max_bytes": 64,
+    "codec": "zlib",
+    "level": 6,
+    "delta": True,
+    "delta_max_chain": 8,
+    "delta_max_ratio": 0.5,
+}
+
+
+def store_trace(directory, count):
+    """Records (newest first) for count edits of one text, each a delta on the last."""
+    lines = ["line %d: %s\n" % (i, "x" * (i % 40)) for i in range(400)]
+    records, base = [], None
+    for i in range(count):
+        lines[i * 7] = "edited %d\n" % i
+        rec = textstore.store(directory, 1000.0 + i, "".join(lines), OPTIONS, base)
+        rec.update(ts=1000.0 + i, type="text")
+        records.insert(0, rec)
+        base = rec
+    return records
+
+
+def disk_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory))
+
+
+def test_evicted_delta_base_stays_charged(tmp_path):
+    directory = str(tmp_path)
+    items = store_trace(directory, 3)
+    assert items[0]["text_codec"] == "delta"
+    ledger = retention.Ledger(items)
+    assert ledger.bytes() == disk_bytes(directory)
+
+    evicted = retention.enforce(items, ledger, [retention.MaxEntries(1)], 0.0)
+    assert len(evicted) == 2
+    for r in evicted:
+        for path in textstore.blob_paths(r):
+            if not ledger.holds(path):
+                os.remove(path)
+    # 残った記録の差分の元は消えずに残り、その分も台帳に数えられている
+    assert ledger.holds(evicted[-1]["text_path"])
+    assert ledger.bytes() == disk_bytes(directory)
+
+    ledger.remove(items[0])
+    assert ledger.bytes() == 0
+
+
+def test_max_bytes_counts_shared_bases(tmp_path):
+    directory = str(tmp_path)
+    items = store_trace(directory, 4)
+    ledger = retention.Ledger(items)
+    limit = disk_bytes(directory) - 1
+    evicted = retention.enforce(items, ledger, [retention.MaxBytes(limit)], 0.0)
+    # 一番古い記録は他の全部の差分の元なので、外しても容量は減らない
+    assert len(items) == 1
+    assert len(evicted) == 3
+    assert ledger.bytes() == disk_bytes(directory)
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from Library import mcb
+
+
+@pytest.fixture
+def main(config_dir, monkeypatch):
+    monkeypatch.setattr(mcb, "_backend", mcb.MemoryPasteboard())
+    import main
+
+    monkeypatch.setattr(main, "_watch_state", None)
+    monkeypatch.setattr(main, "_written_text", None)
+    monkeypatch.setattr(main, "CLIPBOARD_POLL_INTERVAL", 0.01)
+    return main
+
+
+def watch(main):
+    out = []
+    t = threading.Thread(target=lambda: out.append(main.wait_for_clipboard_change()), daemon=True)
+    t.start()
+    return t, out
+
+
+def test_text_write_back_is_not_reported(main, monkeypatch):
+    mcb.MacClipboard.set_text("copied")
+    t, out = watch(main)
+    t.join(0.1)
+
+    # 印を付ける前に監視側が書き込みを見ても読み飛ばす
+    monkeypatch.setattr(mcb.MacClipboard, "set_source_marker", staticmethod(lambda source: None))
+    main._write_back("text", "COPIED", mcb.MacClipboard.change_count())
+    t.join(0.2)
+    assert out == []
+
+    # 同じテキストでも、ユーザーがもう一度コピーしたものは報告する
+    mcb.MacClipboard.set_text("COPIED")
+    t.join(2)
+    assert out == [("text", "COPIED")]